@@ -0,0 +1,59 @@
+"""
+bench_fusion.py
+
+Batched evaluation and differentiation of activation-heavy graphs, with and
+without fusion of elementwise chains (Tape.fused), and the peak memory of the
+temporaries.
+
+Usage:
+    python benchmarks/bench_fusion.py [batch_size]
+"""
+import sys
+import timeit
+import tracemalloc
+
+import numpy as np
+
+import superjacob as sj
+from superjacob.expression import Var
+
+
+def activations(width=8):
+    """A sum of `width` units, each a chain of activations of an affine function of x and y"""
+    x, y = Var('x'), Var('y')
+    f = 0
+    for i in range(width):
+        h = sj.tanh(sj.sin(x * (i + 1)) * 2 + 1)
+        g = sj.logistic(sj.exp(-y**2) * 3 - 1)
+        f = f + sj.softplus(h * g) + sj.sqrt(1 + h**2)
+    return sj.make_expression(f, vars=[x, y])
+
+
+def peak_bytes(fn):
+    tracemalloc.start()
+    fn()
+    peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return peak
+
+
+def bench(label, fn, number=3):
+    t = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    print(f'{label:<32}{t * 1e3:>10.2f} ms{peak_bytes(fn) / 1e6:>10.1f} MB')
+
+
+def main(n=200000):
+    f = activations()
+    tape = f.compile()
+    fused = tape.fused()
+    xs, ys = np.linspace(-2, 2, n), np.linspace(-1, 1, n)
+    print(f'{len(tape.instructions)} instructions, {len(fused.instructions)} after fusion, batch of {n}')
+    bench('eval', lambda: tape.eval(xs, ys))
+    bench('eval (fused)', lambda: fused.eval(xs, ys))
+    bench('eval (fused, memory plan)', lambda: fused.memory_plan(xs, ys).eval(xs, ys))
+    bench('gradient', lambda: tape.deriv(xs, ys))
+    bench('gradient (fused)', lambda: fused.deriv(xs, ys))
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
@@ -0,0 +1,62 @@
+"""
+bench_sparse_deps.py
+
+Derivatives of graphs in which each output touches few inputs, where the
+dependency bitsets let forward mode, reverse mode and Jacobian assembly skip
+the subtrees that cannot contribute.
+
+Usage:
+    python benchmarks/bench_sparse_deps.py [n_vars]
+"""
+import sys
+import timeit
+
+import superjacob as sj
+from superjacob.expression import Var
+
+
+def banded(n):
+    """Sum of n local terms, each depending on two neighbouring variables"""
+    xs = [Var(f'x{i}') for i in range(n)]
+    terms = [sj.sin(xs[i]) * sj.exp(xs[i + 1]) for i in range(n - 1)]
+    f = terms[0]
+    for term in terms[1:]:
+        f = f + term
+    return sj.make_expression(f, vars=xs), xs
+
+
+def stencil(n):
+    """Vector output whose i-th component depends on x[i - 1], x[i] and x[i + 1]"""
+    xs = [Var(f'x{i}') for i in range(n)]
+    outputs = [xs[i - 1] - 2 * sj.cos(xs[i]) + xs[i + 1] for i in range(1, n - 1)]
+    return sj.make_expression(*outputs, vars=xs), xs
+
+
+def bench(label, fn, number=5):
+    t = min(timeit.repeat(fn, number=number, repeat=3)) / number
+    print(f'{label:<48}{t * 1e3:>10.3f} ms')
+
+
+def main(n=100):
+    point = [0.1 * i for i in range(n)]
+    f, xs = banded(n)
+    tape = f.compile()
+    var = xs[n // 2]
+    print(f'banded sum, {n} variables')
+    bench('forward, single variable', lambda: f.deriv(*point, var=var))
+    bench('reverse, single variable', lambda: f.deriv(*point, var=var, mode='reverse'))
+    bench('forward, full gradient', lambda: f.deriv(*point))
+    bench('tape forward, full gradient', lambda: tape.deriv(*point, mode='forward'))
+    bench('tape reverse, full gradient', lambda: tape.deriv(*point))
+
+    g, xs = stencil(n)
+    tape = g.compile()
+    print(f'stencil, {n} variables, {n - 2} outputs')
+    bench('Jacobian column (var=)', lambda: g.deriv(*point, var=xs[n // 2]))
+    bench('Jacobian, forward', lambda: g.deriv(*point), number=1)
+    bench('tape Jacobian, forward', lambda: tape.deriv(*point, mode='forward'), number=1)
+    bench('tape Jacobian, reverse', lambda: tape.deriv(*point), number=1)
+
+
+if __name__ == '__main__':
+    main(*[int(a) for a in sys.argv[1:]])
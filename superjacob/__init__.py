@@ -3,3 +3,15 @@ __all__ = ['expression', 'operations', 'superjacob', 'make_expression']
 from superjacob.expression import *
 from superjacob.superjacob import *
 from superjacob import operations as ops
+from superjacob.service import GradientService
+from superjacob.profiler import Profiler
+from superjacob.analysis import GraphStats, graph_stats
+from superjacob.incremental import IncrementalEvaluator
+from superjacob.streaming import stream_reduce, iter_chunks
+from superjacob.workspace import Workspace
+from superjacob.memory import MemoryPlan
+from superjacob.dual import Dual, grad
+from superjacob.tracing import jit, JitFunction
+from superjacob.symbolic import grad_expr, jacobian_expr
+from superjacob.specialize import specialize
+from superjacob.optimize import minimize, OptimizeResult
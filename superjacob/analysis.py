@@ -0,0 +1,154 @@
+"""
+analysis.py
+
+Static analysis of Expression graphs.
+
+Classes:
+    GraphStats
+        - Shape of a graph (size, depth, fan-out, sharing, operation histogram)
+        - Estimated flop and time costs of evaluation, forward mode and reverse mode
+"""
+from superjacob.expression import Expression, VectorExpression
+from superjacob.tape import toposort
+
+
+class GraphStats:
+    """Statistics of an Expression / VectorExpression graph.
+
+    All quantities are computed in time linear in the size of the graph,
+    without evaluating it. Costs are estimated for memoized sweeps over the
+    graph (as done by a Tape), using the `cost` and `deriv_cost` attributes
+    of each operation: forward mode is a single sweep carrying the tangents
+    of all variables at once, reverse mode is one sweep per output.
+
+    Attributes:
+        n_vars: int -- Number of input variables
+        n_outputs: int -- Number of outputs
+        dag_size: int -- Number of distinct Vars and Expressions in the graph
+        tree_size: int -- Number of nodes if shared subexpressions were duplicated
+        n_constants: int -- Number of numeric constants
+        depth: int -- Length of the longest path from an input to an output
+        max_fanout: int -- Largest number of consumers of a single node
+        sharing_ratio: float -- tree_size / dag_size (1 for a tree)
+        op_histogram: dict[str, int] -- Number of nodes per operation
+        costs: dict[str, int] -- Estimated flops for 'eval', 'forward' and
+            'reverse' (full gradient / Jacobian)
+        times: dict[str, float] -- Estimated seconds for the same
+    """
+    # Rough per-flop and per-node (interpreter overhead) timings, in seconds
+    flop_time = 1e-9
+    node_time = 1e-6
+
+    def __init__(self, outputs, varlist):
+        """Analyse the graph rooted at `outputs`
+
+        :param outputs: list[Var | Expression | Number] -- Output expressions
+        :param varlist: list[Var] -- Ordering of the inputs
+        """
+        nodes = toposort(outputs)
+        var_bits = {id(var): 1 << i for i, var in enumerate(varlist)}
+        index = {id(node): i for i, node in enumerate(nodes)}
+
+        self.n_vars = len(varlist)
+        self.n_outputs = len(outputs)
+        self.dag_size = len(nodes)
+        self.n_constants = 0
+        self.op_histogram = {}
+
+        tree = [1] * len(nodes)
+        depth = [0] * len(nodes)
+        var_mask = [0] * len(nodes)
+        fanout = [0] * len(nodes)
+        parent_idx = [[] for _ in nodes]
+        for i, node in enumerate(nodes):
+            if not isinstance(node, Expression):
+                var_mask[i] = var_bits.get(id(node), 0)
+                continue
+            name = node.operation.__name__
+            self.op_histogram[name] = self.op_histogram.get(name, 0) + 1
+            for parent in node.parents:
+                if parent is None:
+                    continue
+                if id(parent) not in index:
+                    self.n_constants += 1
+                    tree[i] += 1
+                    continue
+                j = index[id(parent)]
+                parent_idx[i].append(j)
+                tree[i] += tree[j]
+                depth[i] = max(depth[i], depth[j] + 1)
+                var_mask[i] |= var_mask[j]
+            for j in set(parent_idx[i]):
+                fanout[j] += 1
+
+        # Number of outputs each node contributes to (reverse topological order)
+        output_mask = [0] * len(nodes)
+        for k, out in enumerate(outputs):
+            if id(out) in index:
+                output_mask[index[id(out)]] |= 1 << k
+        for i in range(len(nodes) - 1, -1, -1):
+            for j in parent_idx[i]:
+                output_mask[j] |= output_mask[i]
+
+        roots = [index[id(out)] for out in outputs if id(out) in index]
+        self.tree_size = sum(tree[i] for i in roots)
+        self.depth = max([depth[i] for i in roots] + [0])
+        self.max_fanout = max(fanout + [0])
+        self.sharing_ratio = self.tree_size / self.dag_size if self.dag_size else 1.
+
+        eval_cost = forward_cost = reverse_cost = 0
+        forward_visits = reverse_visits = 0
+        for i, node in enumerate(nodes):
+            if not isinstance(node, Expression):
+                continue
+            op = node.operation
+            n_dep_vars = bin(var_mask[i]).count('1')
+            n_dep_outputs = bin(output_mask[i]).count('1')
+            eval_cost += op.cost
+            # Partials are computed once per sweep, plus one multiply-add per edge and tangent / adjoint
+            if n_dep_vars:
+                forward_cost += op.deriv_cost + 2 * len(parent_idx[i]) * self.n_vars
+                forward_visits += 1
+            reverse_cost += (op.deriv_cost + 2 * len(parent_idx[i])) * n_dep_outputs
+            reverse_visits += n_dep_outputs
+        self.costs = {'eval': eval_cost,
+                      'forward': eval_cost + forward_cost,
+                      'reverse': eval_cost + reverse_cost}
+        self.times = {'eval': eval_cost * self.flop_time + self.dag_size * self.node_time,
+                      'forward': self.costs['forward'] * self.flop_time
+                      + (self.dag_size + forward_visits) * self.node_time,
+                      'reverse': self.costs['reverse'] * self.flop_time
+                      + (self.dag_size + reverse_visits) * self.node_time}
+
+    @property
+    def is_tree(self):
+        """Whether the graph has no shared subexpressions"""
+        return self.tree_size == self.dag_size
+
+    def best_mode(self):
+        """The cheaper differentiation mode for the full gradient / Jacobian
+
+        :return: str -- 'forward' or 'reverse'
+        """
+        return 'forward' if self.times['forward'] <= self.times['reverse'] else 'reverse'
+
+    def as_dict(self):
+        """All statistics as a dictionary"""
+        return {key: getattr(self, key) for key in
+                ('n_vars', 'n_outputs', 'dag_size', 'tree_size', 'n_constants', 'depth',
+                 'max_fanout', 'sharing_ratio', 'is_tree', 'op_histogram', 'costs', 'times')}
+
+    def __repr__(self):
+        return f'GraphStats(dag_size={self.dag_size}, tree_size={self.tree_size}, depth={self.depth}, ' \
+               f'max_fanout={self.max_fanout}, costs={self.costs})'
+
+
+def graph_stats(expr):
+    """Analyse an Expression or VectorExpression
+
+    :param expr: Var | Expression | VectorExpression -- The expression
+    :return: GraphStats
+    """
+    if isinstance(expr, VectorExpression):
+        return GraphStats(expr.expressions, expr.vars)
+    return GraphStats([expr], expr.vars)
@@ -0,0 +1,204 @@
+"""
+checkpoint.py
+
+Reverse mode differentiation with bounded memory for chain-structured graphs.
+
+Classes:
+    CheckpointedReverseDiff
+        - Splits a compiled Tape into the segments of a chain (e.g. the steps of
+          an unrolled time-stepping model)
+        - Stores only a budgeted number of segment boundary values and
+          recomputes segments during the backward sweep (binomial checkpointing)
+"""
+import numpy as np
+
+from superjacob.expression import bind
+
+
+class CheckpointedReverseDiff:
+    """Reverse mode differentiation with binomial (revolve-style) checkpointing.
+
+    The Tape is cut at every instruction whose output is the only value
+    computed so far that is still needed later on. The pieces between two cuts
+    are the segments of the chain, and the value at a cut (the "state") is all
+    that is needed to resume the computation from there. Inputs and constants
+    are always kept.
+
+    The forward sweep keeps no intermediate values. The backward sweep keeps at
+    most `budget` states plus the values of the single segment being reversed.
+    It recomputes segments from the nearest stored state using the binomial
+    schedule of Griewank's revolve algorithm, so the number of recomputed
+    segments grows only logarithmically with the chain length for a fixed
+    budget. A graph that is not a chain has a single segment and is
+    differentiated like an ordinary Tape.
+
+    Attributes:
+        expr: Expression -- The Expression being differentiated
+        vars: list[Var] -- The correct ordering of variables
+        tape: Tape -- The compiled Expression
+        budget: int -- Maximum number of stored states
+        segments: list[list[tuple]] -- The instructions of each segment
+        advances: int -- Number of segments evaluated during the last call
+        max_stored: int -- Largest number of states stored at once during the last call
+    """
+    def __init__(self, expr, budget=10):
+        """Initialize a CheckpointedReverseDiff
+
+        :param expr: Expression -- The Expression to be differentiated
+        :param budget: int -- Maximum number of stored states (at least 1)
+        """
+        assert budget >= 1, f'The checkpoint budget must be at least 1 (given: {budget})'
+        self.expr = expr
+        self.vars = expr.vars
+        self.tape = expr.compile()
+        assert not self.tape.vector, 'Checkpointed reverse mode requires a scalar Expression'
+        self.budget = budget
+        self.segments = self._split(self.tape.instructions)
+        self.advances = 0
+        self.max_stored = 0
+
+    @staticmethod
+    def _split(instructions):
+        """Cut the instructions into the segments of a chain
+
+        :param instructions: list[tuple] -- Instructions of a Tape
+        :return: list[list[tuple]] -- Segments; the output slot of the last
+            instruction of each segment is the state passed to the next one
+        """
+        last_use = {}
+        for k, (_, _, parents) in enumerate(instructions):
+            for p in parents:
+                last_use[p] = k
+        segments = [[]]
+        live_until = -1  # Last instruction using a value computed before the current one
+        for k, (slot, op, parents) in enumerate(instructions):
+            segments[-1].append((slot, op, parents))
+            if live_until <= k and k < len(instructions) - 1:
+                segments.append([])
+            live_until = max(live_until, last_use.get(slot, -1))
+        return segments
+
+    def __call__(self, *args, var=None, params=None):
+        """Compute the gradient at `args`
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param var: Var -- If given, only return the derivative with respect to `var`
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray | Number -- The gradient
+        """
+        with bind(params):
+            assert len(args) == len(self.vars), \
+                f'Input length does not match dimension of Expression domain ({len(args)}, {len(self.vars)})'
+            self.advances = 0
+            self.max_stored = 0
+            if not self.tape.instructions:
+                return self.tape.deriv(*args) if var is None else self.tape.deriv(*args)[..., self.vars.index(var)]
+            fixed = {slot: value for slot, value in self.tape.constants}
+            fixed.update((slot, param.eval()) for slot, param in self.tape.params)
+            for slot, value in zip(self.tape.inputs, args):
+                if slot is not None:
+                    fixed[slot] = value
+            grads = {}
+
+            n = len(self.segments)
+            states = {0: None}  # Segment index -> value of the state that segment starts from
+            bar = 1
+            stack = [('reverse', 0, n, self.budget)]
+            while stack:
+                task = stack.pop()
+                if task[0] == 'free':
+                    del states[task[1]]
+                    continue
+                if task[0] == 'serial':
+                    _, i, k = task
+                    bar = self._backward(k, self._advance(i, k, states[i], fixed), bar, fixed, grads)
+                    continue
+                _, i, j, snapshots = task
+                if j - i == 1:
+                    bar = self._backward(i, states[i], bar, fixed, grads)
+                elif snapshots == 0:
+                    # No snapshot left: recompute every segment from the state of segment i
+                    stack.extend(('serial', i, k) for k in range(i, j))
+                else:
+                    m = i + self._split_point(j - i, snapshots)
+                    states[m] = self._advance(i, m, states[i], fixed)
+                    self.max_stored = max(self.max_stored, len(states) - 1)
+                    stack.append(('reverse', i, m, snapshots))
+                    stack.append(('free', m))
+                    stack.append(('reverse', m, j, snapshots - 1))
+
+            grad = [grads.get(slot, 0) if slot is not None else 0 for slot in self.tape.inputs]
+            if var is not None:
+                return grad[self.vars.index(var)]
+            shape = self.tape.batch_shape(*args)
+            return np.stack([np.broadcast_to(g, shape) for g in grad], axis=-1)
+
+    @staticmethod
+    def _split_point(length, snapshots):
+        """Number of segments to advance before storing the next state (binomial schedule)
+
+        :param length: int -- Number of segments to reverse (at least 2)
+        :param snapshots: int -- Number of states that may still be stored (at least 1)
+        :return: int -- Between 1 and length - 1
+        """
+        repetitions = 0
+        while _binomial(snapshots + repetitions, snapshots) < length:
+            repetitions += 1
+        step = length - _binomial(snapshots - 1 + repetitions, snapshots - 1)
+        return min(max(step, 1), length - 1)
+
+    def _advance(self, i, m, state, fixed):
+        """Evaluate segments [i, m) from `state` without storing intermediates
+
+        :return: The state that segment m starts from
+        """
+        for k in range(i, m):
+            values = self._run(k, state, fixed)
+            state = values[self.segments[k][-1][0]]
+        return state
+
+    def _run(self, k, state, fixed):
+        """Evaluate segment `k` from `state`, returning its values by slot"""
+        self.advances += 1
+        values = {}
+        if k > 0:
+            values[self.segments[k - 1][-1][0]] = state
+        for slot, op, parents in self.segments[k]:
+            values[slot] = op.eval(*[values[p] if p in values else fixed[p] for p in parents])
+        return values
+
+    def _backward(self, k, state, bar, fixed, grads):
+        """Recompute segment `k` and propagate the adjoint `bar` of its output through it
+
+        :return: The adjoint of the state segment `k` starts from
+        """
+        values = self._run(k, state, fixed)
+        segment = self.segments[k]
+        adjoints = {segment[-1][0]: bar}
+        active = self.tape.active
+        for slot, op, parents in reversed(segment):
+            adjoint = adjoints.pop(slot, None)
+            if adjoint is None:
+                continue
+            partials = op.reverse(*[values[p] if p in values else fixed[p] for p in parents], value=values[slot])
+            if len(parents) == 1:
+                partials = (partials,)
+            for p, partial in zip(parents, partials):
+                if not active[p]:
+                    continue
+                contrib = adjoint * partial
+                if p in values:
+                    adjoints[p] = contrib if p not in adjoints else adjoints[p] + contrib
+                else:
+                    grads[p] = contrib if p not in grads else grads[p] + contrib
+        if k == 0:
+            return None
+        return adjoints.get(self.segments[k - 1][-1][0], 0)
+
+
+def _binomial(n, k):
+    """Binomial coefficient n choose k"""
+    res = 1
+    for i in range(1, k + 1):
+        res = res * (n - k + i) // i
+    return res
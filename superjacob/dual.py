@@ -0,0 +1,168 @@
+"""
+dual.py
+
+Forward mode on plain Python functions, without building an Expression graph.
+
+Classes:
+    Dual
+        - A value and its tangent array (derivatives with respect to every
+          input at once)
+        - Supports the arithmetic operators and the functions of
+          superjacob.superjacob (sin, exp, log, pow, ...)
+
+Functions:
+    grad
+        - Turns a function of numbers into a function returning its gradient
+          (or Jacobian), computed with Duals
+"""
+from numbers import Number
+
+import numpy as np
+
+import superjacob as sj
+
+
+class Dual:
+    """A dual number: a value and the derivatives of that value.
+
+    The functions of superjacob.superjacob return a Dual when given one, using
+    the `eval` and `deriv` rules of the operations directly: no Expression is
+    created, so nothing is kept beyond the current value and tangent.
+
+    The tangent holds one derivative per input along its first axis (the
+    remaining axes broadcast against the value, for batches of points), so a
+    single sweep gives the whole gradient.
+
+    Attributes:
+        value: Number | np.ndarray -- The value
+        tangent: Number | np.ndarray -- The derivatives of the value
+    """
+    __slots__ = ('value', 'tangent')
+
+    def __init__(self, value, tangent=0):
+        """Initialize a Dual
+
+        :param value: Number | np.ndarray -- The value
+        :param tangent: Number | np.ndarray -- The derivatives of the value (0 for a constant)
+        """
+        self.value = value
+        self.tangent = tangent
+
+    def __repr__(self):
+        return f'Dual({self.value!r}, {self.tangent!r})'
+
+    def __add__(self, other):
+        return sj.add(self, other)
+
+    def __radd__(self, other):
+        return sj.add(other, self)
+
+    def __sub__(self, other):
+        return sj.sub(self, other)
+
+    def __rsub__(self, other):
+        return sj.sub(other, self)
+
+    def __mul__(self, other):
+        return sj.mul(self, other)
+
+    def __rmul__(self, other):
+        return sj.mul(other, self)
+
+    def __truediv__(self, other):
+        return sj.div(self, other)
+
+    def __rtruediv__(self, other):
+        return sj.div(other, self)
+
+    def __pow__(self, power):
+        return sj.pow(self, power)
+
+    def __rpow__(self, base):
+        return sj.pow(base, self)
+
+    def __neg__(self):
+        return sj.neg(self)
+
+    def __pos__(self):
+        return self
+
+    # Comparisons use the value only, so functions with branches can be differentiated
+    def __lt__(self, other):
+        return self.value < _value(other)
+
+    def __le__(self, other):
+        return self.value <= _value(other)
+
+    def __gt__(self, other):
+        return self.value > _value(other)
+
+    def __ge__(self, other):
+        return self.value >= _value(other)
+
+
+def apply(operation, *args):
+    """Apply `operation` to Duals (and constants)
+
+    :param operation: BaseOperation -- Unary or binary operation
+    :param args: tuple[Dual | Number | np.ndarray] -- Operands, at least one of them a Dual
+    :return: Dual
+    """
+    values, tangents = [], []
+    for arg in args:
+        if isinstance(arg, Dual):
+            values.append(arg.value)
+            tangents.append(arg.tangent)
+        elif isinstance(arg, (Number, np.ndarray)):
+            values.append(arg)
+            tangents.append(0)
+        else:
+            raise TypeError(f'Cannot combine a Dual with {type(arg).__name__}')
+    value = operation.eval(*values)
+    if len(args) == 1:
+        tangent = operation.deriv(values[0], tangents[0], value=value)
+    else:
+        tangent = operation.deriv(values[0], tangents[0], values[1], tangents[1], value=value)
+    return Dual(value, tangent)
+
+
+def grad(fn):
+    """Gradient of a Python function, computed in forward mode with Duals
+
+    `fn` is called once with one Dual per argument, each seeded with a unit
+    tangent, and must only use arithmetic operators and the functions of
+    superjacob. Returning a list or tuple gives the Jacobian.
+
+    Usage:
+        df = grad(lambda x, y: sj.sin(x) * y)
+        df(1., 2.)            # [2 cos(1), sin(1)]
+        df(np.ones(5), 2.)    # batch of 5 gradients, shape (5, 2)
+
+    :param fn: callable -- Function of numbers (or arrays of points) returning a number or a sequence of numbers
+    :return: callable -- Function returning the derivative, shaped as `Expression.deriv`
+        (or `VectorExpression.deriv` for sequence outputs)
+    """
+    def gradient(*args):
+        n = len(args)
+        shape = sj.tape.batch_shape(*args)
+        seeds = np.eye(n).reshape((n, n) + (1,) * len(shape))
+        res = fn(*[Dual(arg, seeds[i]) for i, arg in enumerate(args)])
+        if isinstance(res, (list, tuple)):
+            return np.stack([_derivative(r, n, shape) for r in res], axis=-2)
+        derivative = _derivative(res, n, shape)
+        if n == 1:  # As `Expression.deriv`, a single variable gives no trailing axis
+            return derivative[..., 0] if derivative.ndim > 1 else derivative[0]
+        return derivative
+    return gradient
+
+
+def _derivative(res, n, shape):
+    """Derivatives of `res` with respect to the `n` inputs, with the inputs on the last axis"""
+    tangent = res.tangent if isinstance(res, Dual) else 0
+    tangent = np.broadcast_to(tangent, (n,) + sj.tape.batch_shape(np.broadcast_to(0., shape), _value(res)))
+    return np.array(np.moveaxis(tangent, 0, -1))
+
+
+def _value(x):
+    """The value of a Dual, or `x` itself"""
+    return x.value if isinstance(x, Dual) else x
@@ -4,10 +4,17 @@ expression.py
 Classes:
     Var
         - Base class for individual variables
+    Param
+        - Inherits from Var
+        - Non-differentiable placeholder for data / hyper-parameters, bound at call time
     Expression
         - Inherits from Var
         - Can be combined into larger expressions
 """
+import heapq
+import threading
+import weakref
+from contextlib import contextmanager
 from typing import Union
 from numbers import Number
 
@@ -21,6 +28,11 @@ class Var:
 
     Attributes:
         :name: str -- The common name for the variable (e.g. 'x', 'y', 'x1')
+        :deps: int -- Bitset of the Vars this node depends on (one bit per live Var:
+            the bit of a Var is reused once it is garbage collected, so bitsets
+            stay as wide as the number of live Vars)
+        :fingerprint: int -- Structural hash: from the identity of a Var or Param, and
+            from the operation and the parents of an Expression
 
     Methods:
         eval () -> Number -- Evaluate the variable for a given input (always return the number itself)
@@ -36,6 +48,12 @@ class Var:
         self._vars = None
         self.name = name
         self.length = length
+        # Leaves are identified by identity: two Vars with the same name are different variables
+        self.fingerprint = hash((Var, id(self)))
+        if not isinstance(self, (Expression, Param)):
+            index = Var._acquire_index()
+            self.deps = 1 << index
+            weakref.finalize(self, Var._release_index, index)
 
     def eval(self, x: Union[Number, np.ndarray]):
         """
@@ -69,16 +87,45 @@ class Var:
             return 0
 
     def _check_length(self, x):
-        """Check that the length of the input matches the Var length."""
+        """Check that the length of the input matches the Var length.
+
+        A scalar Var also accepts a NumPy array, which is a batch of points.
+        """
+        if self.length == 1 and isinstance(x, np.ndarray):
+            return
         try:
             assert len(x) == self.length, f'Incorrect input size (required: {self.length}, given: {len(x)}'
         except TypeError:  # Assuming that this is a single number
             assert self.length == 1, f'Incorrect input size (required: {self.length}, given: 1'
 
+    _count = 0  # Number of dependency bits handed out so far
+    _free = []  # Heap of the bits of garbage collected Vars, reused lowest first
+
+    @staticmethod
+    def _acquire_index():
+        """The lowest free dependency bit"""
+        if Var._free:
+            return heapq.heappop(Var._free)
+        Var._count += 1
+        return Var._count - 1
+
+    @staticmethod
+    def _release_index(index):
+        """Free the dependency bit of a garbage collected Var (no live node can depend on it)"""
+        heapq.heappush(Var._free, index)
+
     @property
     def vars(self):
         return [self]
 
+    def depends_on(self, var):
+        """Whether this node depends on `var` (constant time, using the dependency bitset)
+
+        :param var: Var -- The variable
+        :return: bool
+        """
+        return bool(self.deps & var.deps)
+
     def __repr__(self):
         return self.name
 
@@ -125,6 +172,55 @@ class Var:
         return hash(id(self))
 
 
+class Param(Var):
+    """A placeholder for data or a hyper-parameter.
+
+    A Param is a leaf of the graph like a Var, but it is not an input of the
+    Expression and is never differentiated. Its value (a number or an array)
+    is bound at call time with the `params` argument of `eval` / `deriv`
+    (for that call only), or by setting `value` (a default used when a call
+    binds nothing), so one graph (and its compiled Tape) can be reused
+    across datasets and hyper-parameter settings.
+
+    Attributes:
+        :name: str -- Name of the placeholder
+        :value: Number | np.ndarray | None -- Default value, used when no call binds the Param
+    """
+    def __init__(self, name, value=None):
+        """Initialize a Param
+
+        :param name: str -- Name of this placeholder (e.g. 'data', 'lr')
+        :param value: Number | np.ndarray | None -- Default value (default: unbound)
+        """
+        super().__init__(name)
+        self.deps = 0
+        self.value = value
+
+    @property
+    def bound_value(self):
+        """The value bound by the innermost `bind` of this thread, else `value` (None if unbound)"""
+        for params in reversed(_bindings_stack()):
+            if self in params:
+                return params[self]
+        return self.value
+
+    def eval(self, *args):
+        """The bound value (arguments are ignored: a Param does not depend on any Var)
+
+        :return: Number | np.ndarray
+        """
+        value = self.bound_value
+        assert value is not None, f'Param {self.name} is not bound to a value'
+        return value
+
+    def deriv(self, *args, **kwargs):
+        return 0
+
+    @property
+    def vars(self):
+        return []
+
+
 class Expression(Var):
     def __init__(self, parent1, parent2, operation, varlist=None):
         """
@@ -142,12 +238,19 @@ class Expression(Var):
         self.parent2 = parent2
         self.parents = [self.parent1, self.parent2]
         self.operation = operation
+        self.deps = _deps(parent1) | _deps(parent2)
+        self.fingerprint = hash((operation, _fingerprint(parent1), _fingerprint(parent2)))
+        self._str = None
         if varlist is None:
             self._vars = self._get_parent_vars(self.parent1)
             self._vars += [v for v in self._get_parent_vars(self.parent2) if v not in self._vars]
         else:
             self._vars = varlist
         self.matched_vars = self._match_vars_to_parents()
+        self._tape = None
+        self._hessian_tape = None
+        self._stats = None
+        self._params = None
 
     def set_vars(self, varlist):
         """Set the varlist of this Expression
@@ -157,6 +260,35 @@ class Expression(Var):
         """
         self._vars = varlist
         self.matched_vars = self._match_vars_to_parents()
+        self._tape = None
+        self._hessian_tape = None
+        self._stats = None
+
+    def compile(self):
+        """Compile this Expression into a flat Tape (cached until the varlist changes)
+
+        :return: Tape
+        """
+        if self._tape is None:
+            self._tape = sj.compile(self)
+        return self._tape
+
+    def stats(self):
+        """Graph statistics and cost estimates (cached until the varlist changes)
+
+        :return: GraphStats
+        """
+        if self._stats is None:
+            self._stats = sj.graph_stats(self)
+        return self._stats
+
+    def grad_expr(self, var=None):
+        """Derivatives of this Expression as new Expressions, sharing its subexpressions
+
+        :param var: Var | None -- Variable to differentiate with respect to (default: all variables)
+        :return: Expression (one variable) | VectorExpression (gradient, one component per variable)
+        """
+        return sj.grad_expr(self, var)
 
     @property
     def vars(self):
@@ -167,6 +299,23 @@ class Expression(Var):
         # Call set_vars here
         self.set_vars(varlist)
 
+    @property
+    def params(self):
+        """The Params in the graph of this Expression (cached)"""
+        if self._params is None:
+            self._params, self._arrays = _leaves([self])
+        return self._params
+
+    def batch_shape(self, *args, params=None):
+        """Broadcast shape of `args`, of the values bound to the Params and of the array constants
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: tuple[int]
+        """
+        with bind(params):
+            return sj.tape.batch_shape(*args, *[p.bound_value for p in self.params], *self._arrays)
+
     def _match_vars_to_parents(self):
         """Matches variables to parent1 and parent2
 
@@ -174,25 +323,28 @@ class Expression(Var):
         """
         matched_vars = {}
         for var in self.vars:
-            parents_of_var = []
-            for parent in self.parents:
-                if var in self._get_parent_vars(parent):
-                    parents_of_var.append(parent)
-            matched_vars[var] = parents_of_var
+            matched_vars[var] = [parent for parent in self.parents if _deps(parent) & var.deps]
         return matched_vars
 
-    def eval(self, *args):
+    def eval(self, *args, params=None, out=None):
         """Evaluate this Expression at the specified point
 
         :param args: tuple of values to evaluate the Expression at
-        :return: Result (length depends on dimensionality of co-domain)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: np.ndarray | None -- Buffer to write the value into
+        :return: Result (length depends on dimensionality of co-domain; `out` if given)
         """
-        if self.parent2 is None:
-            return self._unary_eval(*args)
-        else:
-            return self._binary_eval(*args)
+        with bind(params):
+            if self.parent2 is None:
+                res = self._unary_eval(*args)
+            else:
+                res = self._binary_eval(*args)
+            if out is None:
+                return res
+            out[...] = res
+            return out
 
-    def deriv(self, *args, mode='forward', var=None):
+    def deriv(self, *args, mode='forward', var=None, params=None, out=None):
         """Differentiate this Expression at the specified point.
 
         :param args: tuple -- values to evaluate the Expression at
@@ -200,61 +352,171 @@ class Expression(Var):
             (possible options: {'forward', 'reverse', 'auto'})
         :param var: Var -- Variable to take derivative with respect to
             Default: None (gets entire Jacobian)
-        :return: tuple(Number) | Number -- Result (length depends on dimensionality of co-domain)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: np.ndarray | None -- Buffer to write the derivative into
+        :return: tuple(Number) | Number -- Result (length depends on dimensionality of co-domain;
+            `out` if given)
         """
-        assert mode in ('forward', 'reverse', 'auto'), f'Invalid model specified: {mode}. ' \
-                                                       f'Please choose one of "forward", "reverse", "auto".'
-        if mode == 'auto':
-            if len(self.vars) > 1:
-                mode = 'reverse'
+        with bind(params):
+            assert mode in ('forward', 'reverse', 'auto'), f'Invalid model specified: {mode}. ' \
+                                                           f'Please choose one of "forward", "reverse", "auto".'
+            if mode == 'auto':
+                mode = self.stats().best_mode()
+            if mode == 'forward':
+                if var is None:
+                    return self._forward_grad(*args, out=out)[1]
+                res = self._forward({var: 1}, var.deps, {}, *args)[1]
+                if out is None:
+                    return res
+                out[...] = res
+                return out
             else:
-                mode = 'forward'
-        if mode == 'forward':
-            if var is None:
-                res = []
-                for var in self.vars:
-                    res.append(self._deriv(var, *args))
-                if len(res) == 1:
-                    return res[0]
-                else:
-                    return np.array(res)
-            else:
-                return self._deriv(var, *args)
-        else:
+                rev = sj.reverse(self)
+                return rev(*args, var=var, out=out)
+
+    def value_and_grad(self, *args, mode='forward', params=None):
+        """Evaluate and differentiate this Expression in a single traversal.
+
+        :param args: tuple -- values to evaluate the Expression at
+        :param mode: str -- One of {'forward', 'reverse', 'auto'}
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: (Number, Number | np.ndarray) -- The value and the gradient
+            (same as `eval` and `deriv`)
+        """
+        with bind(params):
+            assert mode in ('forward', 'reverse', 'auto'), f'Invalid model specified: {mode}. ' \
+                                                           f'Please choose one of "forward", "reverse", "auto".'
+            if mode == 'auto':
+                mode = self.stats().best_mode()
+            if mode == 'forward':
+                return self._forward_grad(*args)
             rev = sj.reverse(self)
-            return rev(*args, var=var)
+            grad = rev(*args)
+            return rev.value, grad
 
-    def _deriv(self, var, *args):
-        """Get derivative of self with respect to variable `var` (forward mode)"""
-        if self.parent2 is None:
-            return self._unary_deriv(*args, var=var)
+    def _forward_grad(self, *args, out=None):
+        """Value and full gradient from one forward sweep
+
+        Every variable is seeded with a unit vector, so the tangent of the sweep is the whole gradient.
+        """
+        n, shape = len(self.vars), self.batch_shape(*args)
+        seeds = dict(zip(self.vars, np.eye(n).reshape((n, n) + (1,) * len(shape))))
+        value, tangent = self._forward(seeds, _deps(*self.vars), {}, *args)
+        if out is not None:
+            # View of `out` with the variables first, like the tangent
+            target = out[np.newaxis] if n == 1 else np.moveaxis(out, -1, 0)
+            target[...] = tangent
+            return value, out
+        res = np.zeros((n,) + shape) + tangent
+        if len(res) == 1:
+            return value, res[0]
         else:
-            return self._binary_deriv(*args, var=var)
+            return value, np.moveaxis(res, 0, -1)
+
+    def jvp(self, x, v, params=None):
+        """Directional derivative along `v` (one forward sweep, independent of the number of variables)
+
+        :param x: tuple[Number] -- Point to differentiate at, in the order of self.vars
+        :param v: tuple[Number] -- Direction, in the order of self.vars
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: Number -- The gradient dotted with `v`
+        """
+        return self.compile().jvp(x, v, params=params)
+
+    def specialize(self, values):
+        """A smaller Expression with some variables fixed and the subexpressions depending only on them folded
+
+        :param values: dict[Var, Number | np.ndarray] -- Values of the fixed variables
+        :return: Expression -- Expression of the remaining variables (in the same order)
+        """
+        return sj.specialize(self, values)
+
+    def hessian(self, *args, params=None, out=None):
+        """Hessian at `args`, vectorized over batches of points
+
+        The gradient is built once as Expressions (`grad_expr`) and compiled to
+        a Tape (cached until the varlist changes). Its Jacobian is then taken in
+        forward mode, in a single sweep carrying one tangent per variable over the whole batch.
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points), in the order of self.vars
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: np.ndarray | None -- Buffer of shape batch + (n, n) to write the Hessian into
+        :return: np.ndarray -- Array of shape batch + (n, n) (`out` if given)
+        """
+        return self._gradient_tape().deriv(*args, mode='forward', params=params, out=out)
+
+    def hvp(self, x, v, params=None):
+        """Hessian-vector product H(x) v, with one forward sweep over the compiled gradient
+
+        :param x: tuple[Number | np.ndarray] -- Point (or batch of points), in the order of self.vars
+        :param v: tuple[Number | np.ndarray] -- Direction, in the order of self.vars
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- Array of shape batch + (n,)
+        """
+        return self._gradient_tape().jvp(x, v, params=params)
+
+    def _gradient_tape(self):
+        """The gradient built as Expressions, compiled (cached until the varlist changes)"""
+        if self._hessian_tape is None:
+            grad = self.grad_expr()
+            exprs = grad.expressions if isinstance(grad, VectorExpression) else [grad]
+            self._hessian_tape = sj.tape.Tape(exprs, self.vars, vector=True)
+        return self._hessian_tape
+
+    def taylor(self, x, v, order, params=None):
+        """Derivatives of t -> f(x + t v) at t = 0 up to `order` (Taylor mode, O(order^2) per node)
+
+        :param x: tuple[Number] -- Point to differentiate at, in the order of self.vars
+        :param v: tuple[Number] -- Direction, in the order of self.vars
+        :param order: int -- Highest derivative
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- Array of shape batch + (order + 1,), entry k being the k-th derivative
+        """
+        return self.compile().taylor(x, v, order, params=params)
+
+    def vjp(self, x, u, params=None):
+        """Gradient scaled by the output weight `u` (one reverse sweep)
+
+        :param x: tuple[Number] -- Point to differentiate at, in the order of self.vars
+        :param u: Number -- Weight of the output
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- `u` times the gradient
+        """
+        return self.compile().vjp(x, u, params=params)
+
+    def _forward(self, seeds, mask, memo, *args):
+        """Value and tangent of this Expression in a single forward mode sweep
+
+        Parents that depend on none of the seeded Vars (`deps & mask == 0`) are
+        only evaluated: their tangent is 0 and their derivative rules are skipped.
+
+        :param seeds: dict[Var, Number | np.ndarray] -- Tangent of each input Var
+        :param mask: int -- Dependency bitset of the seeded Vars
+        :param memo: dict -- (value, tangent) of the nodes already visited in this sweep
+        :param args: Point to differentiate at, in the order of self.vars
+        :return: (Number, Number | np.ndarray) -- Value and tangent
+        """
+        if self.parent2 is None:
+            p1_args = self._get_input_args(self.parent1, *args)
+            val1, der1 = self._forward_parent(self.parent1, seeds, mask, memo, *p1_args)
+            value = self.operation.eval(val1)
+            return value, self.operation.deriv(val1, der1, value=value)
+        p1_args, p2_args = self._parse_args(*args)
+        val1, der1 = self._forward_parent(self.parent1, seeds, mask, memo, *p1_args)
+        val2, der2 = self._forward_parent(self.parent2, seeds, mask, memo, *p2_args)
+        value = self.operation.eval(val1, val2)
+        return value, self.operation.deriv(val1, der1, val2, der2, value=value)
 
     def _unary_eval(self, *args):
         """Evalute this Expression if unary"""
-        return self.operation.eval(self._eval_parent(self.parent1, *args))
+        # The parent may depend on fewer variables than this Expression (e.g. after set_vars)
+        return self.operation.eval(self._eval_parent(self.parent1, *self._get_input_args(self.parent1, *args)))
 
     def _binary_eval(self, *args):
         """Evaluate this expression if binary"""
         p1_args, p2_args = self._parse_args(*args)
         return self.operation.eval(self._eval_parent(self.parent1, *p1_args), self._eval_parent(self.parent2, *p2_args))
 
-    def _unary_deriv(self, *args, var=None):
-        """Differentiate this expression if unary (forward mode)"""
-        res = self.operation.deriv(self._eval_parent(self.parent1, *args),
-                                   self._deriv_parent(self.parent1, var, *args))
-        return res
-
-    def _binary_deriv(self, *args, var=None):
-        """Differentiate this expression if binary (forward mode)"""
-        p1_args, p2_args = self._parse_args(*args)
-        res = self.operation.deriv(self._eval_parent(self.parent1, *p1_args),  # Evaluate and store once
-                                   self._deriv_parent(self.parent1, var, *p1_args),
-                                   self._eval_parent(self.parent2, *p2_args),
-                                   self._deriv_parent(self.parent2, var, *p2_args))
-        return res
-
     def _get_input_args(self, parent, *args):
         """Parse the arguments in terms of the ordering for the parent
 
@@ -289,10 +551,10 @@ class Expression(Var):
     def _get_parent_vars(parent: Union[Var, Number, None]):
         """Get the vars for given parent
 
-        :param parent: Var | Number | None -- The parent of interest
+        :param parent: Var | Number | np.ndarray | None -- The parent of interest
         :return: list[Var]
         """
-        if parent is None or isinstance(parent, Number):
+        if not isinstance(parent, Var):
             return []
         else:
             return parent.vars[:]
@@ -310,38 +572,63 @@ class Expression(Var):
             return parent(*args)
 
     @staticmethod
-    def _deriv_parent(parent: Union[Var, Number], var: Var, *args) -> Number:
-        """Evaluate derivative of a parent at `args`, checking if the parent is a Number
+    def _forward_parent(parent: Union[Var, Number], seeds, mask, memo, *args):
+        """Value and tangent of a parent, checking if the parent is a Number
 
         :param parent: The parent of interest
-        :param var: Var -- Variable with respect to which the derivative is
-            being taken
+        :param seeds: dict[Var, Number | np.ndarray] -- Tangent of each input Var
+        :param mask: int -- Dependency bitset of the seeded Vars
+        :param memo: dict -- (value, tangent) of the nodes already visited in this sweep
         :param args: Point to differentiate parent at
-        :return: Number
+        :return: (Number, Number | np.ndarray)
         """
-        if isinstance(parent, Var):
-            if var in parent.vars:
-                return parent.deriv(*args, var=var)
-        return 0
+        if not isinstance(parent, Var):
+            return parent, 0
+        if id(parent) not in memo:
+            if not parent.deps & mask:
+                memo[id(parent)] = parent(*args), 0
+            elif isinstance(parent, Expression):
+                memo[id(parent)] = parent._forward(seeds, mask, memo, *args)
+            else:
+                memo[id(parent)] = parent(*args), seeds.get(parent, 0)
+        return memo[id(parent)]
 
     def __call__(self, *args, **kwargs):
-        return self.eval(*args)
+        return self.eval(*args, **kwargs)
+
+    def to_string(self, dag=None):
+        """Render this Expression
+
+        The fully expanded rendering repeats every shared subexpression at each
+        use, so it can grow exponentially with the depth of a DAG. The DAG-aware
+        rendering names each shared subexpression once instead:
+        `_1 * _1 where _1 = sin(x)`.
+
+        :param dag: bool | None -- Whether to name shared subexpressions
+            (default: only if the expanded rendering is longer than `STR_LIMIT` characters)
+        :return: str
+        """
+        return render(self, dag)
 
     def __str__(self):
-        if self.parent2 is None:
-            return self.operation.opstr(self.parent1)
-        else:
-            return self.operation.opstr(self.parent1, self.parent2)
+        # The graph below this node never changes, so the rendering is computed once
+        if self._str is None:
+            self._str = self.to_string()
+        return self._str
 
     def __repr__(self):
         return self.__str__()
 
     def __eq__(self, other):
-        return self.__str__() == other.__str__()
+        # Structural equality: different fingerprints reject in constant time, equal ones are confirmed
+        # by comparing the graphs (shared subexpressions are compared once)
+        if not isinstance(other, Var):
+            return NotImplemented
+        return _same_structure(self, other)
 
     def __hash__(self):
-        # For some reason this isn't inherited from Var
-        return hash(id(self))
+        # Consistent with the structural __eq__, and O(1) since the fingerprint is computed at construction
+        return self.fingerprint
 
 
 class VectorExpression:
@@ -350,8 +637,9 @@ class VectorExpression:
 
     Private attributes:
         _vars: list[Var] -- The ordering of Vars for this VectorExpression
-        _expressions list[Var | Expression] -- The expressions for each output
-            dimension
+        _expressions list[tuple[Var | Expression, list[int]]] -- The expression for each
+            output dimension, with the indices of its Vars in the varlist (a list rather
+            than a dict: structurally equal outputs would share a key)
     """
     def __init__(self, expressions, varlist):
         """Initialize a VectorExpression
@@ -361,6 +649,8 @@ class VectorExpression:
         """
         self._vars = varlist
         self._expressions = self._match_vars_to_expressions(varlist, expressions)
+        self._tape = None
+        self._stats = None
 
     @property
     def vars(self):
@@ -369,54 +659,208 @@ class VectorExpression:
     @vars.setter
     def vars(self, varlist):
         self._vars = varlist
-        self._expressions = self._match_vars_to_expressions(varlist, self._expressions.keys())  # This might not work
+        self._expressions = self._match_vars_to_expressions(varlist, self.expressions)
+        self._tape = None
+        self._stats = None
 
-    def eval(self, *args):
+    @property
+    def expressions(self):
+        """The output expressions, in order"""
+        return [e for e, _ in self._expressions]
+
+    @property
+    def params(self):
+        """The Params in the graphs of the output expressions"""
+        return _leaves(self.expressions)[0]
+
+    def batch_shape(self, *args, params=None):
+        """Broadcast shape of `args`, of the values bound to the Params and of the array constants
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: tuple[int]
+        """
+        leaves, arrays = _leaves(self.expressions)
+        with bind(params):
+            return sj.tape.batch_shape(*args, *[p.bound_value for p in leaves], *arrays)
+
+    def compile(self):
+        """Compile this VectorExpression into a flat Tape (cached until the varlist changes)
+
+        :return: Tape
+        """
+        if self._tape is None:
+            self._tape = sj.compile(self)
+        return self._tape
+
+    def stats(self):
+        """Graph statistics and cost estimates (cached until the varlist changes)
+
+        :return: GraphStats
+        """
+        if self._stats is None:
+            self._stats = sj.graph_stats(self)
+        return self._stats
+
+    def jacobian_expr(self):
+        """Jacobian of this VectorExpression as new Expressions, sharing its subexpressions
+
+        :return: VectorExpression -- The m * n entries of the Jacobian in row-major order
+        """
+        return sj.jacobian_expr(self)
+
+    def eval(self, *args, params=None, out=None):
         """Evaluate at `args`
 
         :param args: tuple[Number] -- Point to evaluate at
-        :return: 'res' Number -- Result of evaluation
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: np.ndarray | None -- Buffer of shape batch + (m,) to write the values into
+        :return: 'res' Number -- Result of evaluation (`out` if given)
         """
-        return [e(*self._get_expr_args(e, *args)) for e in self._expressions]
-
-    def deriv(self, *args, mode='forward', var=None):
+        with bind(params):
+            if out is None:
+                return [e(*self._get_expr_args(v, *args)) for e, v in self._expressions]
+            for k, (e, v) in enumerate(self._expressions):
+                out[..., k] = e(*self._get_expr_args(v, *args))
+            return out
+
+    def deriv(self, *args, mode='forward', var=None, params=None, out=None):
         """Differentiate at `args`
 
         :param args: tuple[Number] -- Point to evaluate at
-        :param mode: str -- One of {'forward', 'reverse', 'auto'}
+        :param mode: str -- One of {'forward', 'reverse', 'auto'} ('auto' picks the cheaper mode
+            for each output expression, which is differentiated on its own)
         :param var: Var | None -- Variable with respect to which the derivative is taken
-        :return: 'res' {Number} -- The derivative
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: np.ndarray | None -- Buffer of shape batch + (m, n) (batch + (m, 1)
+            with `var`) to write the Jacobian into
+        :return: 'res' {Number} -- The derivative (`out` if given)
         """
-        if var:
-            res = np.zeros((len(self._expressions), 1))
+        with bind(params):
+            res = self._jacobian_buffer(args, var, out)
+            for k, (e, v) in enumerate(self._expressions):
+                expr_args = self._get_expr_args(v, *args)
+                if var is not None:
+                    if isinstance(e, Var) and e.depends_on(var):
+                        res[..., k, 0] = self._component_deriv(e, expr_args, mode, var)
+                elif v:
+                    self._set_row(res, k, v, self._component_deriv(e, expr_args, mode))
+            return res
+
+    def specialize(self, values):
+        """A VectorExpression with some variables fixed and the subexpressions depending only on them folded
+
+        :param values: dict[Var, Number | np.ndarray] -- Values of the fixed variables
+        :return: VectorExpression -- VectorExpression of the remaining variables (in the same order)
+        """
+        return sj.specialize(self, values)
+
+    def jacobian(self, *args, mode='auto', params=None, out=None):
+        """Jacobian at `args` from the compiled Tape, vectorized over batches of points
+
+        Unlike `deriv`, which differentiates each output expression separately,
+        every sweep runs over all outputs and all points of the batch at once.
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points), in the order of self.vars
+        :param mode: str -- One of {'forward', 'reverse', 'auto'} ('auto' picks the cheaper mode)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: np.ndarray | None -- Buffer of shape batch + (m, n) to write the Jacobian into
+        :return: np.ndarray -- Array of shape batch + (m, n) (`out` if given)
+        """
+        if mode == 'auto':
+            mode = self.stats().best_mode()
+        return self.compile().deriv(*args, mode=mode, params=params, out=out)
+
+    def value_and_jacobian(self, *args, mode='forward', params=None):
+        """Evaluate and differentiate at `args`, traversing each output expression once
+
+        :param args: tuple[Number] -- Point to evaluate at
+        :param mode: str -- One of {'forward', 'reverse', 'auto'} (as in `deriv`)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: (list, np.ndarray) -- The values (as `eval`) and the Jacobian (as `deriv`)
+        """
+        with bind(params):
+            res = self._jacobian_buffer(args, None, None)
+            values = []
+            for k, (e, v) in enumerate(self._expressions):
+                expr_args = self._get_expr_args(v, *args)
+                if isinstance(e, Expression):
+                    value, expr_deriv = e.value_and_grad(*expr_args, mode=mode)
+                else:
+                    value, expr_deriv = e(*expr_args), e.deriv(*expr_args)
+                values.append(value)
+                if v:
+                    self._set_row(res, k, v, expr_deriv)
+            return values, res
+
+    def _jacobian_buffer(self, args, var, out):
+        """Zeroed Jacobian of shape batch + (m, n) (batch + (m, 1) with `var`), reusing `out` if given"""
+        expected = self.batch_shape(*args) + (len(self._expressions), 1 if var is not None else len(self._vars))
+        if out is None:
+            return np.zeros(expected)
+        assert out.shape == expected, f'Output buffer has shape {out.shape} (required: {expected})'
+        out[...] = 0
+        return out
+
+    @staticmethod
+    def _set_row(res, k, expr_vars, expr_deriv):
+        """Write the gradient of the `k`-th output with respect to its own vars into the Jacobian"""
+        if np.ndim(expr_deriv) < res.ndim - 1:  # Single variable, without a trailing variable axis
+            res[..., k, expr_vars[0]] = expr_deriv
         else:
-            res = np.zeros((len(self._expressions), len(self._vars)))
-        for i, (e, v) in enumerate(self._expressions.items()):
-            if var and v != var:
-                continue
-            expr_args = self._get_expr_args(e, *args)
-            expr_deriv = e.deriv(*expr_args, mode=mode, var=var)
-            res[i, :] = self._parse_results(expr_deriv, v)
-        return res
+            for j, idx in enumerate(expr_vars):
+                res[..., k, idx] = expr_deriv[..., j]
+
+    @staticmethod
+    def _component_deriv(expr, expr_args, mode, var=None):
+        """Derivative of one output (an Expression, or a Var passed straight through)"""
+        if isinstance(expr, Expression):
+            return expr.deriv(*expr_args, mode=mode, var=var)
+        return 1 if var is None or var is expr else 0
+
+    def jvp(self, x, v, params=None):
+        """Jacobian-vector product J.v (one forward sweep, independent of the number of variables)
+
+        :param x: tuple[Number] -- Point to differentiate at, in the order of self.vars
+        :param v: tuple[Number] -- Direction, in the order of self.vars
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- J.v, one entry per output
+        """
+        return self.compile().jvp(x, v, params=params)
+
+    def taylor(self, x, v, order, params=None):
+        """Derivatives of t -> f(x + t v) at t = 0 up to `order` (Taylor mode, O(order^2) per node)
 
-    def _get_expr_args(self, expr, *args):
-        """Get correct ordering of arguments for this Expression `expr`"""
-        expr_vars_idx = self._expressions.get(expr, [])
+        :param x: tuple[Number] -- Point to differentiate at, in the order of self.vars
+        :param v: tuple[Number] -- Direction, in the order of self.vars
+        :param order: int -- Highest derivative
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- Array of shape batch + (m, order + 1), entry k being the k-th derivative
+        """
+        return self.compile().taylor(x, v, order, params=params)
+
+    def vjp(self, x, u, params=None):
+        """Vector-Jacobian product u.J (one reverse sweep, independent of the number of outputs)
+
+        :param x: tuple[Number] -- Point to differentiate at, in the order of self.vars
+        :param u: tuple[Number] -- Output weights, one per output
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- u.J, one entry per variable
+        """
+        return self.compile().vjp(x, u, params=params)
+
+    @staticmethod
+    def _get_expr_args(expr_vars_idx, *args):
+        """Get correct ordering of arguments for an Expression whose Vars are at `expr_vars_idx` in the varlist"""
         res = []
         for idx in expr_vars_idx:
             res.append(args[idx])
         return res
 
-    def _parse_results(self, result_set, expr_vars):
-        """Parse the reuslts into the correct output shape for this VectorExpression"""
-        res = np.zeros(len(self._vars))
-        res[expr_vars] = result_set
-        return res
-
     @staticmethod
     def _match_vars_to_expressions(varlist, expressions):
-        """Return a dictionary mapping Expression objects to their respective Var's"""
-        return {expr: VectorExpression._get_var_order(varlist, expr) for expr in expressions}
+        """Return a list pairing Expression objects with their respective Var's"""
+        return [(expr, VectorExpression._get_var_order(varlist, expr)) for expr in expressions]
 
     @staticmethod
     def _get_var_order(varlist, expr):
@@ -427,10 +871,10 @@ class VectorExpression:
         return var_order
 
     def __call__(self, *args, **kwargs):
-        return self.eval(*args)
+        return self.eval(*args, **kwargs)
 
     def __repr__(self):
-        return '(' + ', '.join([str(e) for e in self._expressions.keys()]) + ')'
+        return '(' + ', '.join([str(e) for e in self.expressions]) + ')'
 
     def __str__(self):
         return repr(self)
@@ -438,10 +882,63 @@ class VectorExpression:
     def __eq__(self, other):
         if not isinstance(other, VectorExpression):
             return False
-        for a, b in zip(self._expressions.keys(), other._expressions.keys()):
-            if a != b:
-                return False
-        return True
+        mine, theirs = self.expressions, other.expressions
+        return len(mine) == len(theirs) and all(_same_structure(a, b) for a, b in zip(mine, theirs))
+
+    def __hash__(self):
+        return hash(tuple(e.fingerprint for e in self.expressions))
+
+
+def _leaves(outputs):
+    """The Params and the array constants in the graphs of `outputs`
+
+    :param outputs: list[Var | Number] -- Root nodes
+    :return: (list[Param], list[np.ndarray])
+    """
+    params, arrays = [], []
+    for node in sj.tape.toposort(outputs):
+        if isinstance(node, Param):
+            params.append(node)
+        elif isinstance(node, Expression):
+            arrays += [p for p in node.parents if isinstance(p, np.ndarray)]
+    return params, arrays
+
+
+_bindings = threading.local()
+
+
+def _bindings_stack():
+    """The `params` mappings of the enclosing `bind` blocks of the current thread, innermost last"""
+    if not hasattr(_bindings, 'stack'):
+        _bindings.stack = []
+    return _bindings.stack
+
+
+@contextmanager
+def bind(params):
+    """Bind values to Params for the duration of a `with` block
+
+    The values are only seen by the current thread, nested blocks take
+    precedence, and nothing is written to the Params, so concurrent or
+    interleaved evaluations each see their own data.
+
+    Usage:
+        with bind({X: xs}):
+            tape.eval(1., 0.)
+
+    :param params: dict[Param, Number | np.ndarray] | None -- Value of each Param
+    """
+    if not params:
+        yield
+        return
+    for param in params:
+        assert isinstance(param, Param), f'{param} is not a Param'
+    stack = _bindings_stack()
+    stack.append(params)
+    try:
+        yield
+    finally:
+        stack.pop()
 
 
 def get_input_args(expression, varlist, *args):
@@ -457,3 +954,128 @@ def get_input_args(expression, varlist, *args):
     input_args = [args[varlist.index(parent_var)] for parent_var in expression.vars]
     return input_args
 
+
+
+# Length above which `str` names the shared subexpressions of an Expression
+STR_LIMIT = 10000
+
+
+class _Placeholder:
+    """Stands for the `index`-th parent in the rendering template of an operation"""
+    def __init__(self, index):
+        self.index = index
+
+    def __str__(self):
+        return f'\x00{self.index}\x00'
+
+
+def _template(node):
+    """Rendering of `node` as text pieces and parent references (the parents themselves)"""
+    parents = [node.parent1] if node.parent2 is None else [node.parent1, node.parent2]
+    placeholders = [_Placeholder(i) if isinstance(p, Var) else p for i, p in enumerate(parents)]
+    pieces = node.operation.opstr(*placeholders).split('\x00')
+    # Odd positions hold the indices of the parents
+    return [piece if k % 2 == 0 else parents[int(piece)] for k, piece in enumerate(pieces)]
+
+
+def render(expr, dag=None):
+    """Render an Expression without recursion, optionally naming its shared subexpressions
+
+    Every node is rendered once from its template, so the cost is linear in
+    the size of the output (and in the size of the graph for the DAG-aware
+    rendering).
+
+    :param expr: Expression -- The expression to render
+    :param dag: bool | None -- Whether to name shared subexpressions
+        (default: only if the expanded rendering is longer than `STR_LIMIT` characters)
+    :return: str
+    """
+    order = sj.tape.toposort([expr])
+    templates = {id(node): _template(node) for node in order if isinstance(node, Expression)}
+    if dag is None:
+        lengths = {}
+        for node in order:
+            if isinstance(node, Expression):
+                lengths[id(node)] = sum(len(piece) if isinstance(piece, str) else lengths[id(piece)]
+                                        for piece in templates[id(node)])
+            else:
+                lengths[id(node)] = len(str(node))
+        dag = lengths[id(expr)] > STR_LIMIT
+    names = {}
+    if dag:
+        uses = {}
+        for node in order:
+            for piece in templates.get(id(node), []):
+                if isinstance(piece, Expression):
+                    uses[id(piece)] = uses.get(id(piece), 0) + 1
+        for node in order:
+            if uses.get(id(node), 0) > 1:
+                names[id(node)] = f'_{len(names) + 1}'
+
+    def expand(node):
+        out = []
+        stack = [node]
+        while stack:
+            item = stack.pop()
+            if isinstance(item, str):
+                out.append(item)
+            elif item is not node and id(item) in names:
+                out.append(names[id(item)])
+            elif isinstance(item, Expression):
+                stack.extend(reversed(templates[id(item)]))
+            else:
+                out.append(str(item))
+        return ''.join(out)
+
+    body = expand(expr)
+    if not names:
+        return body
+    definitions = [f'{names[id(node)]} = {expand(node)}' for node in order if id(node) in names]
+    return f'{body} where ' + '; '.join(definitions)
+
+
+def _fingerprint(node):
+    """Structural hash of a parent: Vars and Expressions carry their own, constants hash their value"""
+    if isinstance(node, Var):
+        return node.fingerprint
+    if isinstance(node, np.ndarray):
+        return hash((np.ndarray, node.shape, node.dtype.str, node.tobytes()))
+    return hash((type(node), node))
+
+
+def _same_structure(a, b):
+    """Whether `a` and `b` are the same graph: same operations, same Vars and Params, equal constants
+
+    Fingerprints only reject quickly, so hash collisions (e.g. hash(-1) == hash(-2)) never make
+    different graphs equal.
+    """
+    stack = [(a, b)]
+    seen = set()
+    while stack:
+        a, b = stack.pop()
+        if a is b or (id(a), id(b)) in seen:
+            continue
+        if isinstance(a, Expression) and isinstance(b, Expression):
+            if a.fingerprint != b.fingerprint or a.operation is not b.operation:
+                return False
+            seen.add((id(a), id(b)))
+            stack.append((a.parent1, b.parent1))
+            stack.append((a.parent2, b.parent2))
+        elif isinstance(a, Var) or isinstance(b, Var):
+            return False  # Distinct leaves, or a leaf and an Expression
+        elif isinstance(a, np.ndarray) or isinstance(b, np.ndarray):
+            if not (isinstance(a, np.ndarray) and isinstance(b, np.ndarray) and a.shape == b.shape
+                    and a.dtype == b.dtype and a.tobytes() == b.tobytes()):
+                return False
+        elif type(a) is not type(b) or a != b:
+            return False
+    return True
+
+
+def _deps(*nodes):
+    """Union of the dependency bitsets of `nodes` (0 for numeric constants and None)"""
+    res = 0
+    for node in nodes:
+        if isinstance(node, Var):
+            res |= node.deps
+    return res
@@ -0,0 +1,204 @@
+"""
+fusion.py
+
+Fusion of chains of elementwise operations in a compiled Tape.
+
+Classes:
+    FusedChain
+        - A chain of elementwise operations applied to a single input, used as
+          one instruction of a Tape
+        - Evaluates the chain in one temporary array (in-place ufuncs) and
+          computes its derivative in the same sweep
+
+Functions:
+    fuse
+        - Rewrites a Tape so every chain of single-consumer elementwise
+          instructions becomes one FusedChain instruction
+"""
+import copy
+from numbers import Number
+
+import numpy as np
+
+from superjacob import taylor as ts
+
+
+class FusedChain:
+    """A chain of elementwise operations on one input, behaving like an operation.
+
+    Each step is a unary operation, or a binary operation whose other operand
+    is a numeric constant. The first step allocates the result array and the
+    following steps overwrite it with their ufunc (`ufunc(v, out=v)`), so the
+    whole chain needs one temporary instead of one per step. The derivative is
+    the product of the local partials of the steps, accumulated in the same
+    sweep (`value_and_partial`) without keeping the intermediate values.
+    The partial of the last sweep is kept with the value it belongs to, so
+    `deriv` and `reverse` at that value do not run the chain again (a Tape
+    computes it during its forward sweep, see `Tape.forward`).
+
+    Attributes:
+        steps: list[tuple] -- (operation, constant, position) for each step;
+            `position` is the parent index of the chain value (None for unary
+            operations) and `constant` the other operand
+        cost: int -- Sum of the costs of the steps
+        deriv_cost: int -- Sum of the derivative costs of the steps
+    """
+    ufunc = None
+
+    def __init__(self, steps):
+        """Initialize a FusedChain
+
+        :param steps: list[tuple] -- (operation, constant, position) for each step
+        """
+        self.steps = steps
+        self.cost = sum(op.cost for op, _, _ in steps)
+        self.deriv_cost = sum(op.deriv_cost + 1 for op, _, _ in steps)
+        self.__name__ = 'Fused(' + ', '.join(op.__name__ for op, _, _ in steps) + ')'
+        self._last = None  # (value, partial) of the last sweep
+
+    def eval(self, num):
+        """Evaluate the chain at `num`"""
+        v = num
+        owned = False  # Whether `v` is a temporary of this kernel that may be overwritten
+        for op, const, position in self.steps:
+            args = _step_args(v, const, position)
+            if owned and op.ufunc is not None:
+                op.ufunc(*args, out=v)
+            else:
+                res = op.eval(*args)
+                owned = owned or (res is not num and _writable(res))
+                v = res
+        return v
+
+    def value_and_partial(self, num, value=None):
+        """Value of the chain and its derivative with respect to `num`, in one sweep
+
+        :param num: Number | np.ndarray -- Input of the chain
+        :param value: Number | np.ndarray | None -- Value of the chain, if already computed
+            (the last step then reuses it)
+        :return: (Number | np.ndarray, Number | np.ndarray)
+        """
+        v = num
+        partial = None
+        owned = False  # Local partials may alias values or inputs: only overwrite our own products
+        last = len(self.steps) - 1
+        for i, (op, const, position) in enumerate(self.steps):
+            args = _step_args(v, const, position)
+            res = value if i == last and value is not None else op.eval(*args)
+            local = op.reverse(*args, value=res)
+            if position is not None:
+                local = local[position]
+            if partial is None:
+                partial = local
+            elif owned and np.shape(partial) == np.broadcast(partial, local).shape:
+                partial *= local
+            else:
+                partial = partial * local
+                owned = _writable(partial)
+            v = res
+        self._last = (v, partial)
+        return v, partial
+
+    def reverse(self, num, value=None):
+        """Derivative of the chain with respect to its input (cached if `value` comes from the last sweep)"""
+        last = self._last
+        if value is not None and last is not None and last[0] is value:
+            return last[1]
+        return self.value_and_partial(num, value=value)[1]
+
+    def deriv(self, val, der, value=None):
+        """Forward mode derivative of the chain"""
+        return self.reverse(val, value=value) * der
+
+    def taylor(self, coeffs):
+        """Taylor coefficients of the chain, given those of its input"""
+        for op, const, position in self.steps:
+            if position is not None:
+                const = ts.constant(const, len(coeffs) - 1, coeffs.ndim - 1)
+            coeffs = op.taylor(*_step_args(coeffs, const, position))
+        return coeffs
+
+    def __repr__(self):
+        return self.__name__
+
+
+def fuse(tape):
+    """A copy of `tape` in which chains of elementwise instructions are fused
+
+    A chain is a sequence of instructions, each being the only consumer of the
+    previous one (which must not be an output), that apply a unary operation
+    or a binary operation with a numeric constant operand. Slots inside a chain
+    are no longer computed.
+
+    :param tape: Tape -- The compiled expression
+    :return: Tape -- The fused Tape (the original is not modified)
+    """
+    consumers = [0] * len(tape)
+    for _, _, parents in tape.instructions:
+        for p in set(parents):
+            consumers[p] += 1
+    for out in tape.outputs:
+        consumers[out] += 1
+    constants = {slot: value for slot, value in tape.constants if isinstance(value, Number)}
+
+    original = {instruction[0]: instruction for instruction in tape.instructions}
+    instructions = []
+    pending = {}  # Last slot of a chain not emitted yet -> (input slot, steps)
+
+    def emit(slot, chain_input, steps):
+        if len(steps) == 1:
+            instructions.append(original[slot])
+        else:
+            instructions.append((slot, FusedChain(steps), (chain_input,)))
+
+    for slot, op, parents in tape.instructions:
+        step = _as_step(op, parents, constants)
+        if step is None:
+            for p in parents:
+                if p in pending:
+                    emit(p, *pending.pop(p))
+            instructions.append((slot, op, parents))
+            continue
+        (op, const, position), chain_input = step
+        if chain_input in pending:
+            chain_input, steps = pending.pop(chain_input)
+            steps = steps + [(op, const, position)]
+        else:
+            steps = [(op, const, position)]
+        if consumers[slot] == 1 and slot not in tape.outputs:
+            pending[slot] = (chain_input, steps)
+        else:
+            emit(slot, chain_input, steps)
+    for slot, chain in pending.items():  # Not reachable from an output
+        emit(slot, *chain)
+
+    fused = copy.copy(tape)
+    fused.instructions = instructions
+    fused._cones = {}
+    fused._plans = {}
+    fused._fused = fused
+    return fused
+
+
+def _as_step(op, parents, constants):
+    """The chain step of an instruction and its chain input slot, or None if it is not elementwise on one input"""
+    if len(parents) == 1:
+        return (op, None, None), parents[0]
+    is_const = [p in constants for p in parents]
+    if is_const == [False, True]:
+        return (op, constants[parents[1]], 0), parents[0]
+    if is_const == [True, False]:
+        return (op, constants[parents[0]], 1), parents[1]
+    return None
+
+
+def _step_args(v, const, position):
+    """Arguments of a step applied to the chain value `v`"""
+    if position is None:
+        return (v,)
+    return (v, const) if position == 0 else (const, v)
+
+
+def _writable(value):
+    """Whether `value` is a floating point array that ufuncs can overwrite"""
+    return isinstance(value, np.ndarray) and value.dtype.kind in 'fc' and value.flags.writeable
@@ -0,0 +1,157 @@
+"""
+memory.py
+
+Memory planning for evaluating a Tape on large batches.
+
+Classes:
+    MemoryPlan
+        - Liveness analysis of the intermediates of a Tape for one input signature
+        - Assigns intermediates to a small pool of reused buffers, written in
+          place with the `ufunc` of each operation
+        - Reports the peak memory of the intermediates with and without the plan
+"""
+import numpy as np
+
+from superjacob.expression import bind
+
+
+class MemoryPlan:
+    """A buffer assignment for evaluating a Tape at inputs of a fixed signature.
+
+    `Tape.forward` keeps the value of every slot until the end of the call
+    (reverse mode needs them). For evaluation alone, a value can be dropped
+    as soon as its last consumer has run. The plan finds that last use for
+    every intermediate and hands the buffer of a dead intermediate to the next
+    instruction producing an array of the same shape and dtype. Instructions
+    whose operation has a `ufunc` write straight into their buffer
+    (`ufunc(..., out=buffer)`); the buffer of a parent used for the last time
+    may be the output buffer itself, which is legal for elementwise ufuncs.
+    Other instructions allocate as usual and their result is dropped after its
+    last use.
+
+    Plans depend on the shapes and dtypes of the inputs and of the values bound
+    to Params: use `Tape.memory_plan`, which caches one plan per signature.
+
+    Attributes:
+        tape: Tape -- The Tape being evaluated
+        signature: tuple -- Shapes and dtypes of the inputs and Params the plan was built for
+        assignments: list[int | None] -- Buffer of each instruction (None if not planned)
+        naive_bytes: int -- Peak bytes of intermediates held by `Tape.forward`
+        peak_bytes: int -- Peak bytes of intermediates with the plan (buffer pool included)
+        n_in_place: int -- Number of instructions writing into the buffer of one of their parents
+    """
+    def __init__(self, tape, *args, params=None):
+        """Plan the evaluation of `tape` at inputs like `args`
+
+        The Tape is run once at `args` to find the shape and dtype of every intermediate.
+
+        :param tape: Tape -- The compiled expression
+        :param args: tuple[Number | np.ndarray] -- Representative point (or batch of points)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        """
+        self.tape = tape
+        with bind(params):
+            values = tape.forward(*args)
+            self.signature = signature(tape, args)
+        instructions = tape.instructions
+        outputs = set(tape.outputs)
+        produced = {slot for slot, _, _ in instructions}
+
+        last_use = {}
+        for k, (_, _, parents) in enumerate(instructions):
+            for p in parents:
+                last_use[p] = k
+
+        self.assignments = [None] * len(instructions)
+        self.frees = [[] for _ in instructions]  # Slots whose value is dead after each instruction
+        specs = []  # (shape, dtype) of each buffer
+        free = {}  # (shape, dtype) -> indices of the buffers not holding a live value
+        slot_buffer = {}
+        pool_bytes = live_bytes = 0
+        self.naive_bytes = self.peak_bytes = self.n_in_place = 0
+        for k, (slot, op, parents) in enumerate(instructions):
+            # Parents used for the last time are released first, so their buffer can hold the output
+            released = []
+            for p in set(parents):
+                if p in produced and p not in outputs and last_use[p] == k:
+                    self.frees[k].append(p)
+                    if p in slot_buffer:
+                        released.append(slot_buffer[p])
+                        free.setdefault(specs[slot_buffer[p]], []).append(slot_buffer[p])
+                    else:
+                        live_bytes -= _nbytes(values[p])
+            value = values[slot]
+            if slot in outputs:
+                continue
+            self.naive_bytes += _nbytes(value)
+            if self._can_write(op, value, [values[p] for p in parents]):
+                spec = (value.shape, value.dtype)
+                if free.get(spec):
+                    buffer = free[spec].pop()
+                    self.n_in_place += buffer in released
+                else:
+                    buffer = len(specs)
+                    specs.append(spec)
+                    pool_bytes += value.nbytes
+                self.assignments[k] = buffer
+                slot_buffer[slot] = buffer
+            else:
+                live_bytes += _nbytes(value)
+            self.peak_bytes = max(self.peak_bytes, pool_bytes + live_bytes)
+        self.buffers = [np.empty(shape, dtype) for shape, dtype in specs]
+
+    @staticmethod
+    def _can_write(op, value, parent_values):
+        """Whether `op` can write `value` into a pooled buffer with its ufunc"""
+        if op.ufunc is None or not isinstance(value, np.ndarray) or value.dtype.kind not in 'fc':
+            return False
+        # Integer arrays would follow the integer semantics of the ufunc (e.g. np.reciprocal)
+        return all(not isinstance(v, np.ndarray) or v.dtype.kind in 'fc' for v in parent_values)
+
+    def eval(self, *args, params=None, out=None):
+        """Evaluate the outputs at `args` following the plan
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points) matching `self.signature`
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: np.ndarray | None -- Buffer to write the value into
+        :return: Number | np.ndarray -- As `Tape.eval`
+        """
+        with bind(params):
+            tape = self.tape
+            values = tape._load_inputs(args)
+            assert signature(tape, args) == self.signature, \
+                'The inputs do not match the shapes and dtypes the memory plan was built for'
+            buffers = self.buffers
+            for k, (slot, op, parents) in enumerate(tape.instructions):
+                buffer = self.assignments[k]
+                if buffer is None:
+                    values[slot] = op.eval(*[values[p] for p in parents])
+                else:
+                    values[slot] = op.ufunc(*[values[p] for p in parents], out=buffers[buffer])
+                for p in self.frees[k]:
+                    values[p] = None
+            return tape._collect_values(values, tape.batch_shape(*args), out)
+
+    @property
+    def buffer_bytes(self):
+        """Bytes held by the buffer pool"""
+        return sum(buffer.nbytes for buffer in self.buffers)
+
+    def __repr__(self):
+        return f'MemoryPlan({len(self.buffers)} buffers, naive_bytes={self.naive_bytes}, ' \
+               f'peak_bytes={self.peak_bytes}, n_in_place={self.n_in_place})'
+
+
+def signature(tape, args):
+    """Shapes and dtypes of `args` and of the values bound to the Params of `tape`
+
+    :param tape: Tape -- The compiled expression
+    :param args: tuple[Number | np.ndarray] -- The inputs
+    :return: tuple
+    """
+    return tuple((np.shape(a), np.result_type(a)) for a in list(args) + [p.bound_value for _, p in tape.params])
+
+
+def _nbytes(value):
+    """Bytes held by an array value (0 for numbers)"""
+    return value.nbytes if isinstance(value, np.ndarray) else 0
@@ -3,6 +3,8 @@ from abc import ABC
 import numpy as np
 from numbers import Number
 from .expression import Var, Expression
+from .dual import Dual, apply
+from . import taylor as ts
 
 
 class OperationType(type):
@@ -12,35 +14,65 @@ class OperationType(type):
 
 class BaseOperation:
     __metaclass__ = OperationType
+    # Approximate flop counts, used by superjacob.analysis to estimate the cost of a graph:
+    # `cost` for evaluating the operation, `deriv_cost` for its local derivatives
+    cost = 1
+    deriv_cost = 2
+    # NumPy ufunc computing `eval` exactly (for floating point arrays), if any. Lets the memory
+    # planner of superjacob.memory write results into reused buffers with `out=`
+    ufunc = None
 
     @classmethod
     def check_type(cls, *args):
         """
         :param args: tuple(Object) -- Parameters to check
         :return: None
-        :raises: AssertionError if all elements of args are not a Var or Number
+        :raises: AssertionError if all elements of args are not a Var, Number or array
         """
         for x in args:
-            if not isinstance(x, Var) and not isinstance(x, Number):
+            if not isinstance(x, (Var, Number, np.ndarray)):
                 raise TypeError("Not a number/Variable/Expression")
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
         """
         :param args: numbers -- values of the parent nodes
+        :param value: Number | None -- value of this node, if already computed
+            (rules use it instead of recomputing transcendental functions)
         :return: numbers -- the reverse mode derivative at the current node
         """
         raise NotImplementedError()
 
+    @classmethod
+    def partials(cls, *args, value=None):
+        """Symbolic counterpart of `reverse`, used to build derivatives as Expressions
+
+        :param args: Var | Number -- the parent nodes
+        :param value: Expression -- this node (rules use it like the value in `reverse`)
+        :return: Var | Number -- the local partial derivatives, as Expressions or numbers
+        """
+        raise NotImplementedError()
+
+    @classmethod
+    def taylor(cls, *args):
+        """Taylor mode: propagate truncated power series (see superjacob.taylor)
+
+        :param args: np.ndarray -- Taylor coefficients of the parents, of shape (K + 1,) + batch
+        :return: np.ndarray -- Taylor coefficients of this node
+        """
+        raise NotImplementedError()
+
 
 class UnaryOperation(BaseOperation, ABC):
     @classmethod
     def expr(cls, expr):
         """Create a new expression
 
-        :param expr: Var | Number -- Parent expression
-        :return: Var | Number -- new expression
+        :param expr: Var | Number | Dual -- Parent expression
+        :return: Var | Number | Dual -- new expression (a Dual if `expr` is a Dual)
         """
+        if isinstance(expr, Dual):
+            return apply(cls, expr)
         cls.check_type(expr)
         return Expression(expr, None, cls)
 
@@ -54,11 +86,12 @@ class UnaryOperation(BaseOperation, ABC):
         raise NotImplementedError()
 
     @classmethod
-    def deriv(cls, val, der):
+    def deriv(cls, val, der, value=None):
         """Evaluate the derivative at value = `val` and derivative = `deriv`
 
         :param val: Number -- Value of the argument
         :param der: Number -- Value of the derivative of the argument
+        :param value: Number | None -- Value of the operation at `val`, if already computed
         :return: Number -- The derivative
         """
         raise NotImplementedError()
@@ -80,8 +113,10 @@ class BinaryOperation(BaseOperation, ABC):
 
         :param expr1: Var | Number -- Expression or number to become parent 1
         :param expr2: Var | Number -- Expression or number to become parent 2
-        :return:
+        :return: Expression | Dual -- a Dual if either argument is a Dual
         """
+        if isinstance(expr1, Dual) or isinstance(expr2, Dual):
+            return apply(cls, expr1, expr2)
         cls.check_type(expr1, expr2)
         return Expression(expr1, expr2, cls)
 
@@ -96,13 +131,14 @@ class BinaryOperation(BaseOperation, ABC):
         raise NotImplementedError()
 
     @classmethod
-    def deriv(cls, num1, deriv1, num2, deriv2):
+    def deriv(cls, num1, deriv1, num2, deriv2, value=None):
         """Differentiate the expression at the given values
 
         :param num1: Number -- Value of parent 1
         :param deriv1: Number -- Value of derivative of parent 1
         :param num2: Number -- Value of parent 2
         :param deriv2: Number -- Value of parent 2
+        :param value: Number | None -- Value of the operation, if already computed
         :return:
         """
         raise NotImplementedError()
@@ -119,6 +155,10 @@ class BinaryOperation(BaseOperation, ABC):
 
 
 class Add(BinaryOperation):
+    cost = 1
+    deriv_cost = 1
+    ufunc = np.add
+
     @classmethod
     def eval(cls, num1, num2):
         # super().check_type(num1)
@@ -126,66 +166,114 @@ class Add(BinaryOperation):
         return num1 + num2
 
     @classmethod
-    def deriv(cls, num1, deriv1, num2, deriv2):
+    def deriv(cls, num1, deriv1, num2, deriv2, value=None):
         return deriv1 + deriv2
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
+        return 1, 1
+
+    @classmethod
+    def partials(cls, *args, value=None):
         return 1, 1
 
+    @classmethod
+    def taylor(cls, *args):
+        return args[0] + args[1]
+
     @classmethod
     def opstr(cls, expr1, expr2):
         return f'{str(expr1)} + {str(expr2)}'
 
 
 class Sub(BinaryOperation):
+    cost = 1
+    deriv_cost = 1
+    ufunc = np.subtract
+
     @classmethod
     def eval(cls, num1, num2):
         return num1 - num2
 
     @classmethod
-    def deriv(cls, num1, deriv1, num2, deriv2):
+    def deriv(cls, num1, deriv1, num2, deriv2, value=None):
         return deriv1 - deriv2
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
+        return 1, -1
+
+    @classmethod
+    def partials(cls, *args, value=None):
         return 1, -1
 
+    @classmethod
+    def taylor(cls, *args):
+        return args[0] - args[1]
+
     @classmethod
     def opstr(cls, expr1, expr2):
         return f'{str(expr1)} - {str(expr2)}'
 
 
 class Mul(BinaryOperation):
+    cost = 1
+    deriv_cost = 3
+    ufunc = np.multiply
+
     @classmethod
     def eval(cls, num1, num2):
         return num1 * num2
 
     @classmethod
-    def deriv(cls, num1, deriv1, num2, deriv2):
+    def deriv(cls, num1, deriv1, num2, deriv2, value=None):
         return num1 * deriv2 + num2 * deriv1
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
+        return args[1], args[0]
+
+    @classmethod
+    def partials(cls, *args, value=None):
         return args[1], args[0]
 
+    @classmethod
+    def taylor(cls, *args):
+        return ts.mul(*args)
+
     @classmethod
     def opstr(cls, expr1, expr2):
         return f'{str(expr1)} * {str(expr2)}'
 
 
 class Div(BinaryOperation):
+    cost = 4
+    deriv_cost = 6
+    ufunc = np.divide
+
     @classmethod
     def eval(cls, num1, num2):
         return num1 / num2
 
     @classmethod
-    def deriv(cls, num1, deriv1, num2, deriv2):
-        return -(num1 * deriv2 - num2 * deriv1) / (num2 ** 2)
+    def deriv(cls, num1, deriv1, num2, deriv2, value=None):
+        if value is None:
+            value = num1 / num2
+        return (deriv1 - value * deriv2) / num2
 
     @classmethod
-    def reverse(cls, *args):
-        return 1 / args[1], - args[0] / args[1]**2
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = args[0] / args[1]
+        return 1 / args[1], - value / args[1]
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return 1 / args[1], -value / args[1]
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.div(*args)
 
     @classmethod
     def opstr(cls, expr1, expr2):
@@ -193,29 +281,208 @@ class Div(BinaryOperation):
 
 
 class Pow(BinaryOperation):
+    cost = 20
+    deriv_cost = 45
+
+    @classmethod
+    def expr(cls, expr1, expr2):
+        """Create a new expression, using a specialized operation when the exponent is a numeric constant
+
+        :param expr1: Var | Number -- Base
+        :param expr2: Var | Number -- Exponent
+        :return: Expression
+        """
+        if not isinstance(expr1, Dual) and not isinstance(expr2, Dual):
+            cls.check_type(expr1, expr2)
+        if isinstance(expr1, (Var, Dual)) and isinstance(expr2, Number) and not isinstance(expr2, (bool, complex)):
+            if expr2 == 2:
+                return Square.expr(expr1)
+            if expr2 == -1:
+                return Reciprocal.expr(expr1)
+            if float(expr2).is_integer():
+                return IntPow.expr(expr1, int(expr2))
+            return ConstPow.expr(expr1, expr2)
+        if isinstance(expr1, Dual) or isinstance(expr2, Dual):
+            return apply(cls, expr1, expr2)
+        return Expression(expr1, expr2, cls)
+
     @classmethod
     def eval(cls, num1, num2):
         return num1 ** num2
 
     @classmethod
-    def deriv(cls, num1, deriv1, num2, deriv2):
-        if num1 > 0:
-            result = np.exp(num2 * np.log(num1)) * (deriv2 * np.log(num1) + num2 * deriv1 / num1)
-            return result
-
-        # deal with the case when log(num1) is complex
-        else:
-            result = np.exp(num2 * np.log(num1 + 0j)) * (deriv2 * np.log(num1 + 0j) + num2 * deriv1 / num1)
-            return np.real(result)
+    def deriv(cls, num1, deriv1, num2, deriv2, value=None):
+        # deal with the case when log(num1) is complex elementwise, so batches of points work
+        with np.errstate(all='ignore'):
+            if value is None:
+                value = num1 ** num2
+            log = np.log(num1)
+            real = value * (deriv2 * log + num2 * deriv1 / num1)
+            cplx = np.exp(num2 * np.log(num1 + 0j)) * (deriv2 * np.log(num1 + 0j) + num2 * deriv1 / num1)
+        return _where(np.greater(num1, 0), real, np.real(cplx))
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
         a = args[0]  # parent 1 value -- base
         b = args[1]  # parent 2 value -- exponent
-        if a < 0:
-            return np.real((b * a ** (b-1), np.log(a+0j) * a ** b))
-        else:
-            return b * a ** (b-1), np.log(a) * a ** b
+        with np.errstate(all='ignore'):
+            if value is None:
+                value = a ** b
+            real = np.real((b * a ** (b-1), np.log(a) * value))
+            cplx = np.real((b * (a + 0j) ** (b-1), np.log(a+0j) * (a + 0j) ** b))
+        negative = np.less(a, 0)
+        return _where(negative, cplx[0], real[0]), _where(negative, cplx[1], real[1])
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        a, b = args
+        return b * a ** (b - 1), _sym(NLog, a) * value
+
+    @classmethod
+    def taylor(cls, *args):
+        a, b = args
+        if not np.any(b[1:]):  # Constant exponent
+            return ts.power(a, b[0])
+        return ts.exp(ts.mul(b, ts.log(a)))
+
+    @classmethod
+    def opstr(cls, expr1, expr2):
+        return f'{str(expr1)}^{str(expr2)}'
+
+
+class Square(UnaryOperation):
+    """x^2"""
+    cost = 1
+    deriv_cost = 2
+    ufunc = np.square
+
+    @classmethod
+    def eval(cls, num):
+        return num * num
+
+    @classmethod
+    def deriv(cls, val, der, value=None):
+        return 2 * val * der
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        return 2 * args[0]
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return 2 * args[0]
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.mul(args[0], args[0])
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'{str(expr)}^2'
+
+
+class Reciprocal(UnaryOperation):
+    """x^-1"""
+    cost = 4
+    deriv_cost = 5
+    ufunc = np.reciprocal
+
+    @classmethod
+    def eval(cls, num):
+        return 1 / num
+
+    @classmethod
+    def deriv(cls, val, der, value=None):
+        if value is None:
+            value = 1 / val
+        return -der * value * value
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = 1 / args[0]
+        return -value * value
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return -value * value
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.reciprocal(args[0])
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'{str(expr)}^-1'
+
+
+class IntPow(BinaryOperation):
+    """x^n for a constant integer n (the second parent)"""
+    cost = 6
+    deriv_cost = 8
+
+    @classmethod
+    def eval(cls, num1, num2):
+        return _int_pow(num1, num2)
+
+    @classmethod
+    def deriv(cls, num1, deriv1, num2, deriv2, value=None):
+        if num2 == 0:
+            return 0 * deriv1
+        return num2 * _int_pow(num1, num2 - 1) * deriv1
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        # The exponent is a constant, so its partial derivative is never used
+        a, n = args
+        if n == 0:
+            return 0 * a, 0
+        return n * _int_pow(a, n - 1), 0
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        a, n = args
+        if n == 0:
+            return 0, 0
+        return n * a ** (n - 1), 0
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.int_power(args[0], int(args[1][0].flat[0]))
+
+    @classmethod
+    def opstr(cls, expr1, expr2):
+        return f'{str(expr1)}^{str(expr2)}'
+
+
+class ConstPow(BinaryOperation):
+    """x^c for a constant, non-integer c (the second parent)"""
+    cost = 20
+    deriv_cost = 22
+    ufunc = np.power
+
+    @classmethod
+    def eval(cls, num1, num2):
+        return num1 ** num2
+
+    @classmethod
+    def deriv(cls, num1, deriv1, num2, deriv2, value=None):
+        return num2 * num1 ** (num2 - 1) * deriv1
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        # The exponent is a constant, so its partial derivative is never used
+        a, c = args
+        return c * a ** (c - 1), 0
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        a, c = args
+        return c * a ** (c - 1), 0
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.power(args[0], args[1][0])
 
     @classmethod
     def opstr(cls, expr1, expr2):
@@ -223,54 +490,128 @@ class Pow(BinaryOperation):
 
 
 class Sqrt(UnaryOperation):
+    cost = 4
+    deriv_cost = 6
+    ufunc = np.sqrt
+
     @classmethod
     def eval(cls, num1):
         return np.sqrt(num1)
 
     @classmethod
-    def deriv(cls, num1, deriv1):
-        return 1 / 2 / np.sqrt(num1) * deriv1
+    def deriv(cls, num1, deriv1, value=None):
+        if value is None:
+            value = np.sqrt(num1)
+        return 1 / 2 / value * deriv1
 
     @classmethod
-    def reverse(cls, *args):
-        a = args[0]
-        return 1 / 2 / np.sqrt(a)
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = np.sqrt(args[0])
+        return 1 / 2 / value
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return 0.5 / value
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.sqrt(args[0])
 
     @classmethod
     def opstr(cls, expr):
         return f'sqrt({str(expr)})'
     
 
+class Identity(UnaryOperation):
+    """x, used to turn a Var or a constant into an Expression"""
+    cost = 0
+    deriv_cost = 0
+    ufunc = np.positive
+
+    @classmethod
+    def eval(cls, num):
+        return num
+
+    @classmethod
+    def deriv(cls, val, der, value=None):
+        return der
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        return 1
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return 1
+
+    @classmethod
+    def taylor(cls, *args):
+        return args[0]
+
+    @classmethod
+    def opstr(cls, expr):
+        return str(expr)
+
+
 class Neg(UnaryOperation):
+    cost = 1
+    deriv_cost = 1
+    ufunc = np.negative
+
     @classmethod
     def eval(cls, num1):
         return -num1
 
     @classmethod
-    def deriv(cls, num1, deriv1):
+    def deriv(cls, num1, deriv1, value=None):
         return -deriv1
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
         return -1
 
+    @classmethod
+    def partials(cls, *args, value=None):
+        return -1
+
+    @classmethod
+    def taylor(cls, *args):
+        return -args[0]
+
     @classmethod
     def opstr(cls, expr):
         return f'-{str(expr)}'
 
     
 class Exp(UnaryOperation):
+    cost = 10
+    deriv_cost = 11
+    ufunc = np.exp
+
     @classmethod
     def eval(cls, num):
         return np.exp(num)
 
     @classmethod
-    def deriv(cls, num, deriv):
-        return deriv*np.exp(num)
+    def deriv(cls, num, deriv, value=None):
+        if value is None:
+            value = np.exp(num)
+        return deriv*value
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = np.exp(args[0])
+        return value
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return value
 
     @classmethod
-    def reverse(cls, *args):
-        return np.exp(args[0])
+    def taylor(cls, *args):
+        return ts.exp(args[0])
 
     @classmethod
     def opstr(cls, expr):
@@ -278,37 +619,68 @@ class Exp(UnaryOperation):
 
 
 class NLog(UnaryOperation):
+    cost = 10
+    deriv_cost = 4
+    ufunc = np.log
+
     @classmethod
     def eval(cls, num):
         return np.log(num)
 
     @classmethod
-    def deriv(cls, val, der):
+    def deriv(cls, val, der, value=None):
         return der / val
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
+        return 1 / args[0]
+
+    @classmethod
+    def partials(cls, *args, value=None):
         return 1 / args[0]
 
+    @classmethod
+    def taylor(cls, *args):
+        return ts.log(args[0])
+
     @classmethod
     def opstr(cls, expr):
         return f'ln({str(expr)})'
 
 
 class Log(BinaryOperation):
+    cost = 20
+    deriv_cost = 25
+
     @classmethod
     def eval(cls, num, base=np.e):
         return np.log(num) / np.log(base)
 
     @classmethod
-    def deriv(cls, val, der, base=np.e, base_der=0):
-        return (((der / val) * np.log(base)) - ((base_der / base) * np.log(val))) / (np.log(base)**2)
+    def deriv(cls, val, der, base=np.e, base_der=0, value=None):
+        log_base = np.log(base)
+        if value is None:
+            value = np.log(val) / log_base
+        # log(val) = value * log(base)
+        return der / (val * log_base) - (base_der / base) * value / log_base
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
         a = args[0]
         b = args[1]
-        return 1 / np.log(b) / a, - np.log(a) / np.log(b)**2 / b
+        log_base = np.log(b)
+        if value is None:
+            value = np.log(a) / log_base
+        return 1 / log_base / a, - value / log_base / b
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        log_base = _sym(NLog, args[1])
+        return 1 / log_base / args[0], -value / log_base / args[1]
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.div(ts.log(args[0]), ts.log(args[1]))
 
     @classmethod
     def opstr(cls, expr1, expr2):
@@ -317,53 +689,93 @@ class Log(BinaryOperation):
 
 
 class Sin(UnaryOperation):
+    cost = 10
+    deriv_cost = 11
+    ufunc = np.sin
+
     @classmethod
     def eval(cls, num):
         return np.sin(num)
 
     @classmethod
-    def deriv(cls, val, der):
+    def deriv(cls, val, der, value=None):
         return np.cos(val) * der
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
         return np.cos(args[0])
 
+    @classmethod
+    def partials(cls, *args, value=None):
+        return _sym(Cos, args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.sincos(args[0])[0]
+
     @classmethod
     def opstr(cls, expr):
         return f'sin({str(expr)})'
 
 
 class Cos(UnaryOperation):
+    cost = 10
+    deriv_cost = 11
+    ufunc = np.cos
+
     @classmethod
     def eval(cls, num):
         return np.cos(num)
 
     @classmethod
-    def deriv(cls, val, der):
+    def deriv(cls, val, der, value=None):
         return -np.sin(val) * der
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
         return -np.sin(args[0])
 
+    @classmethod
+    def partials(cls, *args, value=None):
+        return -_sym(Sin, args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.sincos(args[0])[1]
+
     @classmethod
     def opstr(cls, expr):
         return f'cos({str(expr)})'
 
 
 class Tan(UnaryOperation):
+    cost = 12
+    deriv_cost = 14
+    ufunc = np.tan
+
     @classmethod
     def eval(cls, num):
         return np.tan(num)
 
     @classmethod
-    def deriv(cls, val, der):
-        return der / (np.cos(val) ** 2)
+    def deriv(cls, val, der, value=None):
+        if value is None:
+            value = np.tan(val)
+        return der * (1 + value * value)
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = np.tan(args[0])
+        return 1 + value * value
 
     @classmethod
-    def reverse(cls, *args):
-        return 1 / (np.cos(args[0]) ** 2)
+    def partials(cls, *args, value=None):
+        return 1 + value * value
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.div(*ts.sincos(args[0]))
 
     @classmethod
     def opstr(cls, expr):
@@ -371,17 +783,32 @@ class Tan(UnaryOperation):
 
 
 class Csc(UnaryOperation):
+    cost = 12
+    deriv_cost = 25
+
     @classmethod
     def eval(cls, num):
         return 1/np.sin(num)
 
     @classmethod
-    def deriv(cls, val, der):
-        return -der*(1/np.sin(val))*(1/np.tan(val))
+    def deriv(cls, val, der, value=None):
+        if value is None:
+            value = 1/np.sin(val)
+        return -der*value*(1/np.tan(val))
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = 1/np.sin(args[0])
+        return -1*value*(1/np.tan(args[0]))
 
     @classmethod
-    def reverse(cls, *args):
-        return -1*(1/np.sin(args[0]))*(1/np.tan(args[0]))
+    def partials(cls, *args, value=None):
+        return -value * _sym(Cot, args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.reciprocal(ts.sincos(args[0])[0])
 
     @classmethod
     def opstr(cls, expr):
@@ -389,17 +816,32 @@ class Csc(UnaryOperation):
 
 
 class Sec(UnaryOperation):
+    cost = 12
+    deriv_cost = 25
+
     @classmethod
     def eval(cls, num):
         return 1/np.cos(num)
 
     @classmethod
-    def deriv(cls, val, der):
-        return der*(1/np.cos(val))*np.tan(val)
+    def deriv(cls, val, der, value=None):
+        if value is None:
+            value = 1/np.cos(val)
+        return der*value*np.tan(val)
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = 1/np.cos(args[0])
+        return 1*value*np.tan(args[0])
 
     @classmethod
-    def reverse(cls, *args):
-        return 1*(1/np.cos(args[0]))*np.tan(args[0])
+    def partials(cls, *args, value=None):
+        return value * _sym(Tan, args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.reciprocal(ts.sincos(args[0])[1])
 
     @classmethod
     def opstr(cls, expr):
@@ -407,60 +849,362 @@ class Sec(UnaryOperation):
 
 
 class Cot(UnaryOperation):
+    cost = 12
+    deriv_cost = 14
+
     @classmethod
     def eval(cls, num):
         return 1/np.tan(num)
 
     @classmethod
-    def deriv(cls, val, der):
-        return -der*(1/np.sin(val))**2
+    def deriv(cls, val, der, value=None):
+        if value is None:
+            value = 1/np.tan(val)
+        return -der*(1 + value*value)
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = 1/np.tan(args[0])
+        return -1*(1 + value*value)
 
     @classmethod
-    def reverse(cls, *args):
-        return -1*(1/np.sin(args[0]))**2
+    def partials(cls, *args, value=None):
+        return -(1 + value * value)
+
+    @classmethod
+    def taylor(cls, *args):
+        s, c = ts.sincos(args[0])
+        return ts.div(c, s)
 
     @classmethod
     def opstr(cls, expr):
         return f'cot({str(expr)})'
 
 
+class Sinh(UnaryOperation):
+    cost = 12
+    deriv_cost = 12
+    ufunc = np.sinh
+
+    @classmethod
+    def eval(cls, num):
+        return np.sinh(num)
+
+    @classmethod
+    def deriv(cls, val, der, value=None):
+        return np.cosh(val) * der
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        return np.cosh(args[0])
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return _sym(Cosh, args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.sinhcosh(args[0])[0]
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'sinh({str(expr)})'
+
+
+class Cosh(UnaryOperation):
+    cost = 12
+    deriv_cost = 12
+    ufunc = np.cosh
+
+    @classmethod
+    def eval(cls, num):
+        return np.cosh(num)
+
+    @classmethod
+    def deriv(cls, val, der, value=None):
+        return np.sinh(val) * der
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        return np.sinh(args[0])
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return _sym(Sinh, args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.sinhcosh(args[0])[1]
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'cosh({str(expr)})'
+
+
+class Tanh(UnaryOperation):
+    cost = 12
+    deriv_cost = 14
+    ufunc = np.tanh
+
+    @classmethod
+    def eval(cls, num):
+        return np.tanh(num)
+
+    @classmethod
+    def deriv(cls, val, der, value=None):
+        if value is None:
+            value = np.tanh(val)
+        return (1 - value * value) * der
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = np.tanh(args[0])
+        return 1 - value * value
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return 1 - value * value
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.tanh(args[0])
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'tanh({str(expr)})'
+
+
+class Logistic(UnaryOperation):
+    """The standard logistic (sigmoid) function 1 / (1 + exp(-x))"""
+    cost = 14
+    deriv_cost = 16
+
+    @classmethod
+    def eval(cls, num):
+        # exp of a non-positive number never overflows
+        e = np.exp(-np.abs(num))
+        return _where(np.greater_equal(num, 0), 1 / (1 + e), e / (1 + e))
+
+    @classmethod
+    def deriv(cls, val, der, value=None):
+        if value is None:
+            value = cls.eval(val)
+        return value * (1 - value) * der
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = cls.eval(args[0])
+        return value * (1 - value)
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return value * (1 - value)
+
+    @classmethod
+    def taylor(cls, *args):
+        return ts.logistic(args[0], cls.eval(args[0][0]))
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'logistic({str(expr)})'
+
+
+class Softplus(UnaryOperation):
+    """log(1 + exp(x)), computed without overflow"""
+    cost = 15
+    deriv_cost = 16
+
+    @classmethod
+    def eval(cls, num):
+        return np.logaddexp(0, num)
+
+    @classmethod
+    def deriv(cls, val, der, value=None):
+        return cls.reverse(val, value=value) * der
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            return Logistic.eval(args[0])
+        # logistic(x) = 1 - exp(-softplus(x))
+        return -np.expm1(-value)
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return _sym(Logistic, args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        a = args[0]
+        return ts.integrate(a, cls.eval(a[0]), ts.logistic(a, Logistic.eval(a[0])))
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'softplus({str(expr)})'
+
+
+class LogSumExp(BinaryOperation):
+    """log(exp(a) + exp(b)), computed without overflow"""
+    cost = 25
+    deriv_cost = 22
+    ufunc = np.logaddexp
+
+    @classmethod
+    def eval(cls, num1, num2):
+        return np.logaddexp(num1, num2)
+
+    @classmethod
+    def deriv(cls, num1, deriv1, num2, deriv2, value=None):
+        if value is None:
+            value = np.logaddexp(num1, num2)
+        return np.exp(num1 - value) * deriv1 + np.exp(num2 - value) * deriv2
+
+    @classmethod
+    def reverse(cls, *args, value=None):
+        if value is None:
+            value = np.logaddexp(args[0], args[1])
+        return np.exp(args[0] - value), np.exp(args[1] - value)
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return _sym(Exp, args[0] - value), _sym(Exp, args[1] - value)
+
+    @classmethod
+    def taylor(cls, *args):
+        a, b = args
+        # Shift by the larger value so that the exponentials do not overflow
+        shift = np.maximum(a[0], b[0])
+        a, b = a.copy(), b.copy()
+        a[0] -= shift
+        b[0] -= shift
+        y = ts.log(ts.exp(a) + ts.exp(b))
+        y[0] += shift
+        return y
+
+    @classmethod
+    def opstr(cls, expr1, expr2):
+        return f'logsumexp({str(expr1)}, {str(expr2)})'
+
+
 class ArcSin(UnaryOperation):
+    cost = 15
+    deriv_cost = 8
+    ufunc = np.arcsin
+
     @classmethod
     def eval(cls, num):
         return np.arcsin(num)
 
     @classmethod
-    def deriv(cls, val, der):
+    def deriv(cls, val, der, value=None):
         return der / np.sqrt(1 - val**2)
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
         return 1 / np.sqrt(1 - args[0]**2)
 
+    @classmethod
+    def partials(cls, *args, value=None):
+        return 1 / _sym(Sqrt, 1 - args[0] * args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        a = args[0]
+        return ts.integrate(a, cls.eval(a[0]), ts.power(_one_minus_square(a), -0.5))
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'arcsin({str(expr)})'
+
 
 class ArcCos(UnaryOperation):
+    cost = 15
+    deriv_cost = 8
+    ufunc = np.arccos
+
     @classmethod
     def eval(cls, num):
         return np.arccos(num)
 
     @classmethod
-    def deriv(cls, val, der):
+    def deriv(cls, val, der, value=None):
         return - der / np.sqrt(1 - val**2)
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
         return - 1 / np.sqrt(1 - args[0]**2)
 
+    @classmethod
+    def partials(cls, *args, value=None):
+        return -1 / _sym(Sqrt, 1 - args[0] * args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        a = args[0]
+        return ts.integrate(a, cls.eval(a[0]), -ts.power(_one_minus_square(a), -0.5))
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'arccos({str(expr)})'
+
 
 class ArcTan(UnaryOperation):
+    cost = 15
+    deriv_cost = 4
+    ufunc = np.arctan
+
     @classmethod
     def eval(cls, num):
         return np.arctan(num)
 
     @classmethod
-    def deriv(cls, val, der):
+    def deriv(cls, val, der, value=None):
         return der / (1 + val**2)
 
     @classmethod
-    def reverse(cls, *args):
+    def reverse(cls, *args, value=None):
         return 1 / (1 + args[0]**2)
+
+    @classmethod
+    def partials(cls, *args, value=None):
+        return 1 / (1 + args[0] * args[0])
+
+    @classmethod
+    def taylor(cls, *args):
+        a = args[0]
+        one_plus_square = ts.mul(a, a)
+        one_plus_square[0] += 1
+        return ts.integrate(a, cls.eval(a[0]), ts.reciprocal(one_plus_square))
+
+    @classmethod
+    def opstr(cls, expr):
+        return f'arctan({str(expr)})'
+
+
+def _one_minus_square(a):
+    """Series of 1 - a^2"""
+    res = -ts.mul(a, a)
+    res[0] += 1
+    return res
+
+
+def _sym(operation, x):
+    """`operation` applied to `x`: an Expression for a Var, a number for a constant"""
+    if isinstance(x, Var):
+        return operation.expr(x)
+    return operation.eval(x)
+
+
+def _where(condition, x, y):
+    """Elementwise np.where that returns a scalar (not a 0-d array) for scalar inputs"""
+    return np.where(condition, x, y)[()]
+
+
+def _int_pow(x, n):
+    """x^n for an integer n, also for integer arrays and negative n"""
+    if n >= 0:
+        return x ** n
+    return 1 / x ** -n
@@ -0,0 +1,297 @@
+"""
+optimize.py
+
+Minimization of scalar Expressions.
+
+Classes:
+    OptimizeResult
+        - Solution, final gradient, evaluation counts and time per iteration
+
+Functions:
+    minimize
+        - Minimizes an Expression with one of {'gd', 'adam', 'lbfgs', 'trust-ncg'}
+
+The Expression is compiled once and every value and gradient is computed by
+its Tape into the buffers of a Workspace, so iterations build no graph and
+reuse the same result buffers. 'trust-ncg' uses Hessian-vector products from
+the compiled gradient (`Expression.hvp`).
+"""
+import time
+
+import numpy as np
+
+from superjacob.expression import VectorExpression
+from superjacob.workspace import Workspace
+
+
+class OptimizeResult:
+    """The outcome of `minimize`.
+
+    Attributes:
+        x: np.ndarray -- The solution, in the order of expr.vars
+        fun: float -- Value at `x`
+        grad: np.ndarray -- Gradient at `x`
+        success: bool -- Whether the gradient tolerance was reached
+        message: str -- Why the iterations stopped
+        method: str -- The method used
+        n_iter: int -- Number of iterations
+        n_evals: int -- Number of value and gradient evaluations (one Tape sweep each)
+        n_hvp: int -- Number of Hessian-vector products
+        times: list[float] -- Wall time of each iteration, in seconds
+    """
+    def __init__(self, x, fun, grad, success, message, method, n_iter, n_evals, n_hvp, times):
+        self.x = x
+        self.fun = fun
+        self.grad = grad
+        self.success = success
+        self.message = message
+        self.method = method
+        self.n_iter = n_iter
+        self.n_evals = n_evals
+        self.n_hvp = n_hvp
+        self.times = times
+
+    @property
+    def time_per_iter(self):
+        """Mean wall time of an iteration, in seconds"""
+        return sum(self.times) / len(self.times) if self.times else 0.
+
+    def __repr__(self):
+        return f'OptimizeResult(method={self.method!r}, success={self.success}, message={self.message!r}, ' \
+               f'fun={self.fun}, n_iter={self.n_iter}, n_evals={self.n_evals}, n_hvp={self.n_hvp}, ' \
+               f'time_per_iter={self.time_per_iter:.3g}s)'
+
+
+class _Problem:
+    """The objective, evaluated through a Workspace, with evaluation counters
+
+    When Params hold batches of data, the values over the batch are reduced
+    (summed or averaged) into one objective.
+    """
+    def __init__(self, expr, x0, params, reduction):
+        self.expr = expr
+        self.params = params
+        self.shape = expr.compile().batch_shape(*x0, params=params)
+        self.axes = tuple(range(len(self.shape)))
+        self.scale = 1 / np.prod(self.shape) if reduction == 'mean' else 1
+        self.workspace = Workspace(expr, shape=self.shape, mode='reverse')
+        self.n_evals = 0
+        self.n_hvp = 0
+
+    def value_and_grad(self, x):
+        """Value and gradient at `x` (the gradient is a new array, the Workspace buffers are reused)"""
+        self.n_evals += 1
+        value, grad = self.workspace.value_and_deriv(*x, params=self.params)
+        if not self.axes:
+            return float(value), grad.copy()
+        return float(np.sum(value) * self.scale), np.sum(grad, axis=self.axes) * self.scale
+
+    def hvp(self, x, v):
+        """Hessian-vector product at `x`"""
+        self.n_hvp += 1
+        res = self.expr.hvp(tuple(x), tuple(v), params=self.params)
+        return np.sum(np.broadcast_to(res, self.shape + (len(x),)), axis=self.axes) * self.scale
+
+
+class _GradientDescent:
+    """Gradient descent with (optionally Nesterov) momentum"""
+    def __init__(self, problem, lr=1e-2, momentum=0., nesterov=False):
+        self.problem = problem
+        self.lr = lr
+        self.momentum = momentum
+        self.nesterov = nesterov
+        self.velocity = 0
+
+    def __call__(self, x, f, g):
+        self.velocity = self.momentum * self.velocity - self.lr * g
+        if self.nesterov:
+            x = x + self.momentum * self.velocity - self.lr * g
+        else:
+            x = x + self.velocity
+        return (x,) + self.problem.value_and_grad(x)
+
+
+class _Adam:
+    """Adam: steps scaled by running estimates of the first and second moments of the gradient"""
+    def __init__(self, problem, lr=1e-3, beta1=0.9, beta2=0.999, eps=1e-8):
+        self.problem = problem
+        self.lr = lr
+        self.beta1 = beta1
+        self.beta2 = beta2
+        self.eps = eps
+        self.m = self.v = 0
+        self.t = 0
+
+    def __call__(self, x, f, g):
+        self.t += 1
+        self.m = self.beta1 * self.m + (1 - self.beta1) * g
+        self.v = self.beta2 * self.v + (1 - self.beta2) * g * g
+        m_hat = self.m / (1 - self.beta1 ** self.t)
+        v_hat = self.v / (1 - self.beta2 ** self.t)
+        x = x - self.lr * m_hat / (np.sqrt(v_hat) + self.eps)
+        return (x,) + self.problem.value_and_grad(x)
+
+
+class _LBFGS:
+    """Limited-memory BFGS with a backtracking (Armijo) line search"""
+    def __init__(self, problem, memory=10, c1=1e-4, max_backtracks=40):
+        self.problem = problem
+        self.memory = memory
+        self.c1 = c1
+        self.max_backtracks = max_backtracks
+        self.history = []  # (s, y, 1 / s.y) of the last `memory` steps
+
+    def direction(self, g):
+        """-H g for the inverse Hessian approximation H (two-loop recursion)"""
+        q = g.copy()
+        alphas = []
+        for s, y, rho in reversed(self.history):
+            alpha = rho * (s @ q)
+            q -= alpha * y
+            alphas.append(alpha)
+        if self.history:
+            s, y, _ = self.history[-1]
+            q *= (s @ y) / (y @ y)
+        else:
+            q /= max(1., np.linalg.norm(g))  # First step of length at most 1
+        for (s, y, rho), alpha in zip(self.history, reversed(alphas)):
+            beta = rho * (y @ q)
+            q += (alpha - beta) * s
+        return -q
+
+    def __call__(self, x, f, g):
+        d = self.direction(g)
+        slope = g @ d
+        if slope >= 0:  # Not a descent direction: restart from steepest descent
+            self.history.clear()
+            d = -g / max(1., np.linalg.norm(g))
+            slope = g @ d
+        t = 1.
+        for _ in range(self.max_backtracks):
+            x_new = x + t * d
+            f_new, g_new = self.problem.value_and_grad(x_new)
+            if f_new <= f + self.c1 * t * slope:
+                break
+            t *= 0.5
+        else:
+            return x, f, g
+        s, y = x_new - x, g_new - g
+        sy = s @ y
+        if sy > 1e-10 * np.linalg.norm(s) * np.linalg.norm(y):  # Keep the approximation positive definite
+            self.history.append((s, y, 1 / sy))
+            if len(self.history) > self.memory:
+                self.history.pop(0)
+        return x_new, f_new, g_new
+
+
+class _TrustRegionNCG:
+    """Newton trust-region method, with steps from truncated conjugate gradients (Steihaug) on Hessian-vector products"""
+    def __init__(self, problem, radius=1., max_radius=1e3, eta=0.15):
+        self.problem = problem
+        self.radius = radius
+        self.max_radius = max_radius
+        self.eta = eta
+
+    def _boundary(self, z, d):
+        """tau >= 0 such that |z + tau d| = radius"""
+        a, b, c = d @ d, 2 * (z @ d), z @ z - self.radius ** 2
+        return (-b + np.sqrt(b * b - 4 * a * c)) / (2 * a)
+
+    def step(self, x, g):
+        """Approximate minimizer p of the quadratic model within the trust region, and B p"""
+        z = np.zeros_like(g)
+        r = g.copy()  # Residual g + B z of the model gradient
+        d = -g
+        g_norm = np.linalg.norm(g)
+        tol = min(0.5, np.sqrt(g_norm)) * g_norm
+        for _ in range(2 * len(g) + 10):
+            Bd = self.problem.hvp(x, d)
+            dBd = d @ Bd
+            if dBd <= 0:  # Negative curvature: go to the boundary
+                tau = self._boundary(z, d)
+                return z + tau * d, r - g + tau * Bd
+            alpha = (r @ r) / dBd
+            if np.linalg.norm(z + alpha * d) >= self.radius:
+                tau = self._boundary(z, d)
+                return z + tau * d, r - g + tau * Bd
+            z = z + alpha * d
+            r_new = r + alpha * Bd
+            if np.linalg.norm(r_new) < tol:
+                return z, r_new - g
+            d = -r_new + (r_new @ r_new) / (r @ r) * d
+            r = r_new
+        return z, r - g
+
+    def __call__(self, x, f, g):
+        while self.radius > 1e-12:
+            p, Bp = self.step(x, g)
+            predicted = -(g @ p + 0.5 * (p @ Bp))
+            f_new, g_new = self.problem.value_and_grad(x + p)
+            rho = (f - f_new) / predicted if predicted > 0 else -1.
+            if rho < 0.25:
+                self.radius *= 0.25
+            elif rho > 0.75 and np.linalg.norm(p) >= 0.99 * self.radius:
+                self.radius = min(2 * self.radius, self.max_radius)
+            if rho > self.eta:
+                return x + p, f_new, g_new
+        return x, f, g
+
+
+_METHODS = {'gd': _GradientDescent, 'adam': _Adam, 'lbfgs': _LBFGS, 'trust-ncg': _TrustRegionNCG}
+
+
+def minimize(expr, x0, method='lbfgs', params=None, reduction='sum', maxiter=1000, gtol=1e-6, callback=None,
+             **options):
+    """Minimize a scalar Expression
+
+    Usage:
+        res = minimize(f, (0., 0.), method='trust-ncg')
+        res.x, res.fun, res.n_evals, res.time_per_iter
+
+    :param expr: Expression -- The objective, a function of expr.vars
+    :param x0: tuple[Number] -- Starting point, in the order of expr.vars
+    :param method: str -- One of {'gd', 'adam', 'lbfgs', 'trust-ncg'}
+    :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params (e.g. the data)
+    :param reduction: str -- One of {'sum', 'mean'}, how the values over a batch of data are combined
+    :param maxiter: int -- Maximum number of iterations
+    :param gtol: float -- Stop when the largest gradient entry is at most `gtol` in absolute value
+    :param callback: callable | None -- Called as callback(x, value, grad) after every iteration
+    :param options: Options of the method:
+        'gd': lr=1e-2, momentum=0., nesterov=False
+        'adam': lr=1e-3, beta1=0.9, beta2=0.999, eps=1e-8
+        'lbfgs': memory=10, c1=1e-4, max_backtracks=40
+        'trust-ncg': radius=1., max_radius=1e3, eta=0.15
+    :return: OptimizeResult
+    """
+    assert not isinstance(expr, VectorExpression), 'Only scalar Expressions can be minimized'
+    assert method in _METHODS, f'Invalid method specified: {method}. ' \
+                               f'Please choose one of {", ".join(repr(m) for m in _METHODS)}.'
+    assert reduction in ('sum', 'mean'), f'Invalid reduction specified: {reduction}. ' \
+                                         f'Please choose one of "sum", "mean".'
+    problem = _Problem(expr, x0, params, reduction)
+    step = _METHODS[method](problem, **options)
+    x = np.array(x0, dtype=float)
+    f, g = problem.value_and_grad(x)
+    times = []
+    success, message = False, 'Maximum number of iterations reached'
+    for _ in range(maxiter):
+        if np.max(np.abs(g)) <= gtol:
+            success, message = True, 'Gradient below tolerance'
+            break
+        start = time.perf_counter()
+        x_new, f, g = step(x, f, g)
+        times.append(time.perf_counter() - start)
+        if callback is not None:
+            callback(x_new, f, g)
+        if not np.isfinite(f):
+            message = 'Non-finite value'
+            x = x_new
+            break
+        if x_new is x:
+            message = 'No progress (line search or trust region failed)'
+            break
+        x = x_new
+    else:
+        if np.max(np.abs(g)) <= gtol:
+            success, message = True, 'Gradient below tolerance'
+    return OptimizeResult(x, f, g, success, message, method, len(times), problem.n_evals, problem.n_hvp, times)
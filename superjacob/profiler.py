@@ -0,0 +1,207 @@
+"""
+profiler.py
+
+Opt-in instrumentation of evaluation and differentiation.
+
+Classes:
+    Profiler
+        - Context manager that instruments Expression.eval, Expression.deriv
+          and ReverseDiff while it is active
+    ProfileReport
+        - Per-operation and per-node call counts, times and allocations
+    Stats
+        - Counters for a single operation class or node
+"""
+import time
+
+import numpy as np
+
+from superjacob.expression import Expression
+from superjacob.reverse import ReverseDiff, TraceNode
+
+
+class Stats:
+    """Counters for one operation class or one node.
+
+    Attributes:
+        calls: int -- Number of calls
+        time: float -- Cumulative time (seconds), including time spent in parents
+        self_time: float -- Cumulative time (seconds) spent in this node/operation only
+        allocations: int -- Number of new arrays produced (views and scalars are not counted)
+        bytes: int -- Bytes of those new arrays
+    """
+    def __init__(self, label):
+        self.label = label
+        self.calls = 0
+        self.time = 0.
+        self.self_time = 0.
+        self.allocations = 0
+        self.bytes = 0
+
+    def add(self, elapsed, self_time, result):
+        """Record one call"""
+        self.calls += 1
+        self.time += elapsed
+        self.self_time += self_time
+        for res in (result if isinstance(result, tuple) else (result,)):
+            # An array owning its data was allocated by the call, views share their base's memory
+            if isinstance(res, np.ndarray) and res.base is None:
+                self.allocations += 1
+                self.bytes += res.nbytes
+
+    def __repr__(self):
+        return f'Stats({self.label}: calls={self.calls}, time={self.time:.3g}s, self_time={self.self_time:.3g}s, ' \
+               f'allocations={self.allocations}, bytes={self.bytes})'
+
+
+class ProfileReport:
+    """The result of a profiling session.
+
+    Attributes:
+        by_operation: dict[str, Stats] -- Stats keyed by '<phase>:<operation>'
+            (phase is one of 'eval', 'deriv', 'reverse.forward', 'reverse.backward')
+        by_node: dict[tuple, Stats] -- Stats keyed by (phase, node)
+        stacks: dict[tuple[str], float] -- Self time (seconds) of every call stack
+    """
+    def __init__(self, by_operation, by_node, stacks):
+        self.by_operation = by_operation
+        self.by_node = by_node
+        self.stacks = stacks
+
+    def top(self, n=10):
+        """The `n` operations with the largest self time
+
+        :param n: int -- Number of entries
+        :return: list[Stats]
+        """
+        return sorted(self.by_operation.values(), key=lambda s: s.self_time, reverse=True)[:n]
+
+    def to_folded(self):
+        """Render the call stacks in the folded format read by flamegraph.pl and speedscope
+
+        Each line is a semicolon separated stack followed by its self time in microseconds.
+
+        :return: str
+        """
+        return '\n'.join(f'{";".join(stack)} {int(round(t * 1e6))}' for stack, t in sorted(self.stacks.items()))
+
+    def write_folded(self, path):
+        """Write `to_folded()` to the file at `path`"""
+        with open(path, 'w') as fh:
+            fh.write(self.to_folded() + '\n')
+
+    def __str__(self):
+        lines = [f'{"operation":<28}{"calls":>10}{"time (s)":>12}{"self (s)":>12}{"allocs":>10}{"bytes":>12}']
+        for s in self.top(len(self.by_operation)):
+            lines.append(f'{s.label:<28}{s.calls:>10}{s.time:>12.3g}{s.self_time:>12.3g}'
+                         f'{s.allocations:>10}{s.bytes:>12}')
+        return '\n'.join(lines)
+
+
+class Profiler:
+    """Record call counts, times and allocations per operation and per node.
+
+    Instrumentation is installed on entering the context and removed on exit,
+    so there is no overhead at all while no Profiler is active. Profilers
+    patch classes globally: they must not be nested or used from several
+    threads at once.
+
+    Usage:
+        with Profiler() as prof:
+            f.deriv(1, 2, mode='reverse')
+        print(prof.report)
+        prof.report.write_folded('superjacob.folded')
+    """
+    # (class, attribute, phase) for every instrumented method
+    _targets = [
+        (Expression, '_unary_eval', 'eval'),
+        (Expression, '_binary_eval', 'eval'),
+        (Expression, '_forward', 'deriv'),
+        (ReverseDiff, 'forward', 'reverse.forward'),
+        (TraceNode, 'bar', 'reverse.backward'),
+    ]
+    _active = False
+
+    def __init__(self):
+        self.by_operation = {}
+        self.by_node = {}
+        self.stacks = {}
+        self._stack = []
+        self._saved = []
+
+    @property
+    def report(self):
+        """The ProfileReport of everything recorded so far"""
+        return ProfileReport(self.by_operation, self.by_node, self.stacks)
+
+    def __enter__(self):
+        assert not Profiler._active, 'Another Profiler is already active'
+        Profiler._active = True
+        for cls, name, phase in self._targets:
+            original = cls.__dict__[name]
+            self._saved.append((cls, name, original))
+            if isinstance(original, property):
+                setattr(cls, name, property(self._wrap(original.fget, phase), original.fset))
+            else:
+                setattr(cls, name, self._wrap(original, phase))
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        for cls, name, original in reversed(self._saved):
+            setattr(cls, name, original)
+        self._saved = []
+        Profiler._active = False
+
+    def _wrap(self, method, phase):
+        """Instrument `method` (whose first or second argument is the node)"""
+        profiler = self
+
+        def instrumented(obj, *args, **kwargs):
+            node = _node_of(obj, args)
+            if node is None:
+                return method(obj, *args, **kwargs)
+            frame = profiler._enter(phase, node)
+            result = None
+            try:
+                result = method(obj, *args, **kwargs)
+                return result
+            finally:
+                profiler._exit(frame, result)
+        return instrumented
+
+    def _enter(self, phase, node):
+        """Push a frame for `node`"""
+        label = node.operation.__name__
+        path = (self._stack[-1][3] if self._stack else (phase,)) + (label,)
+        frame = [(phase, node), time.perf_counter(), 0., path, f'{phase}:{label}']
+        self._stack.append(frame)
+        return frame
+
+    def _exit(self, frame, result):
+        """Pop `frame` and record its times"""
+        elapsed = time.perf_counter() - frame[1]
+        self._stack.pop()
+        if self._stack:
+            self._stack[-1][2] += elapsed
+        self_time = elapsed - frame[2]
+        key, _, _, path, op_label = frame
+        if key not in self.by_node:
+            self.by_node[key] = Stats(f'{op_label}@{id(key[1]):x}')
+        self.by_node[key].add(elapsed, self_time, result)
+        if op_label not in self.by_operation:
+            self.by_operation[op_label] = Stats(op_label)
+        self.by_operation[op_label].add(elapsed, self_time, result)
+        self.stacks[path] = self.stacks.get(path, 0.) + self_time
+
+
+def _node_of(obj, args):
+    """The Expression being processed by an instrumented method, or None for leaves"""
+    if isinstance(obj, ReverseDiff):
+        node = args[0] if args else None
+    elif isinstance(obj, TraceNode):
+        node = obj.expr
+    else:
+        node = obj
+    if isinstance(node, Expression):
+        return node
+    return None
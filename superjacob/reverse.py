@@ -1,11 +1,9 @@
 """
 Implementing reverse mode differentiation
 """
-from numbers import Number
-
 import numpy as np
 
-from superjacob.expression import Expression, get_input_args
+from superjacob.expression import Var, Expression, get_input_args, _deps
 
 
 class ReverseDiff:
@@ -16,6 +14,7 @@ class ReverseDiff:
         expr: Expression -- The Expression being differentiated
         vars: list[Var] -- The correct ordering of variables
         trace: list[TraceNode] -- Each element in the computational trace
+        value: Number | np.ndarray -- Value of the Expression at the last point differentiated
     """
 
     def __init__(self, expr):
@@ -26,6 +25,10 @@ class ReverseDiff:
         self.expr = expr
         self.vars = expr.vars
         self.trace = []
+        self._nodes = {}  # id(Var | Expression) -> TraceNode
+        self._shape = ()
+        self._mask = _deps(*self.vars)
+        self.value = None
 
     def forward(self, expr, *args, child=None):
         """Compute the forward pass of reverse mode differentiation
@@ -37,14 +40,18 @@ class ReverseDiff:
         """
         if expr is None:
             return None
-        if isinstance(expr, Number):
+        if not isinstance(expr, Var):  # Numeric constant
             return expr
-        if expr in self.trace:  # Here we check if we have already visited this node
-            self._add_child(expr, child)
-            return args[0]
+        if not expr.deps & self._mask:  # Does not depend on the variables being differentiated
+            return expr(*args)
+        if id(expr) in self._nodes:  # Here we check if we have already visited this node
+            node = self._nodes[id(expr)]
+            node.add_child(child)
+            return node.currval
         if not isinstance(expr, Expression):
             node = TraceNode(expr, args[0], [1])
             node.add_child(child)
+            self._nodes[id(expr)] = node
             self.trace.append(node)
             return args[0]
         else:
@@ -53,6 +60,7 @@ class ReverseDiff:
                                get_input_args(expr.parent2, expr.vars, *args)
 
             node = TraceNode(expr, child=child)
+            self._nodes[id(expr)] = node
 
             parvals = self.forward(expr.parent1, *p1_args, child=node), \
                       self.forward(expr.parent2, *p2_args, child=node)
@@ -60,39 +68,49 @@ class ReverseDiff:
             # For now, implementing unary/binary as an if-statement. Consider subclassing
             if parvals[1] is None:
                 currval = expr.operation.eval(parvals[0])
-                d1val = expr.operation.reverse(parvals[0])
+                d1val = expr.operation.reverse(parvals[0], value=currval)
                 derivs = [d1val]
             else:
                 currval = expr.operation.eval(*parvals)
-                derivs = expr.operation.reverse(*parvals)
+                derivs = expr.operation.reverse(*parvals, value=currval)
             node.currval = currval
             node.derivs = derivs
 
             self.trace.append(node)
             return currval
 
-    def reverse(self, var=None):
+    def reverse(self, var=None, out=None):
         """Compute the reverse pass of forward mode differentiation
 
         :param var: Var -- The variable with respect to which the derivative is taken
-        :return: gradient
+        :param out: np.ndarray | None -- Buffer to write the gradient into
+        :return: gradient (batch shape + (n,) for a batch of points; `out` if given)
         """
-        res = np.zeros(len(self.vars))
+        res = [0] * len(self.vars)
+        var_index = {id(v): i for i, v in enumerate(self.vars)}
+        # Children come after their parents in the trace, so every bar is computed
+        # from bars that are already known (no deep recursion)
         for node in self.trace[::-1]:
             node_bar = node.bar
-            if node in self.vars:
-                if var and node == var:
-                    return node_bar
-                res[self.vars.index(node)] = node_bar
-        return res
-
-    def _add_child(self, parent, child):
-        """Add TraceNode `child` as a child of TraceNode `parent`"""
-        if child:
-            self.trace[self.trace.index(parent)].add_child(child)
+            if not isinstance(node.expr, Expression) and id(node.expr) in var_index:
+                if var is not None and node.expr is var:
+                    return node_bar if out is None else _copy_to(out, node_bar)
+                res[var_index[id(node.expr)]] = node_bar
+        if var is not None:
+            return 0 if out is None else _copy_to(out, 0)
+        if out is not None:
+            for i, r in enumerate(res):
+                out[..., i] = r
+            return out
+        return np.stack([np.broadcast_to(r, self._shape) for r in res], axis=-1).astype(float)
 
     def __call__(self, *args, **kwargs):
-        self.forward(self.expr, *args)
+        self.trace = []
+        self._nodes = {}
+        self._shape = self.expr.batch_shape(*args)
+        var = kwargs.get('var')
+        self._mask = _deps(*self.vars) if var is None else var.deps
+        self.value = self.forward(self.expr, *args)
         return self.reverse(**kwargs)
 
 
@@ -126,34 +144,40 @@ class TraceNode:
         :param child: TraceNode -- Child to be added
         :return: None
         """
-        if child:
+        if child and not any(c is child for c in self.children):
             self.children.append(child)
 
     @property
     def bar(self):
-        if self._bar:
+        if self._bar is not None:
             return self._bar
         if not self.children:
             self._bar = 1
         else:
             res = 0
             for child in self.children:
-                res += child.bar * child.deriv_parent(self.expr)
+                res = res + child.bar * child.deriv_parent(self.expr)
             self._bar = res
         return self._bar
 
     @bar.setter
     def bar(self, value):
-        assert not self._bar, 'Bar already set'
+        assert self._bar is None, 'Bar already set'
         self._bar = value
 
     def deriv_parent(self, parent_expr):
         """Get the derivative of this node with respect to `parent_expr`
 
-        :param parent_expr: TraceNode -- parent with respect to which the derivative should be taken
+        Sums over every position `parent_expr` appears in (e.g. both parents of x - x).
+
+        :param parent_expr: Var -- parent with respect to which the derivative should be taken
         :return: Number
         """
-        return self.derivs[self.expr.parents.index(parent_expr)]
+        res = 0
+        for parent, deriv in zip(self.expr.parents, self.derivs):
+            if parent is parent_expr:
+                res = res + deriv
+        return res
 
     def __eq__(self, other):
         if isinstance(other, TraceNode):
@@ -165,4 +189,9 @@ class TraceNode:
         return str(self.expr)
 
     def __repr__(self):
-        return repr(self.expr)
\ No newline at end of file
+        return repr(self.expr)
+
+def _copy_to(out, value):
+    """Write `value` into the buffer `out` and return it"""
+    out[...] = value
+    return out
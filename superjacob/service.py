@@ -0,0 +1,168 @@
+"""
+service.py
+
+Serving values and derivatives of a fixed Expression to many concurrent clients.
+
+Classes:
+    GradientService
+        - asyncio wrapper around a compiled Expression / VectorExpression
+        - Coalesces concurrent single-point requests into micro-batches that
+          are evaluated with one vectorized pass over the Tape
+"""
+import asyncio
+import collections
+
+import numpy as np
+
+
+class GradientService:
+    """Asynchronous, micro-batching front end for an Expression.
+
+    Requests are queued and a background task groups them into batches of at
+    most `max_batch_size` points, waiting at most `max_latency` seconds after
+    the first request of a batch arrives. Each batch is evaluated as one
+    vectorized call to the compiled Tape and every caller gets its own result.
+
+    Usage:
+        async with GradientService(f, max_batch_size=128) as service:
+            value = await service.eval(1.0, 2.0)
+            grad = await service.deriv(1.0, 2.0)
+
+    Attributes:
+        expr: Expression | VectorExpression -- The expression being served
+        tape: Tape -- The compiled expression
+        max_batch_size: int -- Maximum number of points evaluated together
+        max_latency: float -- Maximum time (seconds) a request waits for a batch to fill
+        mode: str -- Differentiation mode, one of {'forward', 'reverse'}
+        n_batches: int -- Number of batches evaluated so far
+        n_requests: int -- Number of requests received in these batches
+        batch_sizes: collections.deque[int] -- Sizes of the last `history` batches
+    """
+    def __init__(self, expr, max_batch_size=64, max_latency=1e-3, mode='reverse', history=1000):
+        """Initialize a GradientService
+
+        :param expr: Expression | VectorExpression -- The expression to serve
+        :param max_batch_size: int -- Maximum number of points per batch
+        :param max_latency: float -- Maximum time (seconds) to wait for a batch to fill
+        :param mode: str -- One of {'forward', 'reverse'}
+        :param history: int -- Number of recent batch sizes kept in `batch_sizes`
+        """
+        assert max_batch_size >= 1, f'max_batch_size must be positive (given: {max_batch_size})'
+        assert max_latency >= 0, f'max_latency must be non-negative (given: {max_latency})'
+        self.expr = expr
+        self.tape = expr.compile()
+        self.max_batch_size = max_batch_size
+        self.max_latency = max_latency
+        self.mode = mode
+        self.n_batches = 0
+        self.n_requests = 0
+        self.batch_sizes = collections.deque(maxlen=history)
+        self._queue = None
+        self._worker = None
+
+    async def start(self):
+        """Start the batching task on the running event loop"""
+        if self._worker is None:
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.ensure_future(self._run())
+
+    async def close(self):
+        """Finish all queued requests and stop the batching task"""
+        if self._worker is not None:
+            await self._queue.put(None)
+            await self._worker
+            self._worker = None
+
+    async def eval(self, *args):
+        """Evaluate the expression at a single point
+
+        :param args: tuple[Number] -- Point to evaluate at
+        :return: Number | np.ndarray -- The value
+        """
+        return await self._submit('eval', args)
+
+    async def deriv(self, *args):
+        """Differentiate the expression at a single point
+
+        :param args: tuple[Number] -- Point to differentiate at
+        :return: np.ndarray -- Gradient (n,) or Jacobian (m, n)
+        """
+        return await self._submit('deriv', args)
+
+    async def _submit(self, kind, args):
+        """Queue a request and wait for its result"""
+        assert len(args) == len(self.tape.vars), \
+            f'Input length does not match dimension of Expression domain ({len(args)}, {len(self.tape.vars)})'
+        await self.start()
+        future = asyncio.get_event_loop().create_future()
+        await self._queue.put((kind, args, future))
+        return await future
+
+    async def _run(self):
+        """Collect requests into batches until the sentinel `None` is received"""
+        loop = asyncio.get_event_loop()
+        stopping = False
+        while not stopping:
+            request = await self._queue.get()
+            if request is None:
+                break
+            batch = [request]
+            deadline = loop.time() + self.max_latency
+            while len(batch) < self.max_batch_size:
+                try:
+                    request = self._queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        request = await asyncio.wait_for(self._queue.get(), timeout)
+                    except asyncio.TimeoutError:
+                        break
+                if request is None:
+                    stopping = True
+                    break
+                batch.append(request)
+            self._process(batch)
+
+    def _process(self, batch):
+        """Evaluate a batch of requests and resolve their futures"""
+        self.n_batches += 1
+        self.n_requests += len(batch)
+        self.batch_sizes.append(len(batch))
+        batch = [(kind, args, future) for kind, args, future in batch if not future.cancelled()]
+        for kind in ('eval', 'deriv'):
+            requests = [(args, future) for k, args, future in batch if k == kind]
+            if not requests:
+                continue
+            try:
+                results = self._evaluate(kind, [args for args, _ in requests])
+            except Exception as e:
+                for _, future in requests:
+                    future.set_exception(e)
+            else:
+                for (_, future), result in zip(requests, results):
+                    future.set_result(result)
+
+    def _evaluate(self, kind, points):
+        """Evaluate `points` as one batch and split the results per point
+
+        :param kind: str -- One of {'eval', 'deriv'}
+        :param points: list[tuple[Number]] -- The requested points
+        :return: list -- One result per point
+        """
+        columns = [np.array(column, dtype=float) for column in zip(*points)]
+        if kind == 'eval':
+            res = self.tape.eval(*columns)
+            if not self.tape.vector:
+                res = np.broadcast_to(res, (len(points),))
+        else:
+            res = self.tape.deriv(*columns, mode=self.mode)
+        return list(res)
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
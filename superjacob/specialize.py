@@ -0,0 +1,71 @@
+"""
+specialize.py
+
+Partial evaluation of Expressions.
+
+Functions:
+    specialize
+        - Substitutes values for some of the variables and folds every
+          subexpression that no longer depends on a free variable
+"""
+from superjacob.expression import Var, Expression, VectorExpression
+from superjacob import operations as ops
+from superjacob.tape import toposort
+
+
+def specialize(expr, values):
+    """Fix some variables of `expr` and constant-fold what only depends on them
+
+    Subexpressions depending only on fixed variables and constants are
+    evaluated once, here. Subexpressions that do not depend on a fixed variable
+    are reused as they are, so the result shares them with `expr`. Params stay
+    placeholders (their values may change between calls) and are never folded.
+
+    Usage:
+        f = make_expression(sj.exp(a * b) * x + y, vars=[a, b, x, y])
+        g = specialize(f, {a: 1., b: 2.})  # e^2 * x + y, with vars [x, y]
+
+    :param expr: Expression | VectorExpression -- The expression to specialize
+    :param values: dict[Var, Number | np.ndarray] -- Values of the fixed variables
+    :return: Expression | VectorExpression -- The specialized expression, whose
+        variables are those of `expr` that are not fixed (in the same order)
+    """
+    for var in values:
+        assert var in expr.vars, f'{var} is not a variable of the Expression'
+    varlist = [v for v in expr.vars if v not in values]
+    if isinstance(expr, VectorExpression):
+        outputs = expr.expressions
+    else:
+        outputs = [expr]
+    fixed = {id(var): value for var, value in values.items()}
+    mapped = {}  # id(node) -> node of the specialized graph (or folded value)
+    order = toposort(outputs)
+    for node in order:
+        if not isinstance(node, Expression):
+            mapped[id(node)] = fixed.get(id(node), node)
+            continue
+        parents = [node.parent1] if node.parent2 is None else [node.parent1, node.parent2]
+        new = [mapped[id(p)] if isinstance(p, Var) else p for p in parents]
+        if all(n is p for n, p in zip(new, parents)):
+            mapped[id(node)] = node
+        elif not any(isinstance(n, Var) for n in new):
+            mapped[id(node)] = node.operation.eval(*new)
+        else:
+            # `expr` picks specialized operations for constants that appeared (e.g. Pow -> IntPow)
+            mapped[id(node)] = node.operation.expr(*new)
+    original = {id(node) for node in order}
+    results = [_new_root(mapped[id(out)] if isinstance(out, Var) else out, varlist, original) for out in outputs]
+    if isinstance(expr, VectorExpression):
+        return VectorExpression(results, varlist)
+    return results[0]
+
+
+def _new_root(node, varlist, original):
+    """An Expression for `node` that can take the variables `varlist` without modifying the original graph"""
+    if isinstance(node, Expression):
+        if id(node) in original:
+            node = Expression(node.parent1, node.parent2, node.operation)
+    else:
+        node = ops.Identity.expr(node)
+    node.set_vars(varlist)
+    return node
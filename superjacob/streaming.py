@@ -0,0 +1,83 @@
+"""
+streaming.py
+
+Reductions of values and derivatives over datasets larger than memory.
+
+Functions:
+    stream_reduce
+        - Evaluates an Expression whose data enters through Params chunk by
+          chunk, summing (or averaging) values and derivatives on the fly
+    iter_chunks
+        - Splits arrays (e.g. memory-mapped `.npy` files) into chunks of rows
+"""
+import numpy as np
+
+
+def iter_chunks(data, chunk_size):
+    """Split arrays into chunks of at most `chunk_size` rows
+
+    Slicing a memory-mapped array (`np.load(path, mmap_mode='r')`) does not read
+    it, so only one chunk per array is in memory at a time.
+
+    :param data: dict[Param, np.ndarray] -- Arrays with the same number of rows
+    :param chunk_size: int -- Number of rows per chunk
+    :return: generator of dict[Param, np.ndarray]
+    """
+    assert chunk_size >= 1, f'chunk_size must be positive (given: {chunk_size})'
+    lengths = {len(array) for array in data.values()}
+    assert len(lengths) == 1, f'All arrays must have the same number of rows (given: {sorted(lengths)})'
+    n_rows = lengths.pop()
+    for start in range(0, n_rows, chunk_size):
+        yield {param: np.asarray(array[start:start + chunk_size]) for param, array in data.items()}
+
+
+def stream_reduce(expr, point, data, reduction='mean', chunk_size=4096, mode='reverse', deriv=True):
+    """Reduce the values (and derivatives) of `expr` over a dataset, one chunk at a time
+
+    The data is bound to the Params of `expr` one chunk at a time and every
+    chunk is evaluated as one batch by the compiled Tape. Only the running
+    totals are kept between chunks, so peak memory depends on the chunk size
+    and not on the size of the dataset.
+
+    Usage:
+        X, Y = Param('X'), Param('Y')
+        loss = make_expression((w * X + b - Y)**2, vars=[w, b])
+        data = {X: np.load('x.npy', mmap_mode='r'), Y: np.load('y.npy', mmap_mode='r')}
+        value, grad = stream_reduce(loss, (1., 0.), data)
+
+    :param expr: Expression | VectorExpression -- The expression, with data entering through Params
+    :param point: tuple[Number] -- Values of the variables, in the order of expr.vars
+    :param data: dict[Param, np.ndarray] | iterable of dict[Param, np.ndarray] --
+        Arrays split into chunks of `chunk_size` rows, or an iterator of chunks
+    :param reduction: str -- One of {'sum', 'mean'}, over all batch elements
+    :param chunk_size: int -- Number of rows per chunk (if `data` is a dict of arrays)
+    :param mode: str -- One of {'forward', 'reverse'}
+    :param deriv: bool -- Whether to reduce the derivatives as well
+    :return: (value, derivative) if `deriv`, else the value
+    """
+    assert reduction in ('sum', 'mean'), f'Invalid reduction specified: {reduction}. ' \
+                                         f'Please choose one of "sum", "mean".'
+    tape = expr.compile()
+    if isinstance(data, dict):
+        data = iter_chunks(data, chunk_size)
+    total_value = total_deriv = 0
+    count = 0
+    for chunk in data:
+        if deriv:
+            value, derivative = tape.value_and_deriv(*point, mode=mode, params=chunk)
+        else:
+            value = tape.eval(*point, params=chunk)
+        shape = tape.batch_shape(*point, params=chunk)
+        axes = tuple(range(len(shape)))
+        # Values that do not depend on the data are counted once per element of the chunk
+        total_value = total_value + np.sum(np.broadcast_to(value, shape + np.shape(value)[len(shape):]), axis=axes)
+        if deriv:
+            total_deriv = total_deriv + np.sum(derivative, axis=axes)
+        count += int(np.prod(shape))
+    if reduction == 'mean':
+        assert count > 0, 'Cannot average over an empty dataset'
+        total_value = total_value / count
+        total_deriv = total_deriv / count
+    if deriv:
+        return total_value, total_deriv
+    return total_value
@@ -1,8 +1,12 @@
 from typing import Union
+from numbers import Number
 import numpy as np
 from superjacob.expression import Expression, Var, VectorExpression
 from superjacob import operations as ops
 from superjacob.reverse import ReverseDiff
+from superjacob.tape import Tape
+from superjacob.checkpoint import CheckpointedReverseDiff
+from superjacob.dual import Dual, grad
 
 
 def make_expression(*exprs: Union[Var, Expression], vars=None) -> Union[Expression, VectorExpression]:
@@ -99,25 +103,58 @@ def arctan(expr):
 
 
 def sinh(expr):
-    return (exp(expr) - exp(-expr)) / 2
+    return ops.Sinh.expr(expr)
 
 
 def cosh(expr):
-    return (exp(expr) + exp(-expr)) / 2
+    return ops.Cosh.expr(expr)
 
 
 def tanh(expr):
-    return (exp(expr) - exp(-expr)) / (exp(expr) + exp(-expr))
+    return ops.Tanh.expr(expr)
 
 
 def logistic(expr, k=1, x0=0, L=1):
-    return L / (1 + exp(-k * (expr - x0)))
+    # Only add nodes for the parameters that differ from the standard logistic function
+    if not _is_constant(x0, 0):
+        expr = expr - x0
+    if not _is_constant(k, 1):
+        expr = k * expr
+    res = ops.Logistic.expr(expr)
+    if not _is_constant(L, 1):
+        res = L * res
+    return res
 
 
-# Convenience function for reverse mode
-def reverse(expr):
+def softplus(expr):
+    return ops.Softplus.expr(expr)
+
+
+def logsumexp(*exprs):
+    res = exprs[0]
+    for expr in exprs[1:]:
+        res = ops.LogSumExp.expr(res, expr)
+    return res
+
+
+# Convenience function for reverse mode (checkpointed when a memory budget is given)
+def reverse(expr, budget=None):
+    if budget is not None:
+        return CheckpointedReverseDiff(expr, budget)
     return ReverseDiff(expr)
 
 
+# Compile an Expression or VectorExpression into a flat Tape
+def compile(expr):
+    if isinstance(expr, VectorExpression):
+        return Tape(expr.expressions, expr.vars, vector=True)
+    return Tape([expr], expr.vars)
+
+
 ##def dot(expr1, expr2):
 ##    return ops.Dot.expr(expr1, expr2)
+
+
+def _is_constant(value, constant):
+    """Whether `value` is the number `constant` (and not a Var or array)"""
+    return isinstance(value, Number) and value == constant
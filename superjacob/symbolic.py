@@ -0,0 +1,126 @@
+"""
+symbolic.py
+
+Derivatives built as Expressions.
+
+Functions:
+    grad_expr
+        - Gradient of an Expression (or its derivative with respect to one
+          Var) as new Expressions
+    jacobian_expr
+        - Jacobian of a VectorExpression as a VectorExpression
+"""
+from numbers import Number
+
+from superjacob.expression import Expression, VectorExpression, _deps
+from superjacob import operations as ops
+from superjacob.tape import toposort
+
+
+def grad_expr(expr, var=None):
+    """Derivatives of `expr` as Expressions
+
+    A reverse sweep over the graph where adjoints are Expressions: each node
+    passes `adjoint * partial` to its parents, with the partials given by the
+    `partials` rule of its operation. The result refers to the nodes of `expr`
+    (e.g. the derivative of exp(u) uses the node exp(u) itself), so it shares
+    their subexpressions, and it can be evaluated, compiled, batched or
+    differentiated again like any Expression. Products with 0 or 1 and sums
+    with 0 are simplified while building.
+
+    :param expr: Expression -- The expression to differentiate
+    :param var: Var | None -- Variable to differentiate with respect to (default: all of expr.vars)
+    :return: Expression -- The derivative with respect to `var` (or the only variable);
+        VectorExpression -- the gradient, one component per variable of expr.vars
+    """
+    varlist = expr.vars
+    targets = [var] if var is not None else varlist
+    adjoints, nodes = _adjoints(expr, targets)
+    used = set()
+    derivs = [_as_expression(adjoints.get(id(v), 0), nodes, varlist, used) for v in targets]
+    if len(derivs) == 1:
+        return derivs[0]
+    return VectorExpression(derivs, varlist)
+
+
+def jacobian_expr(vector):
+    """Jacobian of a VectorExpression as Expressions
+
+    :param vector: VectorExpression -- The m-dimensional expression of n variables
+    :return: VectorExpression -- The m * n entries of the Jacobian in row-major
+        order (values of shape batch + (m * n,), to reshape to batch + (m, n))
+    """
+    varlist = vector.vars
+    entries = []
+    used = set()
+    for component in vector.expressions:
+        adjoints, nodes = _adjoints(component, varlist)
+        entries += [_as_expression(adjoints.get(id(v), 0), nodes, varlist, used) for v in varlist]
+    return VectorExpression(entries, varlist)
+
+
+def _adjoints(output, targets):
+    """Adjoint Expression of every node of `output` leading to one of `targets`
+
+    :return: (dict[int, Var | Number], set[int]) -- Adjoints by node id, and ids of the nodes of `output`
+    """
+    mask = 0
+    for v in targets:
+        mask |= v.deps
+    order = toposort([output])
+    adjoints = {id(output): 1}
+    for node in reversed(order):
+        adjoint = adjoints.get(id(node))
+        if adjoint is None or not isinstance(node, Expression) or not _deps(node) & mask:
+            continue
+        parents = [node.parent1] if node.parent2 is None else [node.parent1, node.parent2]
+        partials = node.operation.partials(*parents, value=node)
+        if len(parents) == 1:
+            partials = (partials,)
+        for parent, partial in zip(parents, partials):
+            if _deps(parent) & mask:
+                adjoints[id(parent)] = _add(adjoints.get(id(parent)), _mul(adjoint, partial))
+    return adjoints, {id(node) for node in order}
+
+
+def _as_expression(deriv, nodes, varlist, used):
+    """`deriv` as a new Expression with the variables `varlist`
+
+    Vars, constants and nodes of the original graph are wrapped in an Identity
+    node, so that setting the variables does not modify the original graph.
+    So are adjoints already returned for another variable (variables sharing
+    an adjoint node, e.g. x and y in (x + y) ** 2), so that every component
+    is its own node.
+
+    :param used: set[int] -- Ids of the Expressions returned so far, updated in place
+    """
+    if not isinstance(deriv, Expression) or id(deriv) in nodes or id(deriv) in used:
+        deriv = ops.Identity.expr(deriv)
+    used.add(id(deriv))
+    deriv.set_vars(varlist)
+    return deriv
+
+
+def _is(value, constant):
+    """Whether `value` is the number `constant`"""
+    return isinstance(value, Number) and value == constant
+
+
+def _mul(a, b):
+    """a * b, without nodes for products with 0 or 1"""
+    if _is(a, 0) or _is(b, 0):
+        return 0
+    if _is(a, 1):
+        return b
+    if _is(b, 1):
+        return a
+    return a * b
+
+
+def _add(a, b):
+    """a + b (a may be None), without nodes for sums with 0"""
+    if a is None or _is(a, 0):
+        return b
+    if _is(b, 0):
+        return a
+    return a + b
@@ -0,0 +1,448 @@
+"""
+tape.py
+
+A compiled, flat representation of an Expression graph.
+
+Classes:
+    Tape
+        - Topologically ordered list of instructions built once from an
+          Expression or VectorExpression
+        - Evaluates and differentiates without recursion, so it works on
+          deep graphs and on batches of points (NumPy arrays)
+"""
+import numpy as np
+
+from superjacob.expression import Var, Expression, Param, bind
+from superjacob.memory import MemoryPlan, signature
+from superjacob.fusion import FusedChain, fuse
+from superjacob import taylor as ts
+
+
+class Tape:
+    """A compiled Expression.
+
+    Every node of the graph (Vars, Params, constants and Expressions) is
+    assigned a slot. Params are read when the Tape is run, so one Tape serves
+    any values bound to them. Shared subexpressions get a single slot, so each node is evaluated
+    exactly once per call.
+
+    Attributes:
+        vars: list[Var] -- Ordering of the inputs
+        outputs: list[int] -- Slots holding the outputs
+        nodes: list[Var | Number] -- The graph node held by each slot
+        params: list[tuple] -- (slot, Param) for every Param
+        instructions: list[tuple] -- (slot, operation, parent slots) in
+            evaluation order
+        masks: list[int] -- Bitset of the variables each slot depends on
+            (bit `i` for `vars[i]`)
+    """
+    def __init__(self, outputs, varlist, vector=False):
+        """Compile `outputs` into a Tape
+
+        :param outputs: list[Var | Expression | Number] -- Output expressions
+        :param varlist: list[Var] -- Ordering of the inputs
+        :param vector: bool -- Whether the outputs form a VectorExpression
+        """
+        self.vars = list(varlist)
+        self.vector = vector
+        self.nodes = []
+        self.instructions = []
+        self.constants = []
+        self.params = []
+        self.inputs = [None] * len(self.vars)
+        self.active = []
+        self.masks = []
+        self._slots = {}
+        self._cones = {}
+        self._plans = {}
+        self._fused = None
+        var_index = {id(var): i for i, var in enumerate(self.vars)}
+
+        for node in toposort(outputs):
+            slot = self._new_slot(node)
+            if isinstance(node, Expression):
+                parents = tuple(self._parent_slot(p) for p in node.parents if p is not None)
+                self.instructions.append((slot, node.operation, parents))
+                for p in parents:
+                    self.masks[slot] |= self.masks[p]
+                self.active[slot] = self.masks[slot] != 0
+            elif isinstance(node, Param):
+                self.params.append((slot, node))
+            else:
+                assert id(node) in var_index, f'Var {node} is not in the varlist {self.vars}'
+                self.inputs[var_index[id(node)]] = slot
+                self.masks[slot] = 1 << var_index[id(node)]
+                self.active[slot] = True
+        self.outputs = [self._parent_slot(out) for out in outputs]
+        self._arrays = [value for _, value in self.constants if isinstance(value, np.ndarray)]
+
+    def _new_slot(self, node):
+        """Append a slot for `node` and return its index"""
+        slot = len(self.nodes)
+        self.nodes.append(node)
+        self.active.append(False)
+        self.masks.append(0)
+        if isinstance(node, Var):
+            self._slots[id(node)] = slot
+        else:
+            self.constants.append((slot, node))
+        return slot
+
+    def _parent_slot(self, parent):
+        """Get the slot of a parent, adding a slot for numeric constants"""
+        if isinstance(parent, Var):
+            return self._slots[id(parent)]
+        return self._new_slot(parent)
+
+    def __len__(self):
+        return len(self.nodes)
+
+    def forward(self, *args, params=None, partials=False):
+        """Evaluate every slot of the Tape at `args`
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+            in the order of `self.vars`
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param partials: bool -- Whether a derivative sweep follows: fused chains then compute
+            their partial in the same pass and keep it for `deriv` / `reverse`
+        :return: list -- The value of every slot
+        """
+        with bind(params):
+            values = self._load_inputs(args)
+            for slot, op, parents in self.instructions:
+                if partials and isinstance(op, FusedChain):
+                    values[slot] = op.value_and_partial(*[values[p] for p in parents])[0]
+                else:
+                    values[slot] = op.eval(*[values[p] for p in parents])
+            return values
+
+    def eval(self, *args, params=None, out=None):
+        """Evaluate the outputs at `args`
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: np.ndarray | None -- Buffer to write the value into
+        :return: Number | np.ndarray -- The value (scalar output), or an array
+            of shape batch + (m,) (vector output); `out` if given
+        """
+        with bind(params):
+            values = self.forward(*args)
+            return self._collect_values(values, self.batch_shape(*args), out)
+
+    def deriv(self, *args, mode='reverse', params=None, out=None):
+        """Differentiate the outputs at `args`
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param mode: str -- One of {'forward', 'reverse'}
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: np.ndarray | None -- Buffer to write the derivative into
+        :return: np.ndarray -- Gradient of shape batch + (n,) (scalar output)
+            or Jacobian of shape batch + (m, n) (vector output); `out` if given
+        """
+        with bind(params):
+            values = self.forward(*args, partials=True)
+            shape = self.batch_shape(*args)
+            return self._collect_derivs(self._deriv_rows(values, mode, shape), shape, out)
+
+    def value_and_deriv(self, *args, mode='reverse', params=None, out=None):
+        """Evaluate and differentiate the outputs at `args`, sharing the forward sweep
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param mode: str -- One of {'forward', 'reverse'}
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param out: tuple[np.ndarray | None] | None -- Buffers for the value and the derivative
+        :return: tuple -- The value (as `eval`) and the derivative (as `deriv`)
+        """
+        value_out, deriv_out = (None, None) if out is None else out
+        with bind(params):
+            values = self.forward(*args, partials=True)
+            shape = self.batch_shape(*args)
+            return self._collect_values(values, shape, value_out), \
+                self._collect_derivs(self._deriv_rows(values, mode, shape), shape, deriv_out)
+
+    def _deriv_rows(self, values, mode, shape):
+        """Derivative of every output with respect to every input, as nested lists"""
+        assert mode in ('forward', 'reverse'), f'Invalid mode specified: {mode}. ' \
+                                               f'Please choose one of "forward", "reverse".'
+        if mode == 'forward':
+            # A single sweep: every variable is seeded with a unit vector along a leading axis,
+            # so the tangent of each output holds its whole row of the Jacobian
+            n = len(self.vars)
+            unit = np.eye(n).reshape((n, n) + (1,) * len(shape))
+            tangents = self.tangents(values, {slot: unit[i] for i, slot in enumerate(self.inputs) if slot is not None})
+            return [list(np.broadcast_to(tangents[out], (n,) + shape)) for out in self.outputs]
+        return [self.adjoints(values, {out: 1}, self._cone(out)) for out in self.outputs]
+
+    def jvp(self, args, v, params=None):
+        """Jacobian-vector product J(args) . v with a single forward sweep
+
+        :param args: list[Number | np.ndarray] -- Point (or batch of points)
+        :param v: list[Number | np.ndarray] -- Direction, one entry per variable
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: Number | np.ndarray -- Directional derivative (scalar output)
+            or array of shape batch + (m,) (vector output)
+        """
+        assert len(v) == len(self.vars), \
+            f'Direction length does not match dimension of Expression domain ({len(v)}, {len(self.vars)})'
+        with bind(params):
+            values = self.forward(*args, partials=True)
+            seeds = {slot: d for slot, d in zip(self.inputs, v) if slot is not None}
+            tangents = self.tangents(values, seeds)
+            return self._collect_values(tangents, self.batch_shape(*args, *v))
+
+    def vjp(self, args, u, params=None):
+        """Vector-Jacobian product u . J(args) with a single reverse sweep
+
+        :param args: list[Number | np.ndarray] -- Point (or batch of points)
+        :param u: Number | list[Number | np.ndarray] -- Output weights (a single
+            number for a scalar output, one entry per output otherwise)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- Array of shape batch + (n,)
+        """
+        if not self.vector:
+            u = [u]
+        assert len(u) == len(self.outputs), \
+            f'Weight length does not match dimension of Expression co-domain ({len(u)}, {len(self.outputs)})'
+        with bind(params):
+            values = self.forward(*args, partials=True)
+            seeds = {}
+            for slot, w in zip(self.outputs, u):
+                seeds[slot] = w if slot not in seeds else seeds[slot] + w
+            adjoints = self.adjoints(values, seeds)
+            shape = self.batch_shape(*args, *u)
+            return np.stack([np.broadcast_to(a, shape) for a in adjoints], axis=-1)
+
+    def taylor(self, args, v, order, params=None, coefficients=False):
+        """Derivatives of t -> f(args + t v) at t = 0, up to `order`, in Taylor mode
+
+        Every slot holds the truncated Taylor series of its value in t, and every
+        instruction maps the series of its parents to its own (see
+        superjacob.taylor), so the cost is O(order^2) per instruction.
+
+        :param args: list[Number | np.ndarray] -- Point (or batch of points)
+        :param v: list[Number | np.ndarray] -- Direction, one entry per variable
+        :param order: int -- Highest derivative
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :param coefficients: bool -- Return the Taylor coefficients (the k-th derivative divided by k!)
+        :return: np.ndarray -- Array of shape batch + (order + 1,) (scalar output)
+            or batch + (m, order + 1) (vector output); entry k is the k-th derivative
+        """
+        with bind(params):
+            assert len(args) == len(self.vars) and len(v) == len(self.vars), \
+                f'Input length does not match dimension of Expression domain ({len(args)}, {len(self.vars)})'
+            shape = self.batch_shape(*args, *v)
+            values = [None] * len(self.nodes)
+            for slot, value in self.constants:
+                values[slot] = ts.constant(value, order, len(shape))
+            for slot, param in self.params:
+                values[slot] = ts.constant(param.eval(), order, len(shape))
+            for slot, x, d in zip(self.inputs, args, v):
+                if slot is not None:
+                    values[slot] = ts.variable(x, d, order, len(shape))
+            for slot, op, parents in self.instructions:
+                values[slot] = op.taylor(*[values[p] for p in parents])
+            scale = 1 if coefficients else np.cumprod([1] + list(range(1, order + 1)))
+            res = [np.moveaxis(np.broadcast_to(values[out], (order + 1,) + shape), 0, -1) * scale
+                   for out in self.outputs]
+            if not self.vector:
+                return res[0]
+            return np.stack(res, axis=-2)
+
+    def tangents(self, values, seeds, mask=None):
+        """Propagate tangents forward through the Tape (one forward sweep)
+
+        :param values: list -- Slot values from `forward`
+        :param seeds: dict[int, Number | np.ndarray] -- Tangent of each input slot
+        :param mask: int | None -- Bitset of the seeded variables; slots that
+            depend on none of them are skipped (default: skip constant slots only)
+        :return: list -- The tangent of every slot
+        """
+        tangents = [0] * len(self.nodes)
+        for slot, tangent in seeds.items():
+            tangents[slot] = tangent
+        for slot, op, parents in self.instructions:
+            if not self.active[slot] or (mask is not None and not self.masks[slot] & mask):
+                continue
+            args = []
+            for p in parents:
+                args += [values[p], tangents[p]]
+            tangents[slot] = op.deriv(*args, value=values[slot])
+        return tangents
+
+    def adjoints(self, values, seeds, instructions=None):
+        """Propagate adjoints backward through the Tape (one reverse sweep)
+
+        :param values: list -- Slot values from `forward`
+        :param seeds: dict[int, Number | np.ndarray] -- Adjoint of each output slot
+        :param instructions: list[tuple] | None -- The instructions to sweep
+            (default: all of them)
+        :return: list -- The adjoint of each input, in the order of `self.vars`
+        """
+        adjoints = [None] * len(self.nodes)
+        for slot, adjoint in seeds.items():
+            adjoints[slot] = adjoint if adjoints[slot] is None else adjoints[slot] + adjoint
+        if instructions is None:
+            instructions = self.instructions
+        for slot, op, parents in reversed(instructions):
+            adjoint = adjoints[slot]
+            if adjoint is None:
+                continue
+            partials = op.reverse(*[values[p] for p in parents], value=values[slot])
+            if len(parents) == 1:
+                partials = (partials,)
+            for p, partial in zip(parents, partials):
+                if self.active[p]:
+                    contrib = adjoint * partial
+                    adjoints[p] = contrib if adjoints[p] is None else adjoints[p] + contrib
+        return [0 if slot is None or adjoints[slot] is None else adjoints[slot]
+                for slot in self.inputs]
+
+    def batch_shape(self, *args, params=None):
+        """Broadcast shape of `args`, of the values bound to the Params and of the array constants
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: tuple[int]
+        """
+        with bind(params):
+            return batch_shape(*args, *[param.bound_value for _, param in self.params], *self._arrays)
+
+    def fused(self):
+        """A copy of this Tape with chains of elementwise instructions fused (cached)
+
+        :return: Tape
+        """
+        if self._fused is None:
+            self._fused = fuse(self)
+        return self._fused
+
+    def memory_plan(self, *args, params=None):
+        """The MemoryPlan for evaluating at inputs like `args` (cached per shapes and dtypes)
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: MemoryPlan
+        """
+        with bind(params):
+            key = signature(self, args)
+            if key not in self._plans:
+                self._plans[key] = MemoryPlan(self, *args)
+            return self._plans[key]
+
+    def _load_inputs(self, args):
+        """Slot values with the constants, the Params and the inputs `args` filled in"""
+        assert len(args) == len(self.vars), \
+            f'Input length does not match dimension of Expression domain ({len(args)}, {len(self.vars)})'
+        values = [None] * len(self.nodes)
+        self._fill_fixed(values)
+        for slot, value in zip(self.inputs, args):
+            if slot is not None:
+                values[slot] = value
+        return values
+
+    def _fill_fixed(self, values):
+        """Write the constants and the bound Param values into `values`"""
+        for slot, value in self.constants:
+            values[slot] = value
+        for slot, param in self.params:
+            values[slot] = param.eval()
+
+    def _cone(self, output):
+        """The active instructions `output` depends on, in evaluation order (cached)
+
+        Restricting the reverse sweep of one output to its cone skips the
+        subgraphs of the other outputs when assembling a Jacobian.
+        """
+        if output not in self._cones:
+            needed = {output}
+            cone = []
+            for instruction in reversed(self.instructions):
+                slot, _, parents = instruction
+                if slot in needed and self.active[slot]:
+                    cone.append(instruction)
+                    needed.update(parents)
+            self._cones[output] = cone[::-1]
+        return self._cones[output]
+
+    def _collect_values(self, values, shape, out=None):
+        """Gather the output values, broadcasting to the batch shape (written into `out` if given)"""
+        if out is not None:
+            expected = shape + (len(self.outputs),) if self.vector else shape
+            assert out.shape == expected, f'Output buffer has shape {out.shape} (required: {expected})'
+            if not self.vector:
+                out[...] = values[self.outputs[0]]
+            else:
+                for k, slot in enumerate(self.outputs):
+                    out[..., k] = values[slot]
+            return out
+        if not self.vector:
+            return values[self.outputs[0]]
+        return np.stack([np.broadcast_to(values[out], shape) for out in self.outputs], axis=-1)
+
+    def _collect_derivs(self, rows, shape, out=None):
+        """Stack per-output derivative rows into a gradient or Jacobian (written into `out` if given)"""
+        if out is not None:
+            target = out if self.vector else out[..., np.newaxis, :]
+            expected = shape + (len(self.outputs), len(self.vars))
+            assert target.shape == expected, f'Output buffer has shape {out.shape} (required: {expected})'
+            for k, row in enumerate(rows):
+                for i, d in enumerate(row):
+                    target[..., k, i] = d
+            return out
+        if shape == ():
+            res = np.array(rows, dtype=float)
+        else:
+            res = np.stack([np.stack([np.broadcast_to(d, shape) for d in row], axis=-1) for row in rows], axis=-2)
+        if not self.vector:
+            return res[..., 0, :]
+        return res
+
+    def __call__(self, *args, **kwargs):
+        return self.eval(*args)
+
+    def __repr__(self):
+        return f'Tape({len(self.nodes)} slots, {len(self.instructions)} instructions)'
+
+
+def batch_shape(*args):
+    """Broadcast shape of a set of arguments (the empty tuple for scalars)
+
+    :param args: tuple[Number | np.ndarray] -- Arguments
+    :return: tuple[int]
+    """
+    ndim = max([np.ndim(a) for a in args] + [0])
+    shape = [1] * ndim
+    for a in args:
+        a_shape = np.shape(a)
+        for i, d in enumerate(a_shape, ndim - len(a_shape)):
+            if d != 1:
+                if shape[i] not in (1, d):
+                    raise ValueError(f'Arguments could not be broadcast together: {[np.shape(a) for a in args]}')
+                shape[i] = d
+    return tuple(shape)
+
+
+def toposort(outputs):
+    """Order the nodes reachable from `outputs` so parents come before children.
+
+    Uses an explicit stack rather than recursion so very deep graphs can be compiled.
+
+    :param outputs: list[Var | Number] -- Root nodes
+    :return: list[Var] -- Vars and Expressions in topological order
+    """
+    order = []
+    seen = set()
+    stack = [(out, False) for out in reversed(outputs)]
+    while stack:
+        node, expanded = stack.pop()
+        if expanded:
+            order.append(node)
+            continue
+        if not isinstance(node, Var) or id(node) in seen:
+            continue
+        seen.add(id(node))
+        stack.append((node, True))
+        if isinstance(node, Expression):
+            for parent in reversed(node.parents):
+                stack.append((parent, False))
+    return order
@@ -0,0 +1,182 @@
+"""
+taylor.py
+
+Truncated power series arithmetic for Taylor mode differentiation.
+
+A series is an array of coefficients y_0, ..., y_K along its first axis
+(the other axes are the batch), standing for y(t) = sum_k y_k t^k. Every
+function costs O(K^2) per call: the coefficients follow from the recurrences
+obtained by differentiating y = f(a) once (y' = f'(a) a').
+
+Functions:
+    constant, variable
+        - Series of a constant and of x + t v
+    mul, div, reciprocal, power, int_power, sqrt
+        - Arithmetic
+    exp, log, sincos, sinhcosh, tanh, logistic
+        - Elementary functions
+    integrate, solve
+        - Series of y with y' = g a', for a known series g or for g a function of y
+"""
+import numpy as np
+
+
+def constant(value, order, ndim=0):
+    """Series of a constant
+
+    :param value: Number | np.ndarray -- The constant
+    :param order: int -- Highest coefficient K
+    :param ndim: int -- Number of batch axes (the shape of `value` is padded with leading 1s)
+    :return: np.ndarray -- Array of shape (K + 1,) + batch
+    """
+    shape = (1,) * (ndim - np.ndim(value)) + np.shape(value)
+    coeffs = np.zeros((order + 1,) + shape, dtype=np.result_type(value, float))
+    coeffs[0] = np.reshape(value, shape)
+    return coeffs
+
+
+def variable(value, direction, order, ndim=0):
+    """Series of `value + t * direction`
+
+    :param value: Number | np.ndarray -- Point
+    :param direction: Number | np.ndarray -- Direction
+    :param order: int -- Highest coefficient K
+    :param ndim: int -- Number of batch axes
+    :return: np.ndarray -- Array of shape (K + 1,) + batch
+    """
+    shape = np.broadcast(value, direction).shape
+    coeffs = constant(np.broadcast_to(value, shape), order, ndim)
+    if order >= 1:
+        coeffs[1] = direction
+    return coeffs
+
+
+def _zeros(*series, value=0.):
+    """Array for the result of a function of `series`"""
+    shape = np.broadcast(*series).shape
+    return np.zeros(shape, dtype=np.result_type(value, *series))
+
+
+def _weights(k, ndim):
+    """1, ..., k along the coefficient axis"""
+    return np.arange(1, k + 1).reshape((k,) + (1,) * ndim)
+
+
+def mul(a, b):
+    """a * b"""
+    c = _zeros(a, b)
+    for k in range(len(c)):
+        c[k] = np.sum(a[:k + 1] * b[k::-1], axis=0)
+    return c
+
+
+def div(a, b):
+    """a / b"""
+    c = _zeros(a, b)
+    c[0] = a[0] / b[0]
+    for k in range(1, len(c)):
+        c[k] = (a[k] - np.sum(b[1:k + 1] * c[k - 1::-1], axis=0)) / b[0]
+    return c
+
+
+def reciprocal(a):
+    """1 / a"""
+    return power(a, -1)
+
+
+def power(a, c):
+    """a^c for a constant exponent `c` (a_0 must not be 0)"""
+    y = _zeros(a, value=a[0] ** c)
+    y[0] = a[0] ** c
+    for k in range(1, len(y)):
+        j = _weights(k, a.ndim - 1)
+        y[k] = np.sum((c * j - (k - j)) * a[1:k + 1] * y[k - 1::-1], axis=0) / (k * a[0])
+    return y
+
+
+def int_power(a, n):
+    """a^n for an integer `n`, by repeated squaring (exact when a_0 is 0 and n >= 0)"""
+    if n < 0:
+        return reciprocal(int_power(a, -n))
+    res = constant(1., len(a) - 1, a.ndim - 1)
+    while n:
+        if n & 1:
+            res = mul(res, a)
+        n >>= 1
+        if n:
+            a = mul(a, a)
+    return res
+
+
+def sqrt(a):
+    """Square root of a (a_0 must be positive)"""
+    y = _zeros(a)
+    y[0] = np.sqrt(a[0])
+    for k in range(1, len(y)):
+        y[k] = (a[k] - np.sum(y[1:k] * y[k - 1:0:-1], axis=0)) / (2 * y[0])
+    return y
+
+
+def integrate(a, y0, g):
+    """Series of y with y(0) = y0 and y' = g a', for a known series `g`"""
+    y = _zeros(a, g, value=y0)
+    y[0] = y0
+    for k in range(1, len(y)):
+        y[k] = np.sum(_weights(k, a.ndim - 1) * a[1:k + 1] * g[k - 1::-1], axis=0) / k
+    return y
+
+
+def solve(a, y0, g):
+    """Series of y with y(0) = y0 and y' = g(y) a'
+
+    :param g: callable -- g(y, m) is the m-th coefficient of g(y), from y_0, ..., y_m
+    """
+    y = _zeros(a, value=y0)
+    y[0] = y0
+    gs = np.zeros_like(y)
+    for k in range(1, len(y)):
+        gs[k - 1] = g(y, k - 1)
+        y[k] = np.sum(_weights(k, a.ndim - 1) * a[1:k + 1] * gs[k - 1::-1], axis=0) / k
+    return y
+
+
+def exp(a):
+    """exp(a)"""
+    return solve(a, np.exp(a[0]), lambda y, m: y[m])
+
+
+def log(a):
+    """Natural logarithm of a"""
+    return integrate(a, np.log(a[0]), reciprocal(a))
+
+
+def sincos(a):
+    """(sin(a), cos(a)), computed together"""
+    s, c = _zeros(a), _zeros(a)
+    s[0], c[0] = np.sin(a[0]), np.cos(a[0])
+    for k in range(1, len(s)):
+        ja = _weights(k, a.ndim - 1) * a[1:k + 1]
+        s[k] = np.sum(ja * c[k - 1::-1], axis=0) / k
+        c[k] = -np.sum(ja * s[k - 1::-1], axis=0) / k
+    return s, c
+
+
+def sinhcosh(a):
+    """(sinh(a), cosh(a)), computed together"""
+    s, c = _zeros(a), _zeros(a)
+    s[0], c[0] = np.sinh(a[0]), np.cosh(a[0])
+    for k in range(1, len(s)):
+        ja = _weights(k, a.ndim - 1) * a[1:k + 1]
+        s[k] = np.sum(ja * c[k - 1::-1], axis=0) / k
+        c[k] = np.sum(ja * s[k - 1::-1], axis=0) / k
+    return s, c
+
+
+def tanh(a):
+    """tanh(a), from tanh' = 1 - tanh^2"""
+    return solve(a, np.tanh(a[0]), lambda y, m: (m == 0) - np.sum(y[:m + 1] * y[m::-1], axis=0))
+
+
+def logistic(a, y0):
+    """Logistic function of a, with value `y0`, from y' = y - y^2"""
+    return solve(a, y0, lambda y, m: y[m] - np.sum(y[:m + 1] * y[m::-1], axis=0))
@@ -0,0 +1,131 @@
+"""
+tracing.py
+
+Compilation of plain Python functions into Tapes.
+
+Classes:
+    JitFunction
+        - Wraps a Python function, traced with symbolic Vars into a Tape
+        - Keeps one Tape per input signature (shapes and dtypes) and sends
+          values, gradients and Jacobians to it
+
+Functions:
+    jit
+        - Decorator returning a JitFunction
+"""
+import functools
+import inspect
+
+import numpy as np
+
+from superjacob.expression import Var
+from superjacob.tape import Tape
+
+
+class JitFunction:
+    """A Python function compiled to Tapes on first use.
+
+    The function is called with one Var per argument, so it must build its
+    result with arithmetic operators and the functions of superjacob (Params
+    it closes over are bound at call time with `params=`). The graph it
+    returns is compiled to a Tape, with chains of elementwise operations
+    fused, and cached under the shapes and dtypes of the arguments. Later
+    calls with the same signature skip the Python function entirely.
+
+    Usage:
+        @jit
+        def f(x, y):
+            return sj.sin(x) * y + x ** 2
+
+        f(1., 2.)                 # value
+        f.grad(1., 2.)            # gradient
+        f.grad(np.ones(100), 2.)  # batch of gradients, traced once more for the new signature
+
+    Attributes:
+        fn: callable -- The wrapped function
+        cache: dict[tuple, Tape] -- Tape for each input signature
+        n_traces: int -- Number of times `fn` was traced
+    """
+    def __init__(self, fn):
+        """Initialize a JitFunction
+
+        :param fn: callable -- Function of numbers returning a number or a list of numbers
+        """
+        self.fn = fn
+        self.cache = {}
+        self.n_traces = 0
+        self._names = [p.name for p in inspect.signature(fn).parameters.values()
+                       if p.kind in (p.POSITIONAL_ONLY, p.POSITIONAL_OR_KEYWORD)]
+        functools.update_wrapper(self, fn)
+
+    def compile(self, *args):
+        """The Tape for arguments like `args`, traced on the first call with their signature
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :return: Tape
+        """
+        key = tuple((np.shape(a), np.result_type(a)) for a in args)
+        if key not in self.cache:
+            self.cache[key] = self._trace(len(args))
+        return self.cache[key]
+
+    def _trace(self, n):
+        """Call `fn` with `n` symbolic Vars and compile the result"""
+        names = self._names[:n] + [f'x{i}' for i in range(len(self._names), n)]
+        varlist = [Var(name) for name in names]
+        res = self.fn(*varlist)
+        self.n_traces += 1
+        if isinstance(res, (list, tuple)):
+            return Tape(list(res), varlist, vector=True).fused()
+        return Tape([res], varlist).fused()
+
+    def __call__(self, *args, params=None):
+        """Value at `args`
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: Number | np.ndarray -- As `Tape.eval`
+        """
+        return self.compile(*args).eval(*args, params=params)
+
+    def grad(self, *args, mode='reverse', params=None):
+        """Gradient (scalar output) or Jacobian (vector output) at `args`
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param mode: str -- One of {'forward', 'reverse'}
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- As `Tape.deriv`
+        """
+        return self.compile(*args).deriv(*args, mode=mode, params=params)
+
+    def jacobian(self, *args, mode='forward', params=None):
+        """Jacobian at `args` (forward mode by default, suited to many outputs)
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param mode: str -- One of {'forward', 'reverse'}
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- As `Tape.deriv`
+        """
+        return self.compile(*args).deriv(*args, mode=mode, params=params)
+
+    def value_and_grad(self, *args, mode='reverse', params=None):
+        """Value and gradient (or Jacobian) at `args`, sharing the forward sweep
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points)
+        :param mode: str -- One of {'forward', 'reverse'}
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: tuple -- As `Tape.value_and_deriv`
+        """
+        return self.compile(*args).value_and_deriv(*args, mode=mode, params=params)
+
+    def __repr__(self):
+        return f'jit({self.__name__}, {len(self.cache)} signatures)'
+
+
+def jit(fn):
+    """Compile a Python function to Tapes, traced once per input signature
+
+    :param fn: callable -- Function of numbers returning a number or a list of numbers
+    :return: JitFunction
+    """
+    return JitFunction(fn)
@@ -0,0 +1,81 @@
+"""
+workspace.py
+
+Reusable result buffers for evaluating the same expression many times.
+
+Classes:
+    Workspace
+        - Owns the value and derivative buffers for one compiled expression
+          and one batch shape, so repeated calls allocate no result arrays
+"""
+import numpy as np
+
+
+class Workspace:
+    """Preallocated outputs for repeated evaluation and differentiation.
+
+    Every call writes into the same buffers and returns them, so the results
+    of a call are overwritten by the next one (copy them to keep them).
+
+    Usage:
+        ws = Workspace(f, shape=(1000,))
+        for step in range(n_steps):
+            value, grad = ws.value_and_deriv(xs, ys)
+
+    Attributes:
+        tape: Tape -- The compiled expression
+        shape: tuple[int] -- Batch shape of the inputs (() for a single point)
+        mode: str -- Differentiation mode, one of {'forward', 'reverse'}
+        value: np.ndarray -- Value buffer, of shape `shape` (scalar output)
+            or shape + (m,) (vector output)
+        derivative: np.ndarray -- Gradient buffer of shape shape + (n,), or
+            Jacobian buffer of shape shape + (m, n)
+    """
+    def __init__(self, expr, shape=(), mode='reverse'):
+        """Initialize a Workspace
+
+        :param expr: Expression | VectorExpression -- The expression to evaluate
+        :param shape: tuple[int] -- Batch shape of the inputs (default: a single point)
+        :param mode: str -- One of {'forward', 'reverse'}
+        """
+        self.tape = expr.compile()
+        self.shape = tuple(shape)
+        self.mode = mode
+        m, n = len(self.tape.outputs), len(self.tape.vars)
+        if self.tape.vector:
+            self.value = np.empty(self.shape + (m,))
+            self.derivative = np.empty(self.shape + (m, n))
+        else:
+            self.value = np.empty(self.shape)
+            self.derivative = np.empty(self.shape + (n,))
+
+    def eval(self, *args, params=None):
+        """Evaluate at `args` into `self.value`
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points) of shape `self.shape`
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- `self.value`
+        """
+        return self.tape.eval(*args, params=params, out=self.value)
+
+    def deriv(self, *args, params=None):
+        """Differentiate at `args` into `self.derivative`
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points) of shape `self.shape`
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: np.ndarray -- `self.derivative`
+        """
+        return self.tape.deriv(*args, mode=self.mode, params=params, out=self.derivative)
+
+    def value_and_deriv(self, *args, params=None):
+        """Evaluate and differentiate at `args` with a single forward sweep
+
+        :param args: tuple[Number | np.ndarray] -- Point (or batch of points) of shape `self.shape`
+        :param params: dict[Param, Number | np.ndarray] | None -- Values to bind to Params
+        :return: (np.ndarray, np.ndarray) -- `self.value` and `self.derivative`
+        """
+        return self.tape.value_and_deriv(*args, mode=self.mode, params=params,
+                                         out=(self.value, self.derivative))
+
+    def __repr__(self):
+        return f'Workspace({self.tape}, shape={self.shape}, mode={self.mode!r})'
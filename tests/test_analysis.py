@@ -0,0 +1,85 @@
+"""
+test_analysis.py
+
+Testing graph statistics and cost estimates
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+
+
+x, y, z = Var('x'), Var('y'), Var('z')
+
+
+def test_stats_tree():
+    f = make_expression(sd.sin(x) * y + 2, vars=[x, y])
+    stats = f.stats()
+    assert stats.dag_size == 5
+    assert stats.tree_size == 6
+    assert stats.n_constants == 1
+    assert stats.depth == 3
+    assert stats.max_fanout == 1
+    assert stats.op_histogram == {'Sin': 1, 'Mul': 1, 'Add': 1}
+    assert f.stats() is stats
+
+
+def test_stats_dag():
+    g = x * y
+    for _ in range(30):
+        g = g + g
+    stats = make_expression(g, vars=[x, y]).stats()
+    assert stats.dag_size == 33
+    assert stats.tree_size == 2**30 * 3 + 2**30 - 1
+    assert not stats.is_tree
+    assert stats.sharing_ratio > 1e7
+    assert stats.depth == 31
+
+
+def test_stats_fanout_and_costs():
+    s = sd.exp(x)
+    f = make_expression(s * y + s * z + s, vars=[x, y, z])
+    stats = f.stats()
+    assert stats.max_fanout == 3
+    assert stats.costs['eval'] == 10 + 1 + 1 + 1 + 1
+    assert stats.costs['forward'] > stats.costs['eval']
+    assert stats.costs['reverse'] > stats.costs['eval']
+    assert set(stats.as_dict()) >= {'dag_size', 'tree_size', 'costs', 'times'}
+
+
+def test_best_mode():
+    # One input: forward mode is cheaper
+    f = make_expression(sd.sin(x) * sd.cos(x), vars=[x])
+    assert f.stats().best_mode() == 'forward'
+
+    # Many inputs, one output: reverse mode is cheaper
+    xs = [Var(f'x{i}') for i in range(10)]
+    g = sum(sd.sin(v) for v in xs[1:]) + sd.sin(xs[0])
+    g = make_expression(g, vars=xs)
+    assert g.stats().best_mode() == 'reverse'
+    assert np.allclose(g.deriv(*range(10), mode='auto'), g.deriv(*range(10)))
+
+    # Many outputs, one input: forward mode is cheaper
+    h = make_expression(sd.sin(x), sd.cos(x), sd.exp(x), x * x, vars=[x])
+    assert h.stats().n_outputs == 4
+    assert h.stats().best_mode() == 'forward'
+
+
+@pytest.mark.parametrize('n_vars, n_outputs, mode', [(1, 1, 'forward'), (3, 1, 'reverse'),
+                                                     (3, 4, 'forward'), (2000, 2, 'reverse')])
+def test_best_mode_flips(n_vars, n_outputs, mode):
+    # Forward mode is a single sweep with one tangent per variable, reverse mode a sweep per output
+    xs = [Var(f'x{i}') for i in range(n_vars)]
+    terms = [sd.sin(v) for v in xs]
+    while len(terms) > 1:  # Pairwise sum, so that building the graph stays fast
+        terms = [terms[i] + terms[i + 1] if i + 1 < len(terms) else terms[i] for i in range(0, len(terms), 2)]
+    trunk = sd.cos(terms[0])
+    outputs = [trunk * (k + 2) for k in range(n_outputs)]
+    f = make_expression(*outputs, vars=xs)
+    assert f.stats().best_mode() == mode
+    point = np.linspace(0, 1, n_vars)
+    if n_outputs == 1:
+        assert np.allclose(f.deriv(*point, mode='auto'), f.deriv(*point, mode='reverse'))
+    else:
+        assert np.allclose(f.jacobian(*point), f.jacobian(*point, mode='reverse'))
@@ -0,0 +1,68 @@
+"""
+test_batch.py
+
+Testing that evaluation and differentiation are elementwise over (N,)-shaped inputs
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+
+
+x, y = Var('x'), Var('y')
+xs = np.linspace(0.1, 0.9, 7)
+ys = np.linspace(-2, 2, 7) + 0.1
+
+UNARY = [sd.sqrt, sd.neg, sd.exp, sd.nlog, sd.log, sd.sin, sd.cos, sd.tan, sd.csc, sd.sec, sd.cot,
+         sd.arcsin, sd.arccos, sd.arctan, sd.sinh, sd.cosh, sd.tanh, sd.logistic, sd.softplus,
+         lambda e: e**2, lambda e: e**-1, lambda e: e**3, lambda e: e**-2, lambda e: e**0.5]
+BINARY = [sd.add, sd.sub, sd.mul, sd.div, sd.pow, sd.log, sd.logsumexp,
+          lambda a, b: sd.pow(b, a), lambda a, b: sd.pow(b, a * 2)]
+
+
+def _check_batch(f, *batch):
+    values = f.eval(*batch)
+    for mode in ('forward', 'reverse'):
+        grads = f.deriv(*batch, mode=mode)
+        assert np.shape(grads) == (len(batch[0]), len(batch)) or len(batch) == 1
+        for i in range(len(batch[0])):
+            point = [b[i] for b in batch]
+            assert np.isclose(values[i], f.eval(*point), equal_nan=True)
+            assert np.allclose(np.reshape(grads[i], -1), np.reshape(f.deriv(*point, mode=mode), -1), equal_nan=True)
+    # Outside the domain (nan value) the partials of the different modes may differ
+    inside = np.isfinite(np.broadcast_to(values, batch[0].shape))
+    tape_grads = np.reshape(f.compile().deriv(*batch), (len(batch[0]), -1))
+    assert np.allclose(tape_grads[inside], np.reshape(f.deriv(*batch), (len(batch[0]), -1))[inside])
+
+
+def test_batch_unary():
+    for fn in UNARY:
+        _check_batch(make_expression(fn(x), vars=[x]), xs)
+        _check_batch(make_expression(fn(x) * y, vars=[x, y]), xs, ys)
+
+
+def test_batch_binary():
+    # Includes negative bases for Pow (real and complex branches chosen elementwise)
+    for fn in BINARY:
+        _check_batch(make_expression(fn(x, y) + x, vars=[x, y]), xs + 1, ys)
+        _check_batch(make_expression(fn(y, x), vars=[x, y]), xs + 1, ys)
+
+
+def test_batch_vector_expression():
+    f = make_expression(x * y, sd.sin(x) - y, vars=[x, y])
+    J = f.deriv(xs, ys)
+    assert J.shape == (7, 2, 2)
+    for i in range(7):
+        assert np.allclose(J[i], f.deriv(xs[i], ys[i]))
+        assert np.allclose(f.deriv(xs, ys, var=y)[i], f.deriv(xs[i], ys[i], var=y))
+    assert np.allclose(f.deriv(xs, ys, mode='reverse'), J)
+
+
+def test_repeated_parents():
+    f = make_expression(x - x + y * y / y, vars=[x, y])
+    assert np.allclose(f.deriv(2., 3., mode='reverse'), [0, 1])
+    assert np.allclose(f.deriv(2., 3.), [0, 1])
+    g = make_expression(x - y, x + y, vars=[x, y])
+    assert np.allclose(g.deriv(2, 4, var=x), [[1], [1]])
+    assert np.allclose(g.deriv(2, 4, var=y), [[-1], [1]])
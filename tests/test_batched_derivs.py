@@ -0,0 +1,54 @@
+"""
+test_batched_derivs.py
+
+Testing batched Jacobians and Hessians
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+
+
+def test_batched_jacobian():
+    x, y, z = sd.Var('x'), sd.Var('y'), sd.Var('z')
+    f = sd.make_expression(x * y * z, sd.sin(x) + sd.exp(z), y / z, vars=[x, y, z])
+    rng = np.random.RandomState(0)
+    xs, ys, zs = rng.uniform(0.5, 2, (3, 1000))
+    for mode in ['forward', 'reverse', 'auto']:
+        jac = f.jacobian(xs, ys, zs, mode=mode)
+        assert jac.shape == (1000, 3, 3)
+        for i in [0, 17, 999]:
+            assert np.allclose(jac[i], f.deriv(xs[i], ys[i], zs[i]))
+    out = np.empty((1000, 3, 3))
+    assert f.jacobian(xs, ys, zs, out=out) is out
+
+
+def test_batched_hessian():
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression(sd.exp(x * y) + sd.sin(x) ** 2 + y ** 3, vars=[x, y])
+    xs = np.linspace(-1, 1, 500)
+    ys = np.linspace(0, 2, 500)
+    hess = f.hessian(xs, ys)
+    assert hess.shape == (500, 2, 2)
+    e = np.exp(xs * ys)
+    assert np.allclose(hess[:, 0, 0], ys ** 2 * e + 2 * np.cos(2 * xs))
+    assert np.allclose(hess[:, 0, 1], e + xs * ys * e)
+    assert np.allclose(hess[:, 1, 0], hess[:, 0, 1])
+    assert np.allclose(hess[:, 1, 1], xs ** 2 * e + 6 * ys)
+    assert np.allclose(f.hessian(0.5, 1.), f.hessian(np.array([0.5]), np.array([1.]))[0])
+
+
+def test_hessian_single_variable_and_params():
+    x = sd.Var('x')
+    a = sd.Param('a')
+    f = sd.make_expression(a * x ** 4, vars=[x])
+    assert np.allclose(f.hessian(np.array([1., 2.]), params={a: 2.}), [[[24.]], [[96.]]])
+    assert f.hessian(1., params={a: 1.}).shape == (1, 1)
+
+
+def test_hessian_shared_adjoints():
+    # x and y share the adjoint of x + y, each row of the Hessian is still its own component
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression((x + y - 1) ** 2, vars=[x, y])
+    hess = f.hessian(0., 0.)
+    assert hess.shape == (2, 2) and np.allclose(hess, 2.)
+    assert f.hessian(np.zeros(3), np.ones(3)).shape == (3, 2, 2)
@@ -0,0 +1,66 @@
+"""
+test_checkpoint.py
+
+Testing checkpointed reverse mode on chain-structured graphs
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+from superjacob.checkpoint import CheckpointedReverseDiff
+
+
+x, h = Var('x'), Var('h')
+
+
+def _unrolled(steps):
+    f = x
+    for _ in range(steps):
+        f = f + h * sd.sin(f)
+    return make_expression(f, vars=[x, h])
+
+
+def test_checkpoint_matches_tape():
+    f = _unrolled(300)
+    expected = f.compile().deriv(0.3, 0.01)
+    for budget in (1, 2, 4, 16, 1000):
+        rev = sd.reverse(f, budget=budget)
+        assert isinstance(rev, CheckpointedReverseDiff)
+        assert np.allclose(rev(0.3, 0.01), expected)
+        assert rev.max_stored <= budget
+        assert np.isclose(rev(0.3, 0.01, var=h), expected[1])
+
+
+def test_checkpoint_recomputation_bounded():
+    f = _unrolled(1000)
+    rev = CheckpointedReverseDiff(f, budget=8)
+    assert len(rev.segments) > 1000
+    rev(0.5, 0.02)
+    # Binomial checkpointing: a few sweeps, far from the quadratic n^2 / 2
+    assert rev.advances < 6 * len(rev.segments)
+
+
+def test_checkpoint_batch_and_non_chain():
+    f = _unrolled(50)
+    xs = np.linspace(0, 1, 3)
+    assert np.allclose(CheckpointedReverseDiff(f, budget=3)(xs, 0.1), f.compile().deriv(xs, 0.1))
+
+    y = Var('y')
+    g = make_expression(sd.exp(x * y) + x * sd.sin(y), vars=[x, y])
+    rev = CheckpointedReverseDiff(g, budget=2)
+    assert np.allclose(rev(1., 2.), g.deriv(1., 2.))
+    with pytest.raises(AssertionError):
+        CheckpointedReverseDiff(g, budget=0)
+
+
+def test_checkpoint_params():
+    a = Param('a')
+    f = x
+    for _ in range(20):
+        f = f + h * sd.sin(a * f)
+    f = make_expression(f, vars=[x, h])
+    rev = CheckpointedReverseDiff(f, budget=2)
+    xs = np.linspace(0, 1, 4)
+    assert np.allclose(rev(xs, 0.1, params={a: 2.}), f.compile().deriv(xs, 0.1, params={a: 2.}))
+    assert a.value is None
@@ -0,0 +1,69 @@
+"""
+test_dual.py
+
+Testing Dual numbers and graph-free forward mode
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import Dual
+
+
+def test_dual_arithmetic():
+    x = Dual(2., 1.)
+    y = 3 * x ** 2 - 1 / x + sd.sqrt(x)
+    assert np.isclose(y.value, 12 - 0.5 + np.sqrt(2))
+    assert np.isclose(y.tangent, 12 + 0.25 + 0.5 / np.sqrt(2))
+    assert isinstance(-x, Dual) and (-x).tangent == -1.
+    assert x > 1 and not x < 1
+    with pytest.raises(AttributeError):
+        x.other = 1
+
+
+def test_grad_matches_expression():
+    x, y = sd.Var('x'), sd.Var('y')
+
+    def fn(a, b):
+        return sd.sin(a) * sd.exp(b) + sd.log(a, 2) + a ** b - sd.tanh(a / b) + sd.logistic(b, k=2)
+
+    f = sd.make_expression(fn(x, y), vars=[x, y])
+    for point in [(1.5, 0.7), (0.3, 2.)]:
+        assert np.allclose(sd.grad(fn)(*point), f.deriv(*point))
+
+
+def test_grad_single_variable():
+    df = sd.grad(lambda a: sd.cos(a) * a)
+    assert np.isclose(df(1.), -np.sin(1.) + np.cos(1.))
+    assert df(np.ones(4)).shape == (4,)
+    # Outputs that do not depend on the input have a zero derivative
+    assert sd.grad(lambda a: 3.)(1.) == 0
+
+
+def test_grad_batch():
+    xs = np.linspace(0.5, 2, 5)
+    g = sd.grad(lambda a, b: a * b + sd.sin(a))(xs, 2.)
+    assert g.shape == (5, 2)
+    assert np.allclose(g[:, 0], 2 + np.cos(xs))
+    assert np.allclose(g[:, 1], xs)
+
+
+def test_grad_many_inputs():
+    # More inputs than np.broadcast accepts (32 on NumPy 1.16, 64 later)
+    n = 70
+    g = sd.grad(lambda *xs: sum(x * x for x in xs))(*np.arange(n, dtype=float))
+    assert g.shape == (n,) and np.allclose(g, 2 * np.arange(n))
+    g = sd.grad(lambda *xs: sum(xs))(np.ones(4), *np.ones(n - 1))
+    assert g.shape == (4, n) and np.allclose(g, 1)
+
+
+def test_grad_jacobian():
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression(x * y, x + sd.cos(y), vars=[x, y])
+    jac = sd.grad(lambda a, b: [a * b, a + sd.cos(b)])
+    assert np.allclose(jac(1., 2.), f.deriv(1., 2.))
+    assert jac(np.ones(3), 2.).shape == (3, 2, 2)
+
+
+def test_dual_does_not_mix_with_vars():
+    with pytest.raises(TypeError):
+        Dual(1., 1.) + sd.Var('x')
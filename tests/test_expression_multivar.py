@@ -9,6 +9,7 @@ import superjacob as sd
 from superjacob import make_expression
 from superjacob.expression import *
 import math
+import gc
 
 
 def test_Exp_multivar():
@@ -120,4 +121,60 @@ def test_Exp_deriv_reverse():
     assert (f.deriv(2, 4, mode='reverse', var = y) ==  [-1,1]).all, 'Expression derivation error.'
     assert (f.deriv(2, 4, mode='reverse') ==  [1,1]).all, 'Expression derivation error.'
     
-#test_Exp_deriv_reverse()
\ No newline at end of file
+#test_Exp_deriv_reverse()
+
+def test_value_and_grad():
+    x, y = Var('x'), Var('y')
+    g = sd.sin(x) * y
+    f = make_expression(g * g + sd.exp(y) / x, vars=[x, y])
+    for mode in ('forward', 'reverse', 'auto'):
+        value, grad = f.value_and_grad(1.5, 0.5, mode=mode)
+        assert np.isclose(value, f.eval(1.5, 0.5))
+        assert np.allclose(grad, f.deriv(1.5, 0.5))
+    xs, ys = np.linspace(1, 2, 4), np.linspace(-1, 1, 4)
+    value, grad = f.value_and_grad(xs, ys, mode='reverse')
+    assert np.allclose(value, f.eval(xs, ys))
+    assert np.allclose(grad, f.deriv(xs, ys))
+    value, grad = f.compile().value_and_deriv(xs, ys)
+    assert np.allclose(value, f.eval(xs, ys))
+    assert np.allclose(grad, f.deriv(xs, ys))
+
+
+def test_value_and_jacobian():
+    x, y = Var('x'), Var('y')
+    f = make_expression(x * y, sd.sin(x) - y, y, vars=[x, y])
+    for mode in ('forward', 'reverse'):
+        values, J = f.value_and_jacobian(2., 3., mode=mode)
+        assert np.allclose(values, f.eval(2., 3.))
+        assert np.allclose(J, [[3, 2], [np.cos(2), -1], [0, 1]])
+
+
+def test_dependency_bitsets():
+    x, y, z = Var('x'), Var('y'), Var('z')
+    g = sd.sin(x) * sd.exp(x)
+    f = make_expression(g + y * z, vars=[x, y, z])
+    assert g.depends_on(x) and not g.depends_on(y)
+    assert f.deps == x.deps | y.deps | z.deps
+    assert (3 * y).deps == y.deps
+    # Subtrees that cannot contribute are evaluated but not differentiated
+    for mode in ('forward', 'reverse'):
+        with sd.Profiler() as prof:
+            assert f.deriv(1., 2., 3., var=y, mode=mode) == 3.
+        assert not any('Sin' in key or 'Exp' in key for key in prof.report.by_operation
+                       if not key.startswith('eval'))
+    h = make_expression(x * y, sd.cos(z), vars=[x, y, z])
+    assert np.allclose(h.deriv(1., 2., 3., var=z), [[0], [-np.sin(3.)]])
+    assert h.compile().masks[h.compile().outputs[1]] == 0b100
+
+
+def test_dependency_bits_are_reused():
+    live = [Var(f'v{i}') for i in range(10)]
+    for _ in range(10000):
+        Var('tmp')
+    gc.collect()
+    # Bits of collected Vars are reused, so bitsets stay as wide as the number of live Vars
+    x = Var('x')
+    assert x.deps.bit_length() <= 1000
+    assert all(not x.depends_on(v) for v in live)
+    f = make_expression(x * live[0], vars=[x, live[0]])
+    assert f.deps == x.deps | live[0].deps and np.isclose(f.deriv(2., 3., var=x), 3.)
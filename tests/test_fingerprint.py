@@ -0,0 +1,78 @@
+"""
+test_fingerprint.py
+
+Testing structural equality and the DAG-aware rendering of Expressions
+"""
+import time
+
+import pytest
+import numpy as np
+import superjacob as sd
+
+
+def test_structural_equality():
+    x, y = sd.Var('x'), sd.Var('y')
+    a = sd.sin(x) * y + 2
+    b = sd.sin(x) * y + 2
+    assert a is not b and a == b and a.fingerprint == b.fingerprint
+    assert a != sd.sin(x) * y + 3
+    assert a != sd.sin(y) * x + 2
+    assert sd.sin(x) != sd.cos(x)
+    # Vars are compared by identity, not by name
+    assert sd.sin(x) != sd.sin(sd.Var('x'))
+    assert x * np.arange(3.) == x * np.arange(3.)
+    assert x * np.arange(3.) != x * np.ones(3)
+    # Hashing is structural too: equal expressions are the same dict key
+    assert hash(a) == hash(b) and len({a, b}) == 1
+    assert {a: 1, b: 2} == {a: 2} and {a: 1}[b] == 1
+    assert len({a, sd.sin(x) * y + 3}) == 2
+    assert len({sd.make_expression(a, x + y, vars=[x, y]), sd.make_expression(b, x + y, vars=[x, y])}) == 1
+    # Equal outputs of a VectorExpression remain separate components
+    f = sd.make_expression(a, b, vars=[x, y])
+    assert len(f.expressions) == 2 and np.allclose(f.eval(1., 2.), [2 * np.sin(1.) + 2] * 2)
+    assert f.deriv(1., 2.).shape == (2, 2)
+    assert sd.make_expression(a, x + y, vars=[x, y]) == sd.make_expression(b, x + y, vars=[x, y])
+    assert sd.make_expression(a, x + y, vars=[x, y]) != sd.make_expression(a, x - y, vars=[x, y])
+
+
+def test_equality_is_exact_on_fingerprint_collisions():
+    x, y = sd.Var('x'), sd.Var('y')
+    assert hash(-1) == hash(-2)
+    assert (x * -1).fingerprint == (x * -2).fingerprint
+    assert x * -1 != x * -2
+    assert x * -1 == x * -1
+    assert x + (2 ** 61 - 1) != x + 0
+    assert x + 2 ** 70 == x + 2 ** 70 and x + 2 ** 70 != x + 2 ** 70 + 1
+    assert x + 1 != x + 1.
+    assert sd.make_expression(x * -1, y, vars=[x, y]) != sd.make_expression(x * -2, y, vars=[x, y])
+    # Shared subexpressions are compared once
+    a, b = x, x
+    for _ in range(200):
+        a, b = a * a, b * b
+    assert a == b
+
+
+def test_str_unchanged_for_small_expressions():
+    x, y = sd.Var('x'), sd.Var('y')
+    assert str(sd.sin(x) * y + 2) == 'sin(x) * y + 2'
+    assert str(sd.log(x, 2)) == 'log_2(x)'
+    assert str(sd.arcsin(x)) == 'arcsin(x)'
+    u = sd.sin(x)
+    assert (u * u).to_string(dag=True) == '_1 * _1 where _1 = sin(x)'
+
+
+def test_dag_aware_str():
+    x = sd.Var('x')
+    node = x
+    for _ in range(60):
+        node = node * node  # Expanded rendering has 2^60 occurrences of x
+    start = time.perf_counter()
+    text = str(node)
+    assert time.perf_counter() - start < 1
+    assert text.startswith('_59 * _59 where _1 = x * x; _2 = _1 * _1')
+    assert str(node) is text  # Cached
+    # Deep chains render without recursion
+    node = x
+    for _ in range(5000):
+        node = node + 1
+    assert str(node).count('+ 1') == 5000
@@ -0,0 +1,63 @@
+"""
+test_fusion.py
+
+Testing the fusion of elementwise chains in a Tape
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+from superjacob.fusion import FusedChain
+
+
+x, y = Var('x'), Var('y')
+
+
+def test_fused_chains():
+    f = make_expression(sd.exp(sd.sin(x) * 2) + sd.sqrt(1 - y**2) * sd.tanh(-x), vars=[x, y])
+    tape = f.compile()
+    fused = tape.fused()
+    assert fused is tape.fused()
+    chains = [op for _, op, _ in fused.instructions if isinstance(op, FusedChain)]
+    assert sorted(len(op.steps) for op in chains) == [2, 3, 3]
+    assert len(fused.instructions) < len(tape.instructions)
+    xs, ys = np.linspace(-1, 1, 9), np.linspace(-0.9, 0.9, 9)
+    assert np.allclose(fused.eval(xs, ys), tape.eval(xs, ys))
+    for mode in ('forward', 'reverse'):
+        assert np.allclose(fused.deriv(xs, ys, mode=mode), tape.deriv(xs, ys))
+    assert np.allclose(fused.deriv(0.3, 0.4), f.deriv(0.3, 0.4))
+
+
+def test_fusion_keeps_inputs_and_shared_nodes():
+    g = sd.exp(x)
+    f = make_expression(sd.sin(sd.cos(g)) * g, sd.logistic(2 * x + 1), vars=[x])
+    tape = f.compile()
+    fused = tape.fused()
+    xs = np.linspace(-2, 2, 5)
+    before = xs.copy()
+    assert np.allclose(fused.eval(xs), tape.eval(xs))
+    assert np.allclose(fused.deriv(xs), tape.deriv(xs))
+    assert np.array_equal(xs, before)
+    # exp(x) has two consumers, so it ends a chain
+    assert any(isinstance(op, FusedChain) and [s[0] for s in op.steps] == [sd.ops.Cos, sd.ops.Sin]
+               for _, op, _ in fused.instructions)
+
+
+def test_fused_partial_computed_once():
+    s = sd.exp(sd.sin(x) * 2)
+    f = make_expression(s * y, s + y, vars=[x, y])
+    fused = f.compile().fused()
+    chain = next(op for _, op, _ in fused.instructions if isinstance(op, FusedChain))
+    sweeps = []
+    sweep = chain.value_and_partial
+    chain.value_and_partial = lambda *args, **kwargs: sweeps.append(1) or sweep(*args, **kwargs)
+    xs, ys = np.linspace(-1, 1, 7), np.ones(7)
+    for mode in ('forward', 'reverse'):
+        sweeps.clear()
+        # The partial from the forward sweep serves both outputs
+        assert np.allclose(fused.deriv(xs, ys, mode=mode), f.compile().deriv(xs, ys))
+        assert len(sweeps) == 1
+    value, partial = sweep(0.5)
+    assert chain.reverse(0.5, value=value) is partial
+    assert np.isclose(chain.deriv(0.5, 2., value=value), 2 * partial)
@@ -0,0 +1,78 @@
+"""
+test_incremental.py
+
+Testing incremental re-evaluation when only some inputs change
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+from superjacob.incremental import IncrementalEvaluator
+
+
+x, y, z = Var('x'), Var('y'), Var('z')
+
+
+def test_incremental_matches_tape():
+    f = make_expression(sd.sin(x) * sd.exp(y) + x * z**2 + sd.cos(z), vars=[x, y, z])
+    inc = IncrementalEvaluator(f)
+    for point in [(1., 2., 3.), (1., 2.5, 3.), (0.5, 2.5, 3.), (0.5, 2.5, -1.), (0.5, 2.5, -1.)]:
+        value, grad = inc(*point)
+        assert np.isclose(value, f.eval(*point))
+        assert np.allclose(grad, f.deriv(*point))
+
+
+def test_incremental_recomputes_downstream_only():
+    f = make_expression(sd.sin(x) * sd.exp(y) + sd.cos(z), vars=[x, y, z])
+    inc = IncrementalEvaluator(f)
+    inc(1., 2., 3.)
+    assert inc.recomputed == len(inc.tape.instructions)
+    inc(1., 2., 3.5)
+    # cos(z) and the final sum
+    assert inc.recomputed == 2
+    inc(1., 2., 3.5)
+    assert inc.recomputed == 0
+
+
+def test_incremental_vector_batch():
+    f = make_expression(x * y, sd.sin(x) + z, vars=[x, y, z])
+    inc = IncrementalEvaluator(f)
+    xs, ys, zs = np.linspace(0, 1, 5), np.linspace(1, 2, 5), np.zeros(5)
+    inc(xs, ys, zs)
+    zs[:] = 1  # Modified in place
+    values, J = inc(xs, ys, zs)
+    assert inc.recomputed == 1
+    assert np.allclose(values, f.compile().eval(xs, ys, zs))
+    assert np.allclose(J, f.deriv(xs, ys, zs))
+
+
+def test_incremental_params():
+    scale = Param('scale', 2.)
+    f = make_expression(scale * sd.sin(x) + sd.exp(y), vars=[x, y])
+    inc = IncrementalEvaluator(f)
+    inc(1., 2.)
+    scale.value = 3.
+    value, grad = inc(1., 2.)
+    # scale * sin(x) and the sum
+    assert inc.recomputed == 2
+    assert np.isclose(value, 3 * np.sin(1.) + np.exp(2.))
+    assert np.allclose(grad, [3 * np.cos(1.), np.exp(2.)])
+
+
+def test_incremental_params_argument():
+    scale = Param('scale')
+    f = make_expression(scale * sd.sin(x) + sd.exp(y), vars=[x, y])
+    inc = IncrementalEvaluator(f)
+    inc(1., 2., params={scale: 2.})
+    value, grad = inc(1., 2., params={scale: 3.})
+    assert inc.recomputed == 2
+    assert np.isclose(value, 3 * np.sin(1.) + np.exp(2.))
+    assert np.allclose(grad, [3 * np.cos(1.), np.exp(2.)])
+    inc(1., 2., params={scale: 3.})
+    assert inc.recomputed == 0
+    assert scale.value is None
+    # Batched Params set the batch shape of the results
+    value, grad = inc(1., 2., params={scale: np.arange(4.)})
+    assert value.shape == (4,) and grad.shape == (4, 2)
+    assert np.allclose(grad[:, 0], np.arange(4.) * np.cos(1.))
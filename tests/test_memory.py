@@ -0,0 +1,60 @@
+"""
+test_memory.py
+
+Testing the memory planner for batched evaluation
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+
+
+x, y = Var('x'), Var('y')
+
+
+def _chain(steps):
+    f = x
+    for _ in range(steps):
+        f = sd.sin(f) * y + sd.exp(-f)
+    return make_expression(f, vars=[x, y])
+
+
+def test_plan_matches_tape():
+    f = _chain(20)
+    tape = f.compile()
+    xs, ys = np.linspace(0, 1, 1000), np.linspace(0.5, 1, 1000)
+    plan = tape.memory_plan(xs, ys)
+    assert np.allclose(plan.eval(xs, ys), tape.eval(xs, ys))
+    assert np.allclose(plan.eval(xs + 1, ys), tape.eval(xs + 1, ys))
+    # Inputs are never overwritten
+    assert np.allclose(xs, np.linspace(0, 1, 1000))
+    assert tape.memory_plan(xs + 1, ys) is plan
+    assert tape.memory_plan(xs[:10], ys[:10]) is not plan
+
+
+def test_plan_reduces_peak_memory():
+    f = _chain(50)
+    xs, ys = np.linspace(0, 1, 10000), np.linspace(0.5, 1, 10000)
+    plan = f.compile().memory_plan(xs, ys)
+    # A chain needs a handful of live temporaries, whatever its length
+    assert len(plan.buffers) <= 4
+    assert plan.peak_bytes == plan.buffer_bytes
+    assert plan.naive_bytes >= 50 * plan.peak_bytes / 4
+    assert plan.n_in_place > 0
+
+
+def test_plan_vector_params_and_fallback():
+    scale = Param('scale')
+    f = make_expression(x * scale + y, sd.logistic(x) * x**3, vars=[x, y])
+    tape = f.compile()
+    xs, ys = np.linspace(-1, 1, 7), np.ones(7)
+    params = {scale: np.arange(7.)}
+    plan = tape.memory_plan(xs, ys, params=params)
+    assert np.allclose(plan.eval(xs, ys, params=params), tape.eval(xs, ys, params=params))
+    # Integer inputs are planned separately and keep the results of `eval`
+    xi = np.arange(-3, 4)
+    assert np.allclose(tape.memory_plan(xi, ys, params=params).eval(xi, ys, params=params),
+                       tape.eval(xi, ys, params=params))
+    with pytest.raises(AssertionError):
+        plan.eval(xs[:3], ys[:3], params=params)
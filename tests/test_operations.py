@@ -141,6 +141,31 @@ def test_pow_stress():
     assert f_pow_edge.deriv(np.pi) - (-2*np.cos(np.pi)*np.sin(np.pi)) < 1e-6
     assert f_pow_edge.deriv(np.pi, mode='reverse') - (-2*np.cos(np.pi)*np.sin(np.pi)) < 1e-3
 
+def test_pow_specialized():
+    assert make_expression(x**2, vars=[x]).operation is Square
+    assert make_expression(x**-1, vars=[x]).operation is Reciprocal
+    assert make_expression(x**3, vars=[x]).operation is IntPow
+    assert make_expression(x**3.0, vars=[x]).operation is IntPow
+    assert make_expression(x**0.5, vars=[x]).operation is ConstPow
+    assert make_expression(x**y, vars=[x, y]).operation is Pow
+    assert make_expression(2**x, vars=[x]).operation is Pow
+    assert str(x**2) == 'x^2' and str(x**-1) == 'x^-1' and str(x**3) == 'x^3'
+
+    for f, df in [(x**2, lambda v: 2*v), (x**-1, lambda v: -1/v**2), (x**3, lambda v: 3*v**2),
+                  (x**-2, lambda v: -2/v**3), (x**0, lambda v: 0*v), (x**0.5, lambda v: 0.5/np.sqrt(v))]:
+        f = make_expression(f, vars=[x])
+        for v in (0.5, 2., 3):
+            assert np.isclose(f.deriv(v), df(v))
+            assert np.isclose(f.deriv(v, mode='reverse'), df(v))
+
+    # Negative bases are handled without complex arithmetic
+    f = make_expression(x**3 + x**2, vars=[x])
+    assert f.eval(-2) == -4
+    assert f.deriv(-2) == 8
+    xs = np.array([-2, -1, 1, 2])
+    assert np.allclose(f.compile().deriv(xs)[:, 0], 3*xs**2 + 2*xs)
+    assert np.allclose(make_expression(x**-2, vars=[x]).compile().eval(xs), 1 / xs**2)
+
 def test_log_expr():
     # Natural log -- default
     f_nlog = make_expression(log(x), vars=[x])
@@ -207,25 +232,55 @@ def test_special_trig():
     assert ft1.deriv(np.sqrt(2)/2) == (1/np.sqrt(1-(np.sqrt(2)/2)**2)) + (-1/np.sqrt(1-(np.sqrt(2)/2)**2)) + (1/(1+(np.sqrt(2)/2)**2))
 
     ft2 = make_expression(sinh(x) + cosh(x) + tanh(x), vars=[x])
-    assert ft2.eval(2) == ((np.exp(2)-np.exp(-2))/2) + ((np.exp(2)+np.exp(-2))/2) +((np.exp(2)-np.exp(-2))/(np.exp(2)+np.exp(-2)))
+    assert np.isclose(ft2.eval(2), ((np.exp(2)-np.exp(-2))/2) + ((np.exp(2)+np.exp(-2))/2) +((np.exp(2)-np.exp(-2))/(np.exp(2)+np.exp(-2))))
     ftsinh = make_expression(sinh(x), vars=[x])
-    assert ftsinh.deriv(2) == ((np.exp(2)+np.exp(-2))/2)
+    assert np.isclose(ftsinh.deriv(2), ((np.exp(2)+np.exp(-2))/2))
     fttanh = make_expression(tanh(x), vars=[x])
     tanhderiv = ((((np.exp(2)+np.exp(-2))/2))**2 - (((np.exp(2)-np.exp(-2))/2))**2)/((((np.exp(2)+np.exp(-2))/2))**2)
-    assert fttanh.deriv(2) == tanhderiv
-    assert ft2.deriv(2) == ((np.exp(2)-np.exp(-2))/2) + ((np.exp(2)+np.exp(-2))/2) + tanhderiv
+    assert np.isclose(fttanh.deriv(2), tanhderiv)
+    assert np.isclose(ft2.deriv(2), ((np.exp(2)-np.exp(-2))/2) + ((np.exp(2)+np.exp(-2))/2) + tanhderiv)
     assert float(ft2.deriv(2, mode='reverse')) - (((np.exp(2)-np.exp(-2))/2) + ((np.exp(2)+np.exp(-2))/2) + tanhderiv) < 1e-1
 
     ft3 = make_expression(csc(x) + sec(x) + cot(x), vars=[x])
     assert ft3.eval(np.pi/3) == (1/np.sin(np.pi/3)) + (1/np.cos(np.pi/3)) +(1/np.tan(np.pi/3))
-    assert ft3.deriv(np.pi/3) == (-(1/np.sin(np.pi/3))*(1/np.tan(np.pi/3))) + (1/np.cos(np.pi/3))*(np.tan(np.pi/3)) + (-(1/np.sin(np.pi/3))**2)
-    assert ft3.deriv(np.pi/3, mode='reverse') == (-(1/np.sin(np.pi/3))*(1/np.tan(np.pi/3))) + (1/np.cos(np.pi/3))*(np.tan(np.pi/3)) + (-(1/np.sin(np.pi/3))**2)
+    assert np.isclose(ft3.deriv(np.pi/3), (-(1/np.sin(np.pi/3))*(1/np.tan(np.pi/3))) + (1/np.cos(np.pi/3))*(np.tan(np.pi/3)) + (-(1/np.sin(np.pi/3))**2))
+    assert np.isclose(ft3.deriv(np.pi/3, mode='reverse'), (-(1/np.sin(np.pi/3))*(1/np.tan(np.pi/3))) + (1/np.cos(np.pi/3))*(np.tan(np.pi/3)) + (-(1/np.sin(np.pi/3))**2))
 
 def test_logistic():
     fl = make_expression(logistic(x), vars=[x])
     assert fl.eval(5) == 1/(1+np.exp(-(5)))
-    assert fl.deriv(5) == (-(1+np.exp(-5))**-2)*(-np.exp(-5))
-    assert fl.deriv(5, mode='reverse') == (-(1+np.exp(-5))**-2)*(-np.exp(-5))
+    assert np.isclose(fl.deriv(5), (-(1+np.exp(-5))**-2)*(-np.exp(-5)))
+    assert np.isclose(fl.deriv(5, mode='reverse'), (-(1+np.exp(-5))**-2)*(-np.exp(-5)))
+
+    # Native operations do not overflow for large inputs
+    with np.errstate(over='raise'):
+        assert fl.eval(-1000) == 0 and fl.eval(1000) == 1
+        assert fl.deriv(-1000) == 0
+        assert make_expression(tanh(x), vars=[x]).deriv(1000) == 0
+        assert make_expression(softplus(x), vars=[x]).eval(1000) == 1000
+
+    fl2 = make_expression(logistic(x, k=2, x0=1, L=3), vars=[x])
+    assert np.isclose(fl2.eval(0.5), 3 / (1 + np.exp(-2 * (0.5 - 1))))
+    assert np.isclose(fl2.deriv(0.5), 6 * np.exp(1) / (1 + np.exp(1))**2)
+    assert str(logistic(x)) == 'logistic(x)'
+
+def test_softplus_logsumexp():
+    fs = make_expression(softplus(x), vars=[x])
+    assert np.isclose(fs.eval(0.3), np.log(1 + np.exp(0.3)))
+    assert np.isclose(fs.deriv(0.3), 1 / (1 + np.exp(-0.3)))
+
+    fls = make_expression(logsumexp(x, y, 2 * x), vars=[x, y])
+    assert np.isclose(fls.eval(0.5, 1.5), np.log(np.exp(0.5) + np.exp(1.5) + np.exp(1)))
+    total = np.exp(0.5) + np.exp(1.5) + np.exp(1)
+    grad = [(np.exp(0.5) + 2 * np.exp(1)) / total, np.exp(1.5) / total]
+    assert np.allclose(fls.deriv(0.5, 1.5), grad)
+    assert np.allclose(fls.deriv(0.5, 1.5, mode='reverse'), grad)
+    with np.errstate(over='raise'):
+        assert np.isclose(make_expression(logsumexp(x, y), vars=[x, y]).eval(1000, 1000), 1000 + np.log(2))
+
+def test_native_hyperbolic_nodes():
+    assert make_expression(tanh(x), vars=[x]).stats().dag_size == 2
+    assert LogSumExp.reverse(0., 0.) == (0.5, 0.5)
 
 def _compare_2d_arrs(A, B):
     for a, b in zip(A, B):
@@ -268,3 +323,18 @@ def test_types():
         div(string_a, random_list)
     
 
+
+def test_ops_reuse_output():
+    # Passing the node's own value must not change any derivative rule
+    unary = [Sqrt, Neg, Exp, NLog, Sin, Cos, Tan, Csc, Sec, Cot, ArcSin, ArcCos, ArcTan,
+             Sinh, Cosh, Tanh, Logistic, Softplus, Square, Reciprocal]
+    for op in unary:
+        v = 0.3
+        value = op.eval(v)
+        assert np.isclose(op.deriv(v, 1.5, value=value), op.deriv(v, 1.5)), op
+        assert np.isclose(op.reverse(v, value=value), op.reverse(v)), op
+    binary = [Add, Sub, Mul, Div, Pow, Log, LogSumExp, IntPow, ConstPow]
+    for op, (a, b) in zip(binary, [(2., 3.)] * 7 + [(2., 3), (2., 0.5)]):
+        value = op.eval(a, b)
+        assert np.isclose(op.deriv(a, 0.5, b, 0.25, value=value), op.deriv(a, 0.5, b, 0.25)), op
+        assert np.allclose(op.reverse(a, b, value=value), op.reverse(a, b)), op
@@ -0,0 +1,70 @@
+"""
+test_optimize.py
+
+Testing minimize and its methods
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+
+
+def _rosenbrock():
+    x, y = sd.Var('x'), sd.Var('y')
+    return sd.make_expression((1 - x) ** 2 + 100 * (y - x ** 2) ** 2, vars=[x, y])
+
+
+@pytest.mark.parametrize('method', ['lbfgs', 'trust-ncg'])
+def test_rosenbrock(method):
+    res = sd.minimize(_rosenbrock(), (-1.2, 1.), method=method, gtol=1e-8)
+    assert res.success, res
+    assert np.allclose(res.x, [1., 1.], atol=1e-6)
+    assert res.fun < 1e-12
+    assert len(res.times) == res.n_iter and res.time_per_iter > 0
+    assert res.n_evals >= res.n_iter
+    assert (res.n_hvp > 0) == (method == 'trust-ncg')
+
+
+@pytest.mark.parametrize('method, options', [('gd', {'lr': 0.1}),
+                                             ('gd', {'lr': 0.05, 'momentum': 0.9, 'nesterov': True}),
+                                             ('adam', {'lr': 0.1})])
+def test_first_order_methods(method, options):
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression((x - 3) ** 2 + 2 * (y + 1) ** 2 + x * y / 4, vars=[x, y])
+    res = sd.optimize.minimize(f, (0., 0.), method=method, gtol=1e-5, maxiter=5000, **options)
+    assert res.success, res
+    # Stationary point of the quadratic
+    assert np.allclose(res.x, np.linalg.solve([[2, 0.25], [0.25, 4]], [6, -4]), atol=1e-4)
+
+
+@pytest.mark.parametrize('method', ['lbfgs', 'trust-ncg', 'adam'])
+def test_least_squares_with_params(method):
+    w, b = sd.Var('w'), sd.Var('b')
+    X, Y = sd.Param('X'), sd.Param('Y')
+    data_x = np.linspace(0, 1, 50)
+    data = {X: data_x, Y: 2 * data_x - 0.5}
+    loss = sd.make_expression((w * X + b - Y) ** 2, vars=[w, b])
+    options = {'lr': 0.05} if method == 'adam' else {}
+    res = sd.minimize(loss, (0., 0.), method=method, params=data, reduction='mean', maxiter=5000, **options)
+    assert res.success, res
+    assert np.allclose(res.x, [2., -0.5], atol=1e-4)
+
+
+def test_callback_and_maxiter():
+    values = []
+    res = sd.minimize(_rosenbrock(), (-1.2, 1.), callback=lambda x, f, g: values.append(f), maxiter=5)
+    assert not res.success and res.n_iter == len(values) == 5
+    assert values[-1] == res.fun < 24.2
+
+
+def test_trust_region_shared_adjoints():
+    # x and y share one adjoint node, so the Hessian-vector products must still have one entry per variable
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression((x + y - 1) ** 2 + (x - y) ** 2, vars=[x, y])
+    assert np.allclose(f.hvp((0., 0.), (1., 0.)), [4., 0.])
+    res = sd.minimize(f, (3., -2.), method='trust-ncg')
+    assert res.success and np.allclose(res.x, [0.5, 0.5], atol=1e-6)
+
+
+def test_invalid_method():
+    with pytest.raises(AssertionError):
+        sd.minimize(_rosenbrock(), (0., 0.), method='newton')
@@ -0,0 +1,101 @@
+"""
+test_params.py
+
+Testing Params (placeholders bound at call time) and array constants
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+
+
+w, b = Var('w'), Var('b')
+
+
+def test_param_not_a_var():
+    data = Param('data')
+    f = make_expression(w * data + b, vars=[w, b])
+    assert f.vars == [w, b]
+    assert f.params == [data]
+    assert data.deps == 0
+    with pytest.raises(AssertionError):
+        f.eval(1., 2.)
+    assert f.eval(2., 1., params={data: 3.}) == 7.
+    # The binding only lasts for the call
+    assert data.value is None
+    with pytest.raises(AssertionError):
+        f.deriv(2., 1.)
+    assert f.deriv(2., 1., params={data: 5.}, mode='reverse').tolist() == [5., 1.]
+    # `value` is the default when a call binds nothing
+    data.value = 4.
+    assert f.eval(2., 1.) == 9. and f.eval(2., 1., params={data: 3.}) == 7.
+
+
+def test_param_arrays_reuse_tape():
+    X, Y = Param('X'), Param('Y')
+    residual = make_expression((w * X + b - Y)**2, vars=[w, b])
+    tape = residual.compile()
+    rng = np.random.RandomState(0)
+    for n in (5, 20):
+        xs = rng.rand(n)
+        ys = 3 * xs - 1
+        params = {X: xs, Y: ys}
+        assert np.allclose(tape.eval(1., 0., params=params), (xs - ys)**2)
+        grads = tape.deriv(1., 0., params=params)
+        assert grads.shape == (n, 2)
+        assert np.allclose(grads, np.stack([2 * (xs - ys) * xs, 2 * (xs - ys)], axis=-1))
+        assert np.allclose(residual.deriv(1., 0., params=params), grads)
+        assert np.allclose(residual.deriv(1., 0., params=params, mode='reverse'), grads)
+        # Weighted per-point gradients
+        assert np.allclose(tape.vjp([1., 0.], 2 * np.ones(n), params=params), 2 * grads)
+        # At the optimum the residuals and their gradients vanish
+        assert np.allclose(tape.deriv(3., -1., params=params), 0)
+    assert tape is residual.compile()
+
+
+def test_array_constants():
+    x = Var('x')
+    coefs = np.array([1., 2., 3.])
+    f = make_expression(sd.sin(x * coefs) + coefs, vars=[x])
+    assert np.allclose(f.eval(0.5), np.sin(0.5 * coefs) + coefs)
+    assert np.allclose(f.deriv(0.5), coefs * np.cos(0.5 * coefs))
+    assert np.allclose(f.compile().deriv(0.5), np.reshape(coefs * np.cos(0.5 * coefs), (3, 1)))
+
+
+def test_params_in_jvp_and_vjp():
+    data = Param('data')
+    f = make_expression(w * data + b, vars=[w, b])
+    assert np.isclose(f.jvp((2., 1.), (1., 1.), params={data: 3.}), 4.)
+    assert np.allclose(f.vjp((2., 1.), 2., params={data: 5.}), [10., 2.])
+    g = make_expression(w * data, b - data, vars=[w, b])
+    assert np.allclose(g.jvp((2., 1.), (1., 0.), params={data: 3.}), [3., 0.])
+    assert np.allclose(g.vjp((2., 1.), (1., 1.), params={data: 4.}), [4., 1.])
+
+
+def test_bindings_do_not_leak():
+    X = Param('X')
+    f = make_expression(w * X + b, vars=[w, b])
+    data = {X: np.arange(6.)}
+    assert np.allclose(sd.stream_reduce(f, (1., 0.), data, reduction='sum', chunk_size=4, deriv=False), 15.)
+    assert X.value is None
+    with sd.expression.bind({X: 2.}):
+        assert f.eval(1., 1.) == 3.
+        # Nested bindings take precedence
+        assert f.eval(1., 1., params={X: 5.}) == 6.
+        assert f.eval(1., 1.) == 3.
+    assert X.value is None
+
+
+def test_concurrent_bindings():
+    from concurrent.futures import ThreadPoolExecutor
+    X = Param('X')
+    f = make_expression(w * X + b, vars=[w, b])
+    tape = f.compile()
+
+    def run(k):
+        xs = np.full(50, float(k))
+        return all(np.allclose(tape.eval(1., 0., params={X: xs}), k) for _ in range(200))
+
+    with ThreadPoolExecutor(4) as pool:
+        assert all(pool.map(run, range(8)))
@@ -0,0 +1,74 @@
+"""
+test_profiler.py
+
+Testing the opt-in Profiler
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression, Profiler
+from superjacob.expression import *
+from superjacob.reverse import ReverseDiff
+
+
+x, y = Var('x'), Var('y')
+
+
+def test_profiler_counts():
+    f = make_expression(sd.sin(x) * y + sd.exp(x), vars=[x, y])
+    with Profiler() as prof:
+        f.eval(1, 2)
+    report = prof.report
+    assert report.by_operation['eval:Sin'].calls == 1
+    assert report.by_operation['eval:Add'].calls == 1
+    # Scalar results allocate no array
+    assert report.by_operation['eval:Add'].allocations == 0
+    assert len(report.by_node) == 4
+    add = report.by_operation['eval:Add']
+    assert add.time >= add.self_time >= 0
+
+
+def test_profiler_deriv_and_reverse():
+    f = make_expression(sd.sin(x) * y, vars=[x, y])
+    with Profiler() as prof:
+        f.deriv(1, 2)
+        f.deriv(1, 2, mode='reverse')
+    ops = prof.report.by_operation
+    # Forward mode computes the whole gradient in a single sweep
+    assert ops['deriv:Mul'].calls == 1
+    assert ops['reverse.forward:Mul'].calls == 1
+    assert ops['reverse.backward:Sin'].calls >= 1
+    assert 'reverse.backward:Mul' in str(prof.report)
+
+
+def test_profiler_folded():
+    f = make_expression(sd.exp(sd.sin(x)), vars=[x])
+    with Profiler() as prof:
+        f.eval(0.5)
+    lines = prof.report.to_folded().splitlines()
+    stacks = [line.rsplit(' ', 1)[0] for line in lines]
+    assert stacks == ['eval;Exp', 'eval;Exp;Sin']
+    assert prof.report.by_operation['eval:Sin'].bytes == 0
+
+
+def test_profiler_allocations():
+    f = make_expression(sd.sin(x) * y, vars=[x, y])
+    xs = np.linspace(0, 1, 100)
+    with Profiler() as prof:
+        f.eval(xs, 2.)
+        f.eval(xs, 3.)
+    ops = prof.report.by_operation
+    assert ops['eval:Sin'].allocations == ops['eval:Mul'].allocations == 2
+    assert ops['eval:Mul'].bytes == 2 * xs.nbytes
+
+
+def test_profiler_removed_on_exit():
+    original = Expression.__dict__['_unary_eval']
+    original_forward = ReverseDiff.forward
+    with Profiler():
+        assert Expression.__dict__['_unary_eval'] is not original
+        assert ReverseDiff.forward is not original_forward
+        with pytest.raises(AssertionError):
+            Profiler().__enter__()
+    assert Expression.__dict__['_unary_eval'] is original
+    assert ReverseDiff.forward is original_forward
@@ -0,0 +1,81 @@
+"""
+test_service.py
+
+Testing the asyncio GradientService with a local client harness
+"""
+import asyncio
+
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression, GradientService
+from superjacob.expression import *
+
+
+x, y = Var('x'), Var('y')
+
+
+def _run(coroutine):
+    loop = asyncio.new_event_loop()
+    try:
+        return loop.run_until_complete(coroutine)
+    finally:
+        loop.close()
+
+
+def _run_clients(service, kind, points):
+    async def harness():
+        async with service:
+            return await asyncio.gather(*[getattr(service, kind)(*p) for p in points])
+    return _run(harness())
+
+
+def test_service_eval_and_deriv():
+    f = make_expression(sd.exp(x) * sd.sin(y) + sd.exp(y * sd.log(x)), vars=[x, y])
+    points = [(0.1 * i + 0.5, 0.2 * i) for i in range(20)]
+    service = GradientService(f, max_batch_size=8, max_latency=0.01)
+    values = _run_clients(service, 'eval', points)
+    for p, v in zip(points, values):
+        assert np.isclose(v, f.eval(*p))
+    assert max(service.batch_sizes) == 8
+    assert sum(service.batch_sizes) == len(points)
+    assert service.n_requests == len(points) and service.n_batches == len(service.batch_sizes)
+
+    grads = _run_clients(GradientService(f), 'deriv', points)
+    for p, g in zip(points, grads):
+        assert np.allclose(g, f.deriv(*p))
+
+
+def test_service_vector_expression():
+    f = make_expression(x + y, x * y, vars=[x, y])
+    points = [(1, 2), (3, 4), (5, 6)]
+    service = GradientService(f, mode='forward')
+    jacobians = _run_clients(service, 'deriv', points)
+    for p, J in zip(points, jacobians):
+        assert np.allclose(J, f.deriv(*p))
+    assert list(service.batch_sizes) == [3]
+
+
+def test_service_mixed_requests():
+    f = make_expression(x * y, vars=[x, y])
+
+    async def harness():
+        async with GradientService(f, max_latency=0.01) as service:
+            return await asyncio.gather(service.eval(2, 3), service.deriv(2, 3), service.eval(4, 5))
+    value1, grad, value2 = _run(harness())
+    assert value1 == 6 and value2 == 20
+    assert np.allclose(grad, [3, 2])
+
+
+def test_service_errors():
+    f = make_expression(x * y, vars=[x, y])
+    with pytest.raises(AssertionError):
+        _run_clients(GradientService(f), 'eval', [(1,)])
+
+
+def test_service_batch_history_is_bounded():
+    f = make_expression(x * y, vars=[x, y])
+    service = GradientService(f, max_batch_size=1, history=5)
+    _run_clients(service, 'eval', [(i, i) for i in range(20)])
+    assert service.n_batches == service.n_requests == 20
+    assert list(service.batch_sizes) == [1] * 5
@@ -0,0 +1,54 @@
+"""
+test_specialize.py
+
+Testing partial evaluation with specialize
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+
+
+def test_specialize_folds_fixed_subgraphs():
+    a, b, x, y = sd.Var('a'), sd.Var('b'), sd.Var('x'), sd.Var('y')
+    f = sd.make_expression(sd.exp(sd.sin(a) * b) * x + y ** b - sd.cos(y), vars=[a, b, x, y])
+    g = f.specialize({a: 1., b: 2.})
+    assert g.vars == [x, y] and f.vars == [a, b, x, y]
+    for point in [(0.5, 1.5), (2., -1.)]:
+        assert np.isclose(g.eval(*point), f.eval(1., 2., *point))
+        assert np.allclose(g.deriv(*point), f.deriv(1., 2., *point)[2:])
+    assert g.stats().dag_size < f.stats().dag_size
+    assert 'Exp' not in g.stats().op_histogram and 'Sin' not in g.stats().op_histogram
+    # y^b with b fixed to 2 becomes a square
+    assert str(g).endswith('y^2 - cos(y)')
+
+
+def test_specialize_shares_free_subgraphs():
+    a, x = sd.Var('a'), sd.Var('x')
+    u = sd.sin(x) * sd.cos(x)
+    f = sd.make_expression(u * a + u, vars=[a, x])
+    g = f.specialize({a: 3.})
+    assert g.parent1.parent1 is u and g.parent2 is u
+    assert np.isclose(g.eval(0.3), 4 * np.sin(0.3) * np.cos(0.3))
+
+
+def test_specialize_constant_and_params():
+    a, x = sd.Var('a'), sd.Var('x')
+    scale = sd.Param('scale')
+    f = sd.make_expression(a * a * scale + x, vars=[a, x])
+    g = f.specialize({a: 2.})
+    assert np.isclose(g.eval(1., params={scale: 3.}), 13.)
+    assert np.isclose(g.eval(1., params={scale: 0.5}), 3.)
+    h = sd.make_expression(sd.exp(a) + 1, vars=[a]).specialize({a: 0.})
+    assert h.vars == [] and h.eval() == 2.
+
+
+def test_specialize_vector_and_batch():
+    a, x = sd.Var('a'), sd.Var('x')
+    f = sd.make_expression(a * x, sd.sqrt(a) + x, vars=[a, x])
+    g = f.specialize({a: 4.})
+    assert isinstance(g, sd.VectorExpression) and g.vars == [x]
+    xs = np.linspace(0, 1, 5)
+    assert np.allclose(g.compile().eval(xs), np.stack([4 * xs, 2 + xs], axis=-1))
+    # Arrays of fixed values give batches of specialized expressions
+    b = sd.make_expression(a * x + a, vars=[a, x]).specialize({a: np.arange(3.)})
+    assert np.allclose(b.compile().eval(2.), 3 * np.arange(3.))
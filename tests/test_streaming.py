@@ -0,0 +1,51 @@
+"""
+test_streaming.py
+
+Testing chunked reductions over datasets
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+
+
+w, b = Var('w'), Var('b')
+X, Y = Param('X'), Param('Y')
+
+
+def _dataset(n):
+    rng = np.random.RandomState(1)
+    xs = rng.rand(n)
+    return xs, 2 * xs + 0.5 + 0.1 * rng.randn(n)
+
+
+def test_stream_matches_full_batch(tmp_path):
+    xs, ys = _dataset(1001)
+    np.save(tmp_path / 'x.npy', xs)
+    np.save(tmp_path / 'y.npy', ys)
+    loss = make_expression((w * X + b - Y)**2, vars=[w, b])
+    full = loss.compile().deriv(1.5, 0.2, params={X: xs, Y: ys})
+    data = {X: np.load(tmp_path / 'x.npy', mmap_mode='r'), Y: np.load(tmp_path / 'y.npy', mmap_mode='r')}
+    for mode in ('forward', 'reverse'):
+        value, grad = sd.stream_reduce(loss, (1.5, 0.2), data, chunk_size=100, mode=mode)
+        assert np.isclose(value, np.mean((1.5 * xs + 0.2 - ys)**2))
+        assert np.allclose(grad, full.mean(axis=0))
+    value = sd.stream_reduce(loss, (1.5, 0.2), data, reduction='sum', chunk_size=64, deriv=False)
+    assert np.isclose(value, np.sum((1.5 * xs + 0.2 - ys)**2))
+
+
+def test_stream_iterator_and_vector():
+    xs, ys = _dataset(50)
+    chunks = ({X: xs[i:i + 7], Y: ys[i:i + 7]} for i in range(0, 50, 7))
+    f = make_expression(w * X - Y, b + 0 * X, vars=[w, b])
+    values, J = sd.stream_reduce(f, (2., 1.), chunks, reduction='sum')
+    assert np.allclose(values, [np.sum(2 * xs - ys), 50.])
+    assert np.allclose(J, [[np.sum(xs), 0], [0, 50]])
+
+
+def test_iter_chunks():
+    chunks = list(sd.iter_chunks({X: np.arange(10), Y: np.arange(10)}, 4))
+    assert [len(c[X]) for c in chunks] == [4, 4, 2]
+    with pytest.raises(AssertionError):
+        list(sd.iter_chunks({X: np.arange(10), Y: np.arange(9)}, 4))
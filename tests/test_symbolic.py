@@ -0,0 +1,78 @@
+"""
+test_symbolic.py
+
+Testing derivatives built as Expressions
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+
+
+def test_grad_expr_matches_deriv():
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression(sd.exp(x * y) + sd.sin(x) ** 2 - sd.log(y, 3) / x + sd.sqrt(x) * sd.tanh(y),
+                           vars=[x, y])
+    g = f.grad_expr()
+    assert isinstance(g, sd.VectorExpression)
+    for point in [(1., 2.), (0.5, 0.3)]:
+        assert np.allclose(g.eval(*point), f.deriv(*point))
+        assert np.allclose(f.grad_expr(y).eval(*point), f.deriv(*point, var=y))
+
+
+def test_grad_expr_all_operations():
+    x = sd.Var('x')
+    fns = [sd.cos, sd.tan, sd.csc, sd.sec, sd.cot, sd.sinh, sd.cosh, sd.arcsin, sd.arccos, sd.arctan,
+           sd.softplus, sd.logistic, lambda u: 2 ** u, lambda u: u ** 2.5, lambda u: u ** -3,
+           lambda u: 1 / u, lambda u: u ** u, lambda u: sd.logsumexp(u, 2 * u)]
+    for fn in fns:
+        f = sd.make_expression(fn(x), vars=[x])
+        assert np.isclose(f.grad_expr().eval(0.4), f.deriv(0.4))
+
+
+def test_higher_order_and_compiled():
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression(sd.exp(x * y) + sd.sin(x) ** 2, vars=[x, y])
+    dfdx = f.grad_expr(x)
+    # d2f/dx2 and d2f/dxdy, by differentiating the derivative again
+    assert np.allclose(dfdx.deriv(1., 2.), [4 * np.exp(2.) + 2 * np.cos(2.), 3 * np.exp(2.)])
+    assert np.isclose(dfdx.grad_expr(x).eval(1., 2.), 4 * np.exp(2.) + 2 * np.cos(2.))
+    xs = np.linspace(0, 1, 5)
+    assert np.allclose(dfdx.compile().eval(xs, 2.), 2 * np.exp(2 * xs) + np.sin(2 * xs))
+
+
+def test_grad_expr_simple_results():
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression(x * y + 3 * x, vars=[x, y])
+    dfdy = f.grad_expr(y)
+    assert isinstance(dfdy, sd.Expression) and dfdy.eval(2., 5.) == 2.
+    assert dfdy.vars == [x, y] and f.vars == [x, y]
+    e = sd.make_expression(sd.exp(x), vars=[x])
+    de = e.grad_expr()
+    assert de is not e and np.isclose(de.eval(1.), np.e)
+    assert e.grad_expr().grad_expr().eval(0.) == 1.
+    assert sd.make_expression(x + y, vars=[x, y]).grad_expr(x).eval(1., 2.) == 1
+
+
+def test_jacobian_expr():
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression(x * y, sd.cos(y) + x, vars=[x, y])
+    jac = f.jacobian_expr()
+    assert np.allclose(np.reshape(jac.eval(1., 2.), (2, 2)), f.deriv(1., 2.))
+    batch = jac.compile().eval(np.ones(4), 2.)
+    assert batch.shape == (4, 4)
+
+
+def test_shared_adjoints():
+    # x and y share the adjoint of x + y: each component still needs its own node
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression((x + y - 1) ** 2, vars=[x, y])
+    g = f.grad_expr()
+    assert len(g.expressions) == 2
+    assert np.allclose(g.eval(1., 2.), [4., 4.])
+    assert np.allclose(g.jacobian_expr().eval(0., 0.), [2., 2., 2., 2.])
+    v0, v1 = sd.Var('v0'), sd.Var('v1')
+    g = sd.make_expression(sd.sin(v0 + v1), vars=[v0, v1]).grad_expr()
+    assert np.allclose(g.eval(np.ones(3), 2.), np.cos(3.))
+    jac = sd.make_expression(x * y, (x + y) ** 2, vars=[x, y]).jacobian_expr()
+    assert len(jac.expressions) == 4
+    assert np.allclose(jac.eval(1., 2.), [2., 1., 6., 6.])
@@ -0,0 +1,106 @@
+"""
+test_tape.py
+
+Testing the compiled Tape against Expression evaluation and differentiation
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+
+
+x, y, z = Var('x'), Var('y'), Var('z')
+
+
+def test_tape_matches_expression():
+    f = make_expression(x**sd.sin(y) + x*y / sd.exp(z), vars=[x, y, z])
+    tape = f.compile()
+    assert tape.eval(2, 3, 0.5) == f.eval(2, 3, 0.5)
+    assert np.allclose(tape.deriv(2, 3, 0.5), f.deriv(2, 3, 0.5))
+    assert np.allclose(tape.deriv(2, 3, 0.5, mode='forward'), f.deriv(2, 3, 0.5))
+
+
+def test_tape_shared_nodes():
+    g = sd.sin(x) * y
+    f = make_expression(g + g * g, vars=[x, y])
+    tape = f.compile()
+    # x, y, sin(x), g, g * g, g + g * g
+    assert len(tape.instructions) == 4
+    assert np.allclose(tape.deriv(1, 2), f.deriv(1, 2))
+
+
+def test_tape_vector_expression():
+    f = make_expression(x + y, x * y, sd.exp(x), vars=[x, y])
+    tape = f.compile()
+    assert np.allclose(tape.eval(1, 2), f.eval(1, 2))
+    assert np.allclose(tape.deriv(1, 2), f.deriv(1, 2))
+    assert np.allclose(tape.deriv(1, 2, mode='forward'), f.deriv(1, 2))
+
+
+def test_tape_batch():
+    f = make_expression(x * x * y + sd.cos(y) / x, vars=[x, y])
+    tape = f.compile()
+    xs, ys = np.linspace(0.5, 2, 5), np.linspace(-1, 1, 5)
+    values = tape.eval(xs, ys)
+    grads = tape.deriv(xs, ys)
+    assert grads.shape == (5, 2)
+    for i in range(5):
+        assert np.isclose(values[i], f.eval(xs[i], ys[i]))
+        assert np.allclose(grads[i], f.deriv(xs[i], ys[i]))
+
+    # Constant gradients are broadcast to the batch
+    assert make_expression(2*x + y, vars=[x, y]).compile().deriv(xs, ys).shape == (5, 2)
+
+
+def test_tape_deep_graph():
+    f = x
+    for _ in range(5000):
+        f = 0.999 * f + 0.001 * sd.sin(f)
+    f = make_expression(f, vars=[x])
+    tape = f.compile()
+    assert np.isfinite(tape.eval(1.0))
+    assert np.isclose(tape.deriv(1.0)[0], tape.deriv(1.0, mode='forward')[0])
+
+
+def test_tape_compile_cached():
+    f = make_expression(x * y, vars=[x, y])
+    assert f.compile() is f.compile()
+    f.set_vars([y, x])
+    assert f.compile().vars == [y, x]
+    with pytest.raises(AssertionError):
+        make_expression(x * y, vars=[x]).compile()
+
+
+def test_jvp_vjp():
+    f = make_expression(x * sd.sin(y) + sd.exp(z) / y, vars=[x, y, z])
+    point, v = (1.5, 0.7, -0.2), (0.3, -1, 2)
+    grad = f.deriv(*point)
+    assert np.isclose(f.jvp(point, v), np.dot(grad, v))
+    assert np.allclose(f.vjp(point, 2.5), 2.5 * grad)
+
+    F = make_expression(x * y, y + z, sd.cos(x * z), vars=[x, y, z])
+    J = F.deriv(*point)
+    u = (1, -2, 0.5)
+    assert np.allclose(F.jvp(point, v), J @ np.array(v))
+    assert np.allclose(F.vjp(point, u), np.array(u) @ J)
+
+
+def test_jvp_vjp_batch():
+    F = make_expression(x * y, sd.sin(x) + y, vars=[x, y])
+    xs, ys = np.linspace(0, 1, 4), np.linspace(1, 2, 4)
+    jv = F.jvp((xs, ys), (1, 0))
+    uj = F.vjp((xs, ys), (1, 1))
+    assert jv.shape == (4, 2) and uj.shape == (4, 2)
+    for i in range(4):
+        J = F.deriv(xs[i], ys[i])
+        assert np.allclose(jv[i], J[:, 0])
+        assert np.allclose(uj[i], J.sum(axis=0))
+
+
+def test_jvp_unused_var():
+    f = make_expression(x * 2, vars=[x, y])
+    assert f.jvp((1, 1), (1, 5)) == 2
+    assert np.allclose(f.vjp((1, 1), 1), [2, 0])
+    with pytest.raises(AssertionError):
+        f.jvp((1, 1), (1,))
@@ -0,0 +1,59 @@
+"""
+test_taylor.py
+
+Testing Taylor mode higher-order directional derivatives
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+import math
+
+
+def _nested_derivs(f, x0, order):
+    """Derivatives of a function of one variable by repeated symbolic differentiation"""
+    derivs = [f.eval(x0)]
+    for _ in range(order):
+        f = f.grad_expr()
+        derivs.append(f.eval(x0))
+    return np.array(derivs, dtype=float)
+
+
+def test_taylor_all_operations():
+    x = sd.Var('x')
+    fns = [lambda u: u * u + 3 * u - 1 / u, sd.exp, sd.sqrt, sd.log, lambda u: sd.log(u, 3),
+           sd.sin, sd.cos, sd.tan, sd.csc, sd.sec, sd.cot, sd.sinh, sd.cosh, sd.tanh,
+           sd.arcsin, sd.arccos, sd.arctan, sd.logistic, sd.softplus,
+           lambda u: u ** 2, lambda u: u ** -1, lambda u: u ** 3, lambda u: u ** -2, lambda u: u ** 2.5,
+           lambda u: 2 ** u, lambda u: u ** u, lambda u: sd.logsumexp(u, 2 * u), lambda u: -u]
+    for fn in fns:
+        f = sd.make_expression(fn(x), vars=[x])
+        assert np.allclose(f.taylor((0.4,), (1.,), 4), _nested_derivs(f, 0.4, 4)), fn
+
+
+def test_taylor_direction_and_order():
+    x, y = sd.Var('x'), sd.Var('y')
+    f = sd.make_expression(sd.exp(x * y), vars=[x, y])
+    # f(1 + t, 1 + 2t) = exp(1 + 3t + 2t^2)
+    derivs = f.taylor((1., 1.), (1., 2.), 8)
+    t = sd.Var('t')
+    g = sd.make_expression(sd.exp(1 + 3 * t + 2 * t * t), vars=[t])
+    assert np.allclose(derivs, _nested_derivs(g, 0., 8))
+    coeffs = f.compile().taylor((1., 1.), (1., 2.), 8, coefficients=True)
+    assert np.allclose(coeffs * [math.factorial(k) for k in range(9)], derivs)
+    # Polynomials of degree 3 have no higher derivatives
+    p = sd.make_expression(x ** 3 * y, vars=[x, y])
+    assert np.allclose(p.taylor((0., 1.), (1., 0.), 6), [0, 0, 0, 6, 0, 0, 0])
+
+
+def test_taylor_batch_vector_and_fused():
+    x, y = sd.Var('x'), sd.Var('y')
+    scale = sd.Param('scale')
+    f = sd.make_expression(sd.sin(x) * scale, sd.exp(sd.cos(y)) + x, vars=[x, y])
+    xs = np.linspace(0, 1, 5)
+    res = f.taylor((xs, 0.5), (1., 0.), 3, params={scale: 2.})
+    assert res.shape == (5, 2, 4)
+    assert np.allclose(res[:, 0], 2 * np.stack([np.sin(xs), np.cos(xs), -np.sin(xs), -np.cos(xs)], axis=-1))
+    assert np.allclose(res[:, 1, 1], 1) and np.allclose(res[:, 1, 2:], 0)
+    fused = f.compile().fused()
+    assert np.allclose(fused.taylor((xs, 0.5), (0.5, 1.), 3, params={scale: 2.}),
+                       f.taylor((xs, 0.5), (0.5, 1.), 3, params={scale: 2.}))
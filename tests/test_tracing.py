@@ -0,0 +1,56 @@
+"""
+test_tracing.py
+
+Testing jit tracing of Python functions into cached Tapes
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+
+
+def test_jit_matches_expression():
+    @sd.jit
+    def f(x, y):
+        return sd.sin(x) * y + x ** 2 - sd.exp(y / x)
+
+    x, y = sd.Var('x'), sd.Var('y')
+    g = sd.make_expression(sd.sin(x) * y + x ** 2 - sd.exp(y / x), vars=[x, y])
+    assert np.isclose(f(1.5, 0.5), g.eval(1.5, 0.5))
+    assert np.allclose(f.grad(1.5, 0.5), g.deriv(1.5, 0.5))
+    value, grad = f.value_and_grad(1.5, 0.5, mode='forward')
+    assert np.isclose(value, g.eval(1.5, 0.5))
+    assert np.allclose(grad, g.deriv(1.5, 0.5))
+    assert f.__name__ == 'f'
+
+
+def test_jit_caches_per_signature():
+    calls = []
+
+    @sd.jit
+    def f(x):
+        calls.append(x)
+        return sd.tanh(x) * 3
+
+    f(1.)
+    f(2.)
+    f.grad(0.5)
+    assert f.n_traces == 1 and len(calls) == 1
+    assert isinstance(calls[0], sd.Var) and calls[0].name == 'x'
+    xs = np.linspace(-1, 1, 10)
+    assert np.allclose(f.grad(xs)[:, 0], 3 / np.cosh(xs) ** 2)
+    f(np.zeros(10))
+    assert f.n_traces == 2 and len(f.cache) == 2
+
+
+def test_jit_vector_output_and_params():
+    scale = sd.Param('scale')
+
+    @sd.jit
+    def f(a, b):
+        return [a * b * scale, a + sd.cos(b)]
+
+    assert np.allclose(f(1., 2., params={scale: 3.}), [6., 1 + np.cos(2.)])
+    jac = f.jacobian(1., 2., params={scale: 3.})
+    assert np.allclose(jac, [[6., 3.], [1., -np.sin(2.)]])
+    assert np.allclose(f.grad(1., 2., params={scale: 1.}), [[2., 1.], [1., -np.sin(2.)]])
+    assert f.jacobian(np.ones(4), 2., params={scale: 1.}).shape == (4, 2, 2)
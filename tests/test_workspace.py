@@ -0,0 +1,54 @@
+"""
+test_workspace.py
+
+Testing out= buffers and the reusable Workspace
+"""
+import pytest
+import numpy as np
+import superjacob as sd
+from superjacob import make_expression
+from superjacob.expression import *
+
+
+x, y = Var('x'), Var('y')
+
+
+def test_out_parameters():
+    f = make_expression(x * sd.sin(y) + x**2, vars=[x, y])
+    g = make_expression(x * y, sd.exp(x), y, vars=[x, y])
+    xs, ys = np.linspace(0, 1, 4), np.linspace(1, 2, 4)
+    grad, jac, value = np.empty((4, 2)), np.empty((4, 3, 2)), np.empty(4)
+    for mode in ('forward', 'reverse'):
+        assert f.deriv(xs, ys, mode=mode, out=grad) is grad
+        assert np.allclose(grad, f.deriv(xs, ys))
+        assert f.compile().deriv(xs, ys, mode=mode, out=grad) is grad
+        assert np.allclose(grad, f.deriv(xs, ys))
+        assert g.deriv(xs, ys, mode=mode, out=jac) is jac
+        assert np.allclose(jac, g.compile().deriv(xs, ys))
+    column = np.empty(4)
+    assert f.deriv(xs, ys, var=y, out=column) is column
+    assert np.allclose(column, xs * np.cos(ys))
+    assert f.deriv(xs, ys, var=y, mode='reverse', out=column) is column
+    assert f.eval(xs, ys, out=value) is value
+    assert np.allclose(value, f.eval(xs, ys))
+    with pytest.raises(AssertionError):
+        g.deriv(xs, ys, out=np.empty((4, 2, 3)))
+
+
+def test_workspace_reuses_buffers():
+    f = make_expression(x * y, sd.exp(x), vars=[x, y])
+    ws = sd.Workspace(f, shape=(5,))
+    xs, ys = np.linspace(0, 1, 5), np.linspace(1, 2, 5)
+    value, jac = ws.value_and_deriv(xs, ys)
+    assert value is ws.value and jac is ws.derivative
+    assert np.allclose(value, f.compile().eval(xs, ys))
+    assert np.allclose(jac, f.deriv(xs, ys))
+    assert ws.deriv(xs + 1, ys) is jac
+    assert np.allclose(jac, f.deriv(xs + 1, ys))
+    assert ws.eval(xs, ys) is value
+
+    h = make_expression(x**2 + y, vars=[x, y])
+    ws = sd.Workspace(h, mode='forward')
+    assert ws.deriv(3., 1.) is ws.derivative
+    assert np.allclose(ws.derivative, [6, 1])
+    assert ws.eval(3., 1.) == 10.